@@ -0,0 +1,53 @@
+"""
+Customer data payload benchmark for bulk certificate submissions.
+
+Compares building payloads one record at a time with the columnar batch normalizer. Run from the repository root:
+
+    python benchmarks/bench_customer_data.py [count]
+"""
+__author__ = 'frank'
+
+import os
+import sys
+import timeit
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'netki'))
+
+from Certificate import Certificate
+
+
+def per_record(records):
+    return [Certificate.build_customer_data_payload(record, 'product_id') for record in records]
+
+
+def columnar(records):
+    return Certificate.build_customer_data_payloads(records, 'product_id')
+
+
+if __name__ == '__main__':
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    # KYC batches share expiration dates and have birth dates spread over a few decades
+    records = [{
+        'partner_name': 'Partner',
+        'first_name': 'First%d' % i,
+        'last_name': 'Last%d' % i,
+        'email': 'user%d@example.com' % i,
+        'street_address': '%d Main St' % i,
+        'city': 'Los Angeles',
+        'state': 'CA',
+        'postal_code': '90001',
+        'country': 'US',
+        'dob': datetime(1950 + i % 50, 1 + i % 12, 1 + i % 28),
+        'identity': 'ID%d' % i,
+        'identity_type': 'drivers license',
+        'identity_expiration': datetime(2030, 1 + i % 12, 1)
+    } for i in range(count)]
+
+    assert per_record(records) == columnar(records)
+
+    for label, func in (('per record', per_record), ('columnar', columnar)):
+        elapsed = min(timeit.repeat(lambda: func(records), number=1, repeat=3))
+        print('%-20s %8.3fs  %10.0f payloads/s' % (label, elapsed, count / elapsed))
@@ -0,0 +1,69 @@
+"""
+String interning benchmark for large get_wallet_names responses.
+
+Builds WalletName objects from a synthetic response with and without the client's StringInterner and reports the
+memory held by domain_name and currency string objects. The response is decoded from JSON, so every repeated value
+starts out as its own object, as it does for a real API response. Run from the repository root:
+
+    python benchmarks/bench_interning.py [count]
+"""
+__author__ = 'frank'
+
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'netki'))
+
+from StringInterner import StringInterner
+from WalletName import WalletName
+
+CHUNK = 10000
+
+
+def synthetic_records(count):
+
+    records = []
+    for start in range(0, count, CHUNK):
+        records.extend(json.loads(json.dumps([{
+            'id': 'id%d' % i,
+            'domain_name': 'domain%d.com' % (i % 50),
+            'name': 'name%d' % i,
+            'external_id': 'external%d' % i,
+            'wallets': [
+                {'currency': 'btc', 'wallet_address': '1btc%d' % i},
+                {'currency': 'ltc', 'wallet_address': 'Lltc%d' % i}
+            ]
+        } for i in range(start, min(start + CHUNK, count))])))
+    return records
+
+
+def repeated_string_memory(wallet_names):
+    """ Returns the number and total size in bytes of distinct domain_name and currency objects. """
+
+    objects = {}
+    for wallet_name in wallet_names:
+        objects[id(wallet_name.domain_name)] = wallet_name.domain_name
+        for currency in wallet_name.wallets:
+            objects[id(currency)] = currency
+    return len(objects), sum(sys.getsizeof(value) for value in objects.values())
+
+
+if __name__ == '__main__':
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    records = synthetic_records(count)
+
+    results = {}
+    for label, interner_factory in (('plain', lambda: None), ('interned', StringInterner)):
+        elapsed = min(timeit.repeat(lambda: WalletName.from_api_data(records, None, interner_factory()), number=1,
+                                    repeat=3))
+        print('%-20s %8.3fs  %10.0f wallet names/s' % (label, elapsed, count / elapsed))
+        results[label] = repeated_string_memory(WalletName.from_api_data(records, None, interner_factory()))
+
+    # Size of the strings the WalletName objects keep alive once the decoded response is released
+    for label in ('plain', 'interned'):
+        objects, size = results[label]
+        print('%-20s %10d string objects  %8.1f MB' % (label, objects, size / 1048576.0))
+    print('%-20s %8.1f MB' % ('removed', (results['plain'][1] - results['interned'][1]) / 1048576.0))
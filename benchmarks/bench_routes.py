@@ -0,0 +1,66 @@
+"""
+URI construction benchmark for bulk operations.
+
+Compares the Route table, with and without its quote_component memo, against the string interpolation previously
+used in the client, for repeated and for unique values. Run from the repository root:
+
+    python benchmarks/bench_routes.py [count]
+"""
+__author__ = 'frank'
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'netki'))
+
+from six.moves.urllib.parse import quote
+
+import Routes
+
+
+def naive(names):
+    for name in names:
+        '/v1/partner/domain/' + name
+        '/v1/partner/walletname?domain_name=%s&external_id=%s' % (name, name)
+
+
+def quoted(names):
+    for name in names:
+        '/v1/partner/domain/' + quote(name, safe='')
+        '/v1/partner/walletname?domain_name=%s&external_id=%s' % (quote(name, safe=''), quote(name, safe=''))
+
+
+def routed(names):
+    for name in names:
+        Routes.PARTNER_DOMAIN.expand(domain_name=name)
+        Routes.WALLET_NAMES.expand(query=[('domain_name', name), ('external_id', name)])
+
+
+def unmemoized(names):
+    # The route table with quote_component replaced by the plain encoding it memoizes
+    memoized = Routes.quote_component
+    Routes.quote_component = Routes._quote
+    try:
+        routed(names)
+    finally:
+        Routes.quote_component = memoized
+
+
+if __name__ == '__main__':
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    workloads = (
+        # Bulk operations repeat a small set of domains
+        ('repeated names', ['domain%d.com' % (i % 50) for i in range(count)]),
+        # Every value distinct, e.g. external ids, so the memo never hits
+        ('unique names', ['external-id-%d' % i for i in range(count)])
+    )
+
+    for workload, names in workloads:
+        print(workload)
+        for label, func in (('naive (unencoded)', naive), ('quote per call', quoted), ('route table', routed),
+                            ('route table no memo', unmemoized)):
+            elapsed = min(timeit.repeat(lambda: func(names), number=1, repeat=3))
+            print('  %-20s %8.3fs  %10.0f uris/s' % (label, elapsed, 2 * count / elapsed))
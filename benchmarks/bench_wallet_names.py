@@ -0,0 +1,66 @@
+"""
+Wallet Name materialization benchmark for large get_wallet_names responses.
+
+Compares building WalletName objects one at a time through the parsed AttrDict response, as get_wallet_names used
+to, with WalletName.from_api_data on the raw dictionaries. Run from the repository root:
+
+    python benchmarks/bench_wallet_names.py [count]
+"""
+__author__ = 'frank'
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'netki'))
+
+from attrdict import AttrDict
+
+from WalletName import WalletName
+
+
+def synthetic_response(count):
+
+    return AttrDict({
+        'success': True,
+        'wallet_name_count': count,
+        'wallet_names': [{
+            'id': 'id%d' % i,
+            'domain_name': 'domain%d.com' % (i % 50),
+            'name': 'name%d' % i,
+            'external_id': 'external%d' % i,
+            'wallets': [
+                {'currency': 'btc', 'wallet_address': '1btc%d' % i},
+                {'currency': 'ltc', 'wallet_address': 'Lltc%d' % i}
+            ]
+        } for i in range(count)]
+    })
+
+
+def per_object(response, netki_client):
+
+    wallet_names = []
+    for wn in response.wallet_names:
+        wallet_name = WalletName(domain_name=wn.domain_name, name=wn.name, external_id=wn.external_id, id=wn.id)
+        for wallet in wn.wallets:
+            wallet_name.set_currency_address(wallet.currency, wallet.wallet_address)
+        wallet_name.set_netki_client(netki_client)
+        wallet_names.append(wallet_name)
+    return wallet_names
+
+
+def bulk(response, netki_client):
+    return WalletName.from_api_data(response.get('wallet_names'), netki_client)
+
+
+if __name__ == '__main__':
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    response = synthetic_response(count)
+    netki_client = object()
+
+    assert [vars(w) for w in per_object(response, netki_client)] == [vars(w) for w in bulk(response, netki_client)]
+
+    for label, func in (('per object', per_object), ('from_api_data', bulk)):
+        elapsed = min(timeit.repeat(lambda: func(response, netki_client), number=1, repeat=3))
+        print('%-20s %8.3fs  %10.0f wallet names/s' % (label, elapsed, count / elapsed))
@@ -1,11 +1,18 @@
 __author__ = 'frank'
 
 from datetime import datetime
-from OpenSSL import crypto
 
 from BaseObject import BaseObject
+from CertificateBundle import parse_certificate
+from CustomerData import build_customer_data_payloads
+from LazyImport import lazy_import
 from Requestor import process_request
 
+import Routes
+
+# OpenSSL is only needed to generate CSRs, load it on first use
+crypto = lazy_import('OpenSSL.crypto')
+
 
 class Certificate(BaseObject):
     """
@@ -29,6 +36,7 @@ class Certificate(BaseObject):
             'certificate': None
         }
         self.product_id = product_id
+        self._parsed = None
 
     def submit_customer_data(self):
         """
@@ -41,19 +49,9 @@ class Certificate(BaseObject):
         if not self.customer_data:
             raise ValueError('customer_data must be set on Certificate object')
 
-        post_data = dict()
-        for key, value in self.customer_data.iteritems():
-            if key == 'partner_name':
-                continue
-
-            if isinstance(value, datetime):
-                value = value.strftime('%Y-%m-%d')
-
-            post_data[key] = value
+        post_data = Certificate.build_customer_data_payload(self.customer_data, self.product_id)
 
-        post_data['product'] = self.product_id
-
-        response = process_request(self.netki_client, '/v1/certificate/token', 'POST', post_data)
+        response = process_request(self.netki_client, Routes.CERTIFICATE_TOKEN.expand(), 'POST', post_data)
 
         self.data_token = response.get('token')
 
@@ -86,7 +84,7 @@ class Certificate(BaseObject):
             'stripe_token': stripe_token
         }
 
-        response = process_request(self.netki_client, '/v1/certificate', 'POST', post_data)
+        response = process_request(self.netki_client, Routes.CERTIFICATE_ORDER.expand(), 'POST', post_data)
 
         self.id = response.get('order_id')
 
@@ -104,7 +102,7 @@ class Certificate(BaseObject):
 
         csr_pem = Certificate.generate_csr(self.customer_data, pkey_obj)
 
-        process_request(self.netki_client, '/v1/certificate/%s/csr' % self.id, 'POST', {'signed_csr': csr_pem})
+        process_request(self.netki_client, Routes.CERTIFICATE_CSR.expand(certificate_id=self.id), 'POST', {'signed_csr': csr_pem})
 
     def revoke(self, reason):
         """
@@ -118,7 +116,7 @@ class Certificate(BaseObject):
         if not self.id:
             raise ValueError('Missing ID - Order Not Yet Submitted')
 
-        process_request(self.netki_client, '/v1/certificate/%s' % self.id, 'DELETE', {'revocation_reason': reason})
+        process_request(self.netki_client, Routes.CERTIFICATE.expand(certificate_id=self.id), 'DELETE', {'revocation_reason': reason})
 
     def get_status(self):
         """
@@ -130,7 +128,7 @@ class Certificate(BaseObject):
         if not self.id:
             raise ValueError('Missing ID - Order Not Yet Submitted')
 
-        response = process_request(self.netki_client, '/v1/certificate/%s' % self.id, 'GET')
+        response = process_request(self.netki_client, Routes.CERTIFICATE.expand(certificate_id=self.id), 'GET')
 
         self.order_status = response.get('order_status')
         self.order_error = response.get('order_error')
@@ -140,18 +138,53 @@ class Certificate(BaseObject):
             self.bundle['intermediate'] = response['certificate_bundle'].get('intermediate')
             self.bundle['certificate'] = response['certificate_bundle'].get('certificate')
 
+    @property
+    def certificate_x509(self):
+        """ OpenSSL X509 object of the issued certificate, None until the certificate has been issued. """
+        parsed = self._parse_certificate()
+        return parsed.x509 if parsed else None
+
+    @property
+    def not_after(self):
+        """ Expiry of the issued certificate as a naive UTC datetime, None until the certificate has been issued. """
+        parsed = self._parse_certificate()
+        return parsed.not_after if parsed else None
+
+    @property
+    def serial(self):
+        """ Serial number of the issued certificate, None until the certificate has been issued. """
+        parsed = self._parse_certificate()
+        return parsed.serial if parsed else None
+
+    @property
+    def subject(self):
+        """ Dictionary of the issued certificate's subject components, None until the certificate has been issued. """
+        parsed = self._parse_certificate()
+        return parsed.subject if parsed else None
+
+    def _parse_certificate(self):
+
+        pem = self.bundle.get('certificate')
+        if not pem:
+            return None
+
+        # Parse once per PEM; a renewed certificate loaded by get_status() is parsed again
+        if self._parsed is None or self._parsed.pem != pem:
+            self._parsed = parse_certificate(pem)
+        return self._parsed
+
     def is_order_complete(self):
         """
-        Call is_order_compete() to return a boolean indicating whether the order is complete.
+        Call is_order_compete() to return a boolean indicating whether the order is complete. The order status is
+        retrieved from the API unless the order is already known to be complete.
 
         :return Exception for error responses or required missing data.
         """
 
-        if self.order_status and self.order_status == 'Order Finalized':
-            return True
+        if self.order_status != 'Order Finalized':
+            self.get_status()
 
-        self.get_status()
-        return False
+        return self.order_status == 'Order Finalized'
 
     def set_partner_name(self, partner_name):
         """
@@ -159,7 +192,47 @@ class Certificate(BaseObject):
         """
 
         self.customer_data['partner_name'] = partner_name
-    
+
+    @staticmethod
+    def build_customer_data_payload(customer_data, product_id):
+        """
+        Build the customer data submission payload. The partner_name is omitted and datetime values are formatted as
+        ``YYYY-MM-DD``.
+
+        :param customer_data: Dictionary of customer data.
+        :param product_id: Product ID for the requested certificate.
+
+        :return Dictionary ready to submit to the API.
+        """
+
+        post_data = dict()
+        for key, value in customer_data.iteritems():
+            if key == 'partner_name':
+                continue
+
+            if isinstance(value, datetime):
+                value = value.strftime('%Y-%m-%d')
+
+            post_data[key] = value
+
+        post_data['product'] = product_id
+
+        return post_data
+
+    @staticmethod
+    def build_customer_data_payloads(records, product_id):
+        """
+        Build customer data submission payloads for many customers at once, column by column. The payloads are
+        identical to those of build_customer_data_payload(). See CustomerData.build_customer_data_payloads.
+
+        :param records: List of customer data dictionaries, a pandas DataFrame or a numpy structured array.
+        :param product_id: Product ID for all records, or a list with one Product ID per record.
+
+        :return List of dictionaries ready to submit to the API.
+        """
+
+        return build_customer_data_payloads(records, product_id)
+
     @staticmethod
     def generate_csr(customer_data, pkey_obj):
         """
@@ -0,0 +1,202 @@
+__author__ = 'frank'
+
+import hashlib
+import json
+import multiprocessing
+
+from Certificate import Certificate
+from Checkpoint import open_checkpoint, read_checkpoint, write_entry
+from CircuitBreaker import is_failure
+from Errors import NetkiError, TransportError
+from Requestor import process_request
+
+import Routes
+
+# Netki client owned by each worker process, created once by _init_worker
+_worker_client = None
+
+
+def _init_worker(client_class, credentials):
+
+    global _worker_client
+    _worker_client = client_class.from_credentials(credentials)
+
+
+def _submit_record(record):
+
+    index, post_data = record
+
+    try:
+        response = process_request(
+            _worker_client, Routes.CERTIFICATE_TOKEN.expand(), 'POST', post_data, raise_errors=False
+        )
+    except Exception as e:
+        response = e if isinstance(e, NetkiError) else NetkiError(str(e))
+
+    if isinstance(response, NetkiError):
+        return index, None, response
+    return index, response.get('token'), None
+
+
+def record_keys(payloads):
+    """
+    Checkpoint keys of customer data payloads: a hash of the payload, numbered among identical payloads. The keys do
+    not depend on the position of a record, so a checkpoint still applies after the input is reordered or edited.
+
+    :param payloads: List of payloads as built by Certificate.build_customer_data_payloads()
+    :return: List of keys
+    """
+
+    keys = []
+    seen = {}
+
+    for payload in payloads:
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+        seen[digest] = seen.get(digest, 0) + 1
+        keys.append('%s-%d' % (digest, seen[digest]))
+
+    return keys
+
+
+def is_transient(error):
+    """ Returns True for errors worth retrying later: transport errors, deadlines, rate limiting and 5xx. """
+    return isinstance(error, TransportError) or is_failure(error)
+
+
+class SubmissionReport(object):
+    """
+    Outcome of a CustomerDataSubmitter run.
+
+    ``failures`` is a list of (index, NetkiError) tuples for records the API rejected or that could not be submitted.
+    Each error carries the status code and the API failures list, so rejected fields can be read from
+    ``error.failures`` per record.
+    """
+
+    def __init__(self):
+
+        self.submitted = 0
+        self.resumed = 0
+        self.failures = []
+
+    @property
+    def failure_counts(self):
+        """ Dictionary of error message to the number of records that failed with it. """
+
+        counts = {}
+        for index, error in self.failures:
+            message = str(error)
+            counts[message] = counts.get(message, 0) + 1
+        return counts
+
+
+class CustomerDataSubmitter(object):
+    """
+    Submit customer data for many Certificate objects using a pool of worker processes. Records are sharded across
+    workers in chunks and each worker keeps its own Netki client, and therefore its own connection pool, for the
+    whole run.
+
+    When a checkpoint_path is given, every completed record is appended to it as a JSON line, keyed by a hash of its
+    customer data (see record_keys). Re-running the batch with the same checkpoint_path skips records that already
+    completed, even if the certificates were reordered, so a batch can be resumed after a crash. Records that failed
+    with a transient error (see is_transient), e.g. during an outage, are not checkpointed and are submitted again.
+
+    :param netki_client: Netki client whose credentials the workers use.
+    :param processes: Number of worker processes.
+    :param checkpoint_path: (Optional) Path of the checkpoint file.
+    :param chunksize: Number of records handed to a worker at a time.
+    :param retry_failed: When resuming, submit records that failed in a previous run again.
+    """
+
+    def __init__(self, netki_client, processes=4, checkpoint_path=None, chunksize=100, retry_failed=False):
+
+        self.netki_client = netki_client
+        self.processes = processes
+        self.checkpoint_path = checkpoint_path
+        self.chunksize = chunksize
+        self.retry_failed = retry_failed
+
+    def submit(self, certificates):
+        """
+        Submit customer data for all certificates and set data_token on each of them.
+
+        :param certificates: List of Certificate objects with customer_data and product_id set.
+        :return: SubmissionReport
+        """
+
+        report = SubmissionReport()
+
+        for certificate in certificates:
+            if not certificate.customer_data:
+                raise ValueError('customer_data must be set on Certificate object')
+
+        # Normalize all customer data in one columnar pass rather than once per record in the workers
+        payloads = Certificate.build_customer_data_payloads(
+            [certificate.customer_data for certificate in certificates],
+            [certificate.product_id for certificate in certificates]
+        )
+        keys = record_keys(payloads)
+        completed = self._load_checkpoint()
+
+        records = []
+        for index, certificate in enumerate(certificates):
+            if keys[index] in completed:
+                token, error = completed[keys[index]]
+                if token or not self.retry_failed:
+                    self._apply(report, certificate, index, token, error)
+                    report.resumed += 1
+                    continue
+
+            records.append((index, payloads[index]))
+
+        if not records:
+            return report
+
+        checkpoint = open_checkpoint(self.checkpoint_path) if self.checkpoint_path else None
+        pool = multiprocessing.Pool(
+            self.processes,
+            initializer=_init_worker,
+            initargs=(type(self.netki_client), self.netki_client.credentials)
+        )
+
+        try:
+            for index, token, error in pool.imap_unordered(_submit_record, records, self.chunksize):
+                self._apply(report, certificates[index], index, token, error)
+                report.submitted += 1
+
+                if checkpoint and not (error and is_transient(error)):
+                    write_entry(checkpoint, {
+                        'key': keys[index],
+                        'token': token,
+                        'error': error.to_dict() if error else None
+                    })
+
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+            if checkpoint:
+                checkpoint.close()
+
+        return report
+
+    def _apply(self, report, certificate, index, token, error):
+
+        if error:
+            report.failures.append((index, error))
+        else:
+            certificate.data_token = token
+
+    def _load_checkpoint(self):
+
+        completed = {}
+
+        for entry in read_checkpoint(self.checkpoint_path):
+            # Entries of older checkpoints are keyed by position only and can not be matched safely
+            if 'key' not in entry:
+                continue
+            error = NetkiError.from_dict(entry['error']) if entry['error'] else None
+            completed[entry['key']] = (entry['token'], error)
+
+        return completed
@@ -0,0 +1,72 @@
+__author__ = 'frank'
+
+from collections import namedtuple
+from datetime import datetime
+
+from LazyImport import lazy_import
+from WorkerPool import WorkerPool
+
+crypto = lazy_import('OpenSSL.crypto')
+
+# Issued certificate parsed from its PEM. subject is a dictionary of subject components, e.g. {'CN': 'First Last'}
+ParsedCertificate = namedtuple('ParsedCertificate', ['pem', 'x509', 'not_after', 'serial', 'subject'])
+
+# Expiry data of one certificate, as returned by load_bundles()
+CertificateExpiry = namedtuple('CertificateExpiry', ['certificate_id', 'not_after', 'serial', 'subject'])
+
+
+def asn1_time(value):
+    """
+    Convert an ASN.1 GENERALIZEDTIME as returned by OpenSSL, ``20300103000000Z``, to a naive UTC datetime.
+    """
+
+    if isinstance(value, bytes):
+        value = value.decode('ascii')
+    return datetime.strptime(value[:14], '%Y%m%d%H%M%S')
+
+
+def parse_certificate(pem):
+    """
+    Parse a PEM encoded certificate.
+
+    :param pem: PEM string
+    :return: ParsedCertificate
+    """
+
+    x509 = crypto.load_certificate(crypto.FILETYPE_PEM, pem)
+
+    return ParsedCertificate(
+        pem,
+        x509,
+        asn1_time(x509.get_notAfter()),
+        x509.get_serial_number(),
+        dict(x509.get_subject().get_components())
+    )
+
+
+def load_bundles(certificates, concurrency=8):
+    """
+    Load and parse the bundles of many certificates at once, e.g. for renewal scanning. Certificates with an id but
+    no certificate in their bundle get their status fetched, up to concurrency at a time. Every issued certificate is
+    then parsed once; the parsed values stay cached on the Certificate objects.
+
+    :param certificates: List of Certificate objects.
+    :param concurrency: Maximum number of status requests at once.
+    :return: List of CertificateExpiry for certificates that have been issued, sorted by not_after.
+    """
+
+    missing = [c for c in certificates if c.id and not c.bundle.get('certificate')]
+    if missing:
+        with WorkerPool(concurrency) as pool:
+            for task in pool.map(lambda certificate: certificate.get_status(), missing):
+                task.result()
+
+    expiries = []
+    for certificate in certificates:
+        if certificate.bundle.get('certificate'):
+            expiries.append(CertificateExpiry(
+                certificate.id, certificate.not_after, certificate.serial, certificate.subject
+            ))
+
+    expiries.sort(key=lambda expiry: expiry.not_after)
+    return expiries
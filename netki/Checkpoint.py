@@ -0,0 +1,56 @@
+__author__ = 'frank'
+
+import json
+import os
+
+
+def read_checkpoint(path):
+    """
+    Returns the entries of a JSON lines checkpoint file in order, an empty list if it does not exist. A crash can
+    leave a partially written last line, which is skipped.
+
+    :param path: Checkpoint file path.
+    """
+
+    entries = []
+
+    if not path or not os.path.exists(path):
+        return entries
+
+    with open(path) as checkpoint:
+        for line in checkpoint:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+
+    return entries
+
+
+def open_checkpoint(path):
+    """
+    Open a JSON lines checkpoint file for appending entries with write_entry().
+
+    :param path: Checkpoint file path.
+    :return: File object
+    """
+
+    checkpoint = open(path, 'a+')
+
+    # Terminate a partially written last line so the next entry starts on its own line
+    checkpoint.seek(0, os.SEEK_END)
+    if checkpoint.tell():
+        checkpoint.seek(-1, os.SEEK_END)
+        last_character = checkpoint.read(1)
+        checkpoint.seek(0, os.SEEK_END)
+        if last_character != '\n':
+            checkpoint.write('\n')
+
+    return checkpoint
+
+
+def write_entry(checkpoint, entry):
+    """ Append entry, a JSON serializable dictionary, and flush it to disk. """
+
+    checkpoint.write(json.dumps(entry) + '\n')
+    checkpoint.flush()
@@ -0,0 +1,208 @@
+__author__ = 'frank'
+
+import threading
+import time
+from collections import deque
+
+from Errors import CircuitOpenError, DeadlineExceededError, NetkiError, RateLimitError, TransportError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+def is_failure(outcome):
+    """
+    Returns True if outcome, a parsed response or an exception, counts against the circuit: transport errors,
+    timeouts, rate limiting and 5xx responses. Other API errors, e.g. validation failures, mean the API is healthy.
+    Errors the client raises itself, an expired Deadline or an open circuit, say nothing about the API either.
+    """
+
+    if isinstance(outcome, (DeadlineExceededError, CircuitOpenError)):
+        return False
+    if isinstance(outcome, (TransportError, RateLimitError)):
+        return True
+    return isinstance(outcome, NetkiError) and outcome.status_code is not None and outcome.status_code >= 500
+
+
+class CircuitBreaker(object):
+    """
+    Circuit breaker for one endpoint group. The outcomes of the last ``window`` calls are tracked while the circuit is
+    closed. Once at least ``minimum_calls`` have been seen and the share of failures reaches ``failure_ratio`` the
+    circuit opens and calls fail fast with CircuitOpenError. After ``reset_timeout`` seconds the circuit goes half
+    open and lets ``half_open_probes`` calls through. If they all succeed the circuit closes, the first failure opens
+    it again.
+
+    State changes are emitted through metrics as ``circuit_state_change`` events with ``group``, ``previous`` and
+    ``state`` data. Rejected calls are counted as ``circuit_rejections``.
+
+    :param group: Endpoint group name. ``walletname``
+    :param failure_ratio: Failure ratio, between 0 and 1, opening the circuit.
+    :param minimum_calls: Number of calls in the window before the failure ratio is evaluated.
+    :param window: Number of recent calls the failure ratio is computed over.
+    :param reset_timeout: Seconds the circuit stays open before probing.
+    :param half_open_probes: Number of successful probe calls required to close the circuit.
+    :param metrics: (Optional) Metrics instance
+    """
+
+    def __init__(self, group, failure_ratio=0.5, minimum_calls=10, window=20, reset_timeout=30, half_open_probes=1,
+                 metrics=None):
+
+        if not 0 < failure_ratio <= 1:
+            raise ValueError('failure_ratio must be greater than 0 and at most 1')
+
+        if minimum_calls > window:
+            raise ValueError('minimum_calls must not exceed window')
+
+        self.group = group
+        self.failure_ratio = failure_ratio
+        self.minimum_calls = minimum_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.metrics = metrics
+
+        self.state = CLOSED
+
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = None
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        # Incremented on every state change so outcomes of calls admitted in an earlier state are ignored
+        self._generation = 0
+
+    def before_call(self, method=None, uri=None):
+        """
+        Admit a call or raise CircuitOpenError.
+
+        :return: Token to pass to after_call()
+        """
+
+        changes = []
+        with self._lock:
+            if self.state == OPEN and time.time() >= self._opened_at + self.reset_timeout:
+                changes.append(self._transition(HALF_OPEN))
+
+            rejected = self.state == OPEN or (
+                self.state == HALF_OPEN and self._probes_in_flight >= self.half_open_probes - self._probe_successes
+            )
+            if not rejected and self.state == HALF_OPEN:
+                self._probes_in_flight += 1
+
+            token = (self._generation, self.state)
+
+        self._emit(changes)
+
+        if rejected:
+            if self.metrics is not None:
+                self.metrics.incr('circuit_rejections')
+            raise CircuitOpenError('Circuit Open for %s Endpoints' % self.group, method=method, uri=uri)
+
+        return token
+
+    def after_call(self, token, failed):
+        """
+        Record the outcome of a call admitted by before_call().
+
+        :param token: Token returned by before_call()
+        :param failed: True if the call failed, see is_failure(). None releases a probe without recording an outcome.
+        """
+
+        generation, admitted_state = token
+
+        changes = []
+        with self._lock:
+            if generation != self._generation:
+                return
+
+            if admitted_state == HALF_OPEN:
+                self._probes_in_flight -= 1
+                if failed:
+                    changes.append(self._transition(OPEN))
+                elif failed is not None:
+                    self._probe_successes += 1
+                    if self._probe_successes >= self.half_open_probes:
+                        changes.append(self._transition(CLOSED))
+
+            elif failed is not None:
+                self._outcomes.append(failed)
+                if len(self._outcomes) >= self.minimum_calls:
+                    if float(sum(self._outcomes)) / len(self._outcomes) >= self.failure_ratio:
+                        changes.append(self._transition(OPEN))
+
+        self._emit(changes)
+
+    def call(self, func, method=None, uri=None):
+        """
+        Run func() through the circuit breaker. func may return a NetkiError instead of raising it.
+
+        :return: Result of func()
+        """
+
+        token = self.before_call(method, uri)
+        try:
+            result = func()
+        except Exception as e:
+            self.after_call(token, is_failure(e) or None)
+            raise
+
+        self.after_call(token, is_failure(result))
+        return result
+
+    def _transition(self, state):
+
+        previous, self.state = self.state, state
+        self._generation += 1
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+        if state == OPEN:
+            self._opened_at = time.time()
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+        return previous, state
+
+    def _emit(self, changes):
+
+        if self.metrics is None:
+            return
+
+        for previous, state in changes:
+            self.metrics.emit('circuit_state_change', group=self.group, previous=previous, state=state)
+
+
+class CircuitBreakers(object):
+    """
+    One CircuitBreaker per endpoint group, created on first use with the same settings.
+
+    :param metrics: (Optional) Metrics instance
+    :param settings: CircuitBreaker keyword arguments
+    """
+
+    def __init__(self, metrics=None, **settings):
+
+        # Validate settings up front rather than on the first call
+        CircuitBreaker('validation', **settings)
+
+        self.metrics = metrics
+        self.settings = settings
+
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def get(self, group):
+        """ Returns the CircuitBreaker for an endpoint group. """
+
+        breaker = self._breakers.get(group)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(group)
+                if breaker is None:
+                    breaker = self._breakers[group] = CircuitBreaker(group, metrics=self.metrics, **self.settings)
+        return breaker
+
+    def states(self):
+        """ Dictionary of endpoint group to circuit state. """
+        with self._lock:
+            return dict((group, breaker.state) for group, breaker in self._breakers.items())
@@ -0,0 +1,303 @@
+__author__ = 'frank'
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from Certificate import Certificate
+from Deadline import Deadline, check_deadline
+from Errors import NetkiError, NotFoundError
+from NetkiClient import Netki
+from WorkerPool import WorkerPool
+
+
+class ProgressReporter(object):
+    """
+    Prints live throughput and latency of the API calls made through metrics every interval seconds, and a final
+    summary when stopped.
+
+    :param metrics: Metrics instance of the client in use.
+    :param stream: Output stream, usually stderr.
+    :param interval: Seconds between progress lines. None only prints the summary.
+    """
+
+    def __init__(self, metrics, stream, interval=1.0):
+
+        self.metrics = metrics
+        self.stream = stream
+        self.interval = interval
+        self.rows = None
+        self.started_at = time.time()
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+
+        if self.interval:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def stop(self):
+
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+        self.stream.write('summary: %s\n' % self.line(final=True))
+        self.stream.flush()
+
+    def _run(self):
+
+        while not self._stop.wait(self.interval):
+            self.stream.write('progress: %s\n' % self.line())
+            self.stream.flush()
+
+    def line(self, final=False):
+
+        elapsed = max(time.time() - self.started_at, 1e-6)
+        requests = self.metrics.get('requests')
+        latency = self.metrics.timing('request_latency')
+
+        parts = [
+            '%.1fs' % elapsed,
+            '%d requests (%.1f/s)' % (requests, requests / elapsed),
+            'latency p50 %.0fms p95 %.0fms p99 %.0fms' % (
+                latency['p50'] * 1000, latency['p95'] * 1000, latency['p99'] * 1000
+            )
+        ]
+
+        if final:
+            parts.append('max %.0fms' % (latency['max'] * 1000))
+
+        if self.rows is not None:
+            parts.append('%d rows (%.1f rows/s)' % (self.rows, self.rows / elapsed))
+
+        return ', '.join(parts)
+
+
+def build_client(args):
+
+    if args.user_key:
+        netki = Netki.certificate_api_access(args.user_key, args.partner_id, args.api_url)
+    else:
+        netki = Netki(args.api_key, args.partner_id, args.api_url)
+
+    if args.rate_limit:
+        netki.set_rate_limit(args.rate_limit)
+
+    if args.timeout:
+        netki.set_timeouts(read=args.timeout)
+
+    return netki
+
+
+def wallet_name_export(netki, args, out, reporter):
+
+    report = netki.export_wallet_names(args.file, args.format, args.checkpoint, args.concurrency)
+    reporter.rows = report.records
+
+    out.write('exported %d wallet names from %d domains (%d resumed)\n' % (
+        report.records, report.domains, report.resumed_domains
+    ))
+    for domain_name, error in report.errors:
+        out.write('failed %s: %s\n' % (domain_name, error))
+
+    return 1 if report.errors else 0
+
+
+def _wallet_name_import(netki, args, out, reporter, sync):
+
+    def progress(report):
+        reporter.rows = report.rows
+
+    reject_file = args.reject_file or args.file + '.rejects'
+    method = netki.sync_wallet_names if sync else netki.import_wallet_names
+    report = method(args.file, reject_file, args.format, args.batch_size, args.concurrency, progress)
+    reporter.rows = report.rows
+
+    out.write('imported %d wallet names, rejected %d (%s) from %d rows in %.1fs (%.1f rows/s)\n' % (
+        report.imported, report.rejected, reject_file, report.rows, report.elapsed, report.rows_per_second
+    ))
+
+    return 1 if report.rejected else 0
+
+
+def wallet_name_import(netki, args, out, reporter):
+    return _wallet_name_import(netki, args, out, reporter, sync=False)
+
+
+def wallet_name_sync(netki, args, out, reporter):
+    return _wallet_name_import(netki, args, out, reporter, sync=True)
+
+
+def _find_domain(netki, domain_name):
+
+    try:
+        domains = netki.get_domains(domain_name)
+    except NotFoundError:
+        return None
+    return domains[0] if domains else None
+
+
+def domain_refresh(netki, args, out, reporter):
+
+    failed = 0
+
+    if args.domains:
+        domains = []
+        for domain_name in args.domains:
+            domain = _find_domain(netki, domain_name)
+            if domain:
+                domains.append(domain)
+            else:
+                failed += 1
+                out.write('%s\tERROR\tDomain Not Found\n' % domain_name)
+    else:
+        domains = netki.get_domains()
+
+    with WorkerPool(args.concurrency) as pool:
+        for domain, task in zip(domains, pool.map(lambda d: d.refresh(), domains)):
+            error = task.exception()
+            if error:
+                failed += 1
+                out.write('%s\tERROR\t%s\n' % (domain.name, error))
+            else:
+                out.write('%s\t%s\t%s\t%s\n' % (domain.name, domain.status, domain.delegation_status, domain.next_roll))
+
+    return 1 if failed else 0
+
+
+def certificate_status(netki, args, out, reporter):
+
+    def poll(certificate_id):
+
+        certificate = Certificate()
+        certificate.id = certificate_id
+        certificate.set_netki_client(netki)
+
+        # is_order_complete() loads the status, once per poll, until the order is complete
+        while not certificate.is_order_complete() and args.wait and not certificate.order_error:
+            remaining = check_deadline()
+            time.sleep(args.poll_interval if remaining is None else min(args.poll_interval, remaining))
+        return certificate
+
+    failed = 0
+    with WorkerPool(args.concurrency) as pool:
+        for certificate_id, task in zip(args.ids, pool.map(poll, args.ids)):
+            error = task.exception()
+            if error:
+                failed += 1
+                out.write('%s\tERROR\t%s\n' % (certificate_id, error))
+                continue
+
+            certificate = task.result()
+            if certificate.order_error:
+                failed += 1
+            out.write('%s\t%s\t%s\n' % (certificate_id, certificate.order_status, certificate.order_error or ''))
+
+    return 1 if failed else 0
+
+
+def partner_list(netki, args, out, reporter):
+
+    for partner in netki.get_partners():
+        out.write('%s\t%s\n' % (partner.id, partner.name))
+
+    return 0
+
+
+def build_parser():
+
+    parser = argparse.ArgumentParser(prog='netki', description='Bulk operations against the Netki Partner API.')
+
+    parser.add_argument('--api-url', default=os.environ.get('NETKI_API_URL', 'https://api.netki.com'))
+    parser.add_argument('--api-key', default=os.environ.get('NETKI_API_KEY'), help='env NETKI_API_KEY')
+    parser.add_argument('--partner-id', default=os.environ.get('NETKI_PARTNER_ID'), help='env NETKI_PARTNER_ID')
+    parser.add_argument('--user-key', default=os.environ.get('NETKI_USER_KEY'),
+                        help='hex DER user key for certificate API access, env NETKI_USER_KEY')
+    parser.add_argument('--concurrency', type=int, default=8, help='API calls in flight at once')
+    parser.add_argument('--batch-size', type=int, default=100, help='Wallet Names per bulk request')
+    parser.add_argument('--rate-limit', type=float, help='maximum API calls per second')
+    parser.add_argument('--timeout', type=float, help='read timeout in seconds')
+    parser.add_argument('--deadline', type=float, help='seconds allowed for the whole command')
+    parser.add_argument('--progress-interval', type=float, default=1.0,
+                        help='seconds between progress lines on stderr, 0 to only print the summary')
+
+    commands = parser.add_subparsers(title='commands')
+
+    wallet_name = commands.add_parser('wallet-name', help='bulk Wallet Name operations').add_subparsers()
+
+    export = wallet_name.add_parser('export', help='export all Wallet Names')
+    export.add_argument('file')
+    export.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+    export.add_argument('--checkpoint', help='checkpoint file allowing an interrupted export to resume')
+    export.set_defaults(func=wallet_name_export)
+
+    for name, func, help_text in (
+        ('import', wallet_name_import, 'create or update Wallet Names from a file'),
+        ('sync', wallet_name_sync, 'update existing and create missing Wallet Names from a file')
+    ):
+        command = wallet_name.add_parser(name, help=help_text)
+        command.add_argument('file')
+        command.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        command.add_argument('--reject-file', help='defaults to FILE.rejects')
+        command.set_defaults(func=func)
+
+    domain = commands.add_parser('domain', help='domain operations').add_subparsers()
+    refresh = domain.add_parser('refresh', help='reload domain status and DNSSEC details')
+    refresh.add_argument('domains', nargs='*', help='defaults to all domains')
+    refresh.set_defaults(func=domain_refresh)
+
+    certificate = commands.add_parser('certificate', help='certificate operations').add_subparsers()
+    status = certificate.add_parser('status', help='print certificate order status')
+    status.add_argument('ids', nargs='+')
+    status.add_argument('--wait', action='store_true', help='poll until every order is complete or has failed')
+    status.add_argument('--poll-interval', type=float, default=5.0)
+    status.set_defaults(func=certificate_status)
+
+    partner = commands.add_parser('partner', help='sub-partner operations').add_subparsers()
+    partner.add_parser('list', help='list sub-partners').set_defaults(func=partner_list)
+
+    return parser
+
+
+def main(argv=None, stdout=None, stderr=None):
+    """
+    Entry point of the ``netki`` command.
+
+    :return: Exit status, 1 if any record or API call failed.
+    """
+
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+
+    args = build_parser().parse_args(argv)
+
+    try:
+        netki = build_client(args)
+    except ValueError as e:
+        stderr.write('error: %s\n' % e)
+        return 1
+
+    reporter = ProgressReporter(netki.metrics, stderr, args.progress_interval).start()
+
+    try:
+        if args.deadline:
+            with Deadline(args.deadline):
+                return args.func(netki, args, stdout, reporter)
+        return args.func(netki, args, stdout, reporter)
+    except (NetkiError, ValueError) as e:
+        stderr.write('error: %s\n' % e)
+        return 1
+    finally:
+        reporter.stop()
+        netki.transport.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,126 @@
+__author__ = 'frank'
+
+import threading
+
+from LRUCache import LRUCache
+from Metrics import Metrics
+from NetkiClient import Credentials, DEFAULT_TIMEOUT, Netki
+from RateLimiter import RateLimiter
+from StringInterner import StringInterner
+from Transport import Transport
+
+
+class ClientPool(object):
+    """
+    Hands out per-partner Netki clients ("views") for managing many sub-partners from one process. All views share
+    one Transport and therefore one connection pool, one set of metrics, one rate limiter, one circuit breaker set
+    and one response / signed header cache in which every partner has its own namespace. A view only holds its
+    credentials, so creating one is cheap.
+
+    Views are kept in an LRU table of at most max_tenants entries. Views of idle partners are evicted and recreated
+    on their next use; their cache entries age out of the shared caches on their own.
+
+        pool = ClientPool(rate_limit=50)
+        partner_client = pool.client('partner api key', 'partner id')
+        partner_client.get_wallet_names()
+
+    Settings changed on a single view, e.g. view.set_timeouts(), apply to that view only. Configure shared behaviour
+    on the pool before handing out views, views obtained earlier keep their settings.
+
+    :param api_url: https://api.netki.com unless otherwise noted
+    :param max_tenants: Maximum number of views kept.
+    :param pool_maxsize: Maximum number of pooled connections to the API.
+    :param rate_limit: (Optional) Calls per second across all partners.
+    :param response_cache_size: (Optional) Size of the shared response cache, see Netki.set_response_cache.
+    :param signed_header_cache_size: (Optional) Size of the shared signed header cache.
+    """
+
+    def __init__(self, api_url='https://api.netki.com', max_tenants=1024, pool_maxsize=10, rate_limit=None,
+                 response_cache_size=None, signed_header_cache_size=4096):
+
+        self.api_url = api_url
+        self.metrics = Metrics()
+        self.transport = Transport(pool_maxsize=pool_maxsize)
+
+        # Attributes every view starts from. Mutable members are shared objects, not copies.
+        self._shared = {
+            'metrics': self.metrics,
+            'transport': self.transport,
+            'timeout': DEFAULT_TIMEOUT,
+            'request_compression_threshold': None,
+            'signed_header_cache': (
+                LRUCache(signed_header_cache_size, self.metrics, 'signed_header_cache')
+                if signed_header_cache_size else None
+            ),
+            'response_cache': (
+                LRUCache(response_cache_size, self.metrics, 'response_cache') if response_cache_size else None
+            ),
+            'string_interner': StringInterner(),
+            'domain_cache': LRUCache(max_tenants, self.metrics, 'domain_cache', ttl=60),
+            'single_flight': None,
+            'circuit_breakers': None,
+            'rate_limiter': RateLimiter(rate_limit, metrics=self.metrics) if rate_limit else None
+        }
+
+        self._views = LRUCache(max_tenants, self.metrics, 'client_pool')
+        self._lock = threading.Lock()
+
+    def client(self, api_key, partner_id):
+        """
+        Returns the view for a partner using API key access.
+
+        :param api_key: Partner API Key
+        :param partner_id: Partner ID
+        :return: Netki client
+        """
+
+        return self.from_credentials(Credentials('api_key', self.api_url, api_key, partner_id, None, None, None))
+
+    def from_credentials(self, credentials):
+        """
+        Returns the view for any credentials, e.g. ``Netki.certificate_api_access(...).credentials``.
+
+        :param credentials: Credentials tuple
+        :return: Netki client
+        """
+
+        view = self._views.get(credentials)
+        if view is not None:
+            return view
+
+        with self._lock:
+            view = self._views.get(credentials)
+            if view is None:
+                view = Netki.__new__(Netki)
+                view.__dict__.update(self._shared)
+                view._credentials = credentials
+                view.cache_namespace = credentials
+                self._views.put(credentials, view)
+
+        return view
+
+    def enable_circuit_breakers(self, **settings):
+        """ Share circuit breakers between all views, see Netki.enable_circuit_breakers. """
+        self._configure('enable_circuit_breakers', **settings)
+
+    def set_timeouts(self, connect=DEFAULT_TIMEOUT[0], read=DEFAULT_TIMEOUT[1]):
+        """ Set the timeouts of all views, see Netki.set_timeouts. """
+        self._configure('set_timeouts', connect=connect, read=read)
+
+    def _configure(self, setter, **settings):
+
+        # Run the Netki setter on a scratch view and share the resulting attributes
+        scratch = Netki.__new__(Netki)
+        scratch.__dict__.update(self._shared)
+        getattr(scratch, setter)(**settings)
+
+        with self._lock:
+            self._shared.update(scratch.__dict__)
+            self._views.clear()
+
+    def __len__(self):
+        return len(self._views)
+
+    def close(self):
+        """ Close all pooled connections. """
+        self.transport.close()
@@ -0,0 +1,145 @@
+__author__ = 'frank'
+
+import socket
+import threading
+import zlib
+
+from Errors import DeadlineExceededError
+
+ACCEPT_ENCODING = 'gzip, deflate'
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamDecoder(object):
+    """
+    Incremental decoder for a gzip, deflate or identity encoded response body.
+
+    :param content_encoding: Value of the response Content-Encoding header.
+    """
+
+    def __init__(self, content_encoding=None):
+
+        self.encoding = (content_encoding or 'identity').strip().lower()
+
+        if self.encoding == 'gzip':
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+            self._first_chunk = True
+        elif self.encoding == 'identity':
+            self._decompressor = None
+        else:
+            raise Exception('Unsupported Content-Encoding: %s' % content_encoding)
+
+    def decode(self, chunk):
+        """ Decode a chunk of wire data and return the decoded bytes available so far. """
+
+        if not self._decompressor:
+            return chunk
+
+        if self.encoding == 'deflate' and self._first_chunk:
+            # Some servers send raw deflate data without the zlib header
+            self._first_chunk = False
+            try:
+                return self._decompressor.decompress(chunk)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        return self._decompressor.decompress(chunk)
+
+    def flush(self):
+        """ Returns any remaining decoded bytes. """
+
+        if not self._decompressor:
+            return b''
+
+        return self._decompressor.flush()
+
+
+class _Watchdog(object):
+    """
+    Shut down the connection of a response after seconds, interrupting a read that is blocked or making slow progress.
+    Read timeouts only bound each read from the socket, so a body trickling in would not be interrupted by them.
+    """
+
+    def __init__(self, response, seconds):
+
+        self.fired = False
+        self._response = response
+        self._timer = threading.Timer(seconds, self._fire)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _fire(self):
+
+        self.fired = True
+        connection = getattr(self._response.raw, '_connection', None)
+        sock = getattr(connection, 'sock', None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def cancel(self):
+        self._timer.cancel()
+
+
+def read_body(response, metrics=None, timeout=None):
+    """
+    Read a streamed response body, decoding it chunk by chunk as it arrives. Wire and decoded byte counts are reported
+    to metrics as ``response_wire_bytes`` and ``response_bytes``.
+
+    :param response: requests.Response opened with stream=True
+    :param metrics: (Optional) Metrics instance
+    :param timeout: (Optional) Seconds the whole body may take to arrive, e.g. the time left until a Deadline. The
+        connection is shut down once they have passed and DeadlineExceededError is raised.
+    :return: Decoded response body.
+    """
+
+    decoder = StreamDecoder(response.headers.get('Content-Encoding'))
+    watchdog = _Watchdog(response, timeout) if timeout is not None else None
+
+    wire_bytes = 0
+    chunks = []
+    try:
+        for chunk in response.raw.stream(CHUNK_SIZE, decode_content=False):
+            wire_bytes += len(chunk)
+            chunks.append(decoder.decode(chunk))
+    except Exception:
+        if watchdog and watchdog.fired:
+            raise DeadlineExceededError('Deadline Exceeded')
+        raise
+    finally:
+        if watchdog:
+            watchdog.cancel()
+
+    # A shut down connection can also end the body early without an error
+    if watchdog and watchdog.fired:
+        raise DeadlineExceededError('Deadline Exceeded')
+
+    chunks.append(decoder.flush())
+
+    body = b''.join(chunks)
+
+    if metrics is not None:
+        metrics.incr('response_wire_bytes', wire_bytes)
+        metrics.incr('response_bytes', len(body))
+
+    return body
+
+
+def compress_body(data, level=6):
+    """
+    Gzip a request body.
+
+    :param data: Serialized request body.
+    :param level: zlib compression level.
+    :return: Gzip encoded body.
+    """
+
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
+
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
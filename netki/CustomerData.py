@@ -0,0 +1,130 @@
+__author__ = 'frank'
+
+from datetime import datetime
+
+from six.moves import zip
+
+from LazyImport import lazy_import
+
+numpy = lazy_import('numpy')
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# numpy datetime64 units whose values convert to datetime objects, coarser units convert to date and finer ones to int
+_NUMPY_DATETIME_UNITS = ('h', 'm', 's', 'ms', 'us')
+
+# Fields never sent with customer data, and the field set from product_id
+_EXCLUDED_FIELDS = ('partner_name', 'product')
+
+
+def build_customer_data_payloads(records, product_id):
+    """
+    Build customer data submission payloads for many records at once. The result is identical to calling
+    Certificate.build_customer_data_payload() for every record, but field filtering and date formatting are done once
+    per column instead of once per value, and each distinct date is formatted only once.
+
+    :param records: List of customer data dictionaries, a pandas DataFrame or a numpy structured array with one
+        customer per row.
+    :param product_id: Product ID for all records, or a list with one Product ID per record.
+    :return: List of dictionaries ready to submit to the API, in record order.
+    """
+
+    if not isinstance(records, (list, tuple)) and not _is_columnar(records):
+        records = list(records)
+
+    if isinstance(product_id, (list, tuple)):
+        if len(product_id) != len(records):
+            raise ValueError('product_id List Must Have One Entry Per Record')
+        product_ids = product_id
+    else:
+        product_ids = [product_id] * len(records)
+
+    if _is_columnar(records):
+        return _columnar_payloads(records, product_ids)
+
+    # Copying the dictionaries is cheap, only the datetime columns need per value work
+    payloads = [dict(record) for record in records]
+    keys = set()
+    for payload, product in zip(payloads, product_ids):
+        keys.update(payload)
+        payload.pop('partner_name', None)
+        payload['product'] = product
+
+    for key in keys.difference(_EXCLUDED_FIELDS):
+        column = [payload.get(key) for payload in payloads]
+        if not any(isinstance(value, datetime) for value in column):
+            continue
+
+        for payload, value, text in zip(payloads, column, _format_dates(column)):
+            if text is not value:
+                payload[key] = text
+
+    return payloads
+
+
+def _is_columnar(records):
+    """ True for numpy structured arrays and pandas DataFrames. """
+
+    return bool(getattr(getattr(records, 'dtype', None), 'names', None)) or (
+        hasattr(records, 'columns') and hasattr(records, 'iloc')
+    )
+
+
+def _columnar_payloads(records, product_ids):
+
+    if hasattr(records, 'columns'):
+        keys = [key for key in records.columns if key not in _EXCLUDED_FIELDS]
+        columns = [_pandas_column(records[key]) for key in keys]
+    else:
+        keys = [name for name in records.dtype.names if name not in _EXCLUDED_FIELDS]
+        columns = [_numpy_column(records[key]) for key in keys]
+
+    keys.append('product')
+    columns = [_format_dates(column) for column in columns]
+    columns.append(product_ids)
+
+    return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def _numpy_column(column):
+
+    if column.dtype.kind == 'M' and numpy.datetime_data(column.dtype)[0] in _NUMPY_DATETIME_UNITS:
+        # NaT converts to None, which is left as is
+        formatted = numpy.datetime_as_string(column, unit='D').tolist()
+        return [None if nat else value for value, nat in zip(formatted, numpy.isnat(column).tolist())]
+
+    return column.tolist()
+
+
+def _pandas_column(series):
+
+    if series.dtype.kind == 'M':
+        # NaT converts to None, as for numpy columns
+        formatted = series.dt.strftime(DATE_FORMAT).tolist()
+        return [None if nat else value for value, nat in zip(formatted, series.isnull().tolist())]
+
+    return series.tolist()
+
+
+def _format_dates(column):
+
+    if not any(isinstance(value, datetime) for value in column):
+        return column
+
+    # Keyed on the calendar date rather than the datetime: timezone aware values at the same instant are equal but may
+    # fall on different dates, and naive and aware values can not be compared at all
+    formatted = {}
+    result = []
+    for value in column:
+        if isinstance(value, datetime) and value != value:
+            # pandas NaT in an object column, a datetime that can not be formatted
+            value = None
+        elif isinstance(value, datetime):
+            key = (value.year, value.month, value.day)
+            text = formatted.get(key)
+            if text is None:
+                text = formatted[key] = value.strftime(DATE_FORMAT)
+            value = text
+        result.append(value)
+
+    return result
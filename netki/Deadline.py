@@ -0,0 +1,170 @@
+__author__ = 'frank'
+
+import random
+import threading
+import time
+
+from Errors import DeadlineExceededError, RateLimitError
+
+_local = threading.local()
+
+
+def _scopes():
+
+    scopes = getattr(_local, 'scopes', None)
+    if scopes is None:
+        scopes = _local.scopes = []
+    return scopes
+
+
+class Deadline(object):
+    """
+    Context manager bounding every Netki API call made by the current thread inside the block. Calls fail with
+    DeadlineExceededError once the deadline has passed, and connect / read timeouts are capped by the time remaining,
+    so a multi-step operation respects the deadline as a whole. Deadlines nest, the earliest one applies. Work
+    submitted to a WorkerPool inside the block inherits the deadline, so its remaining API calls fail fast once the
+    deadline has passed.
+
+    ``timeout`` overrides the client's (connect, read) timeouts for calls in the block, see Netki.set_timeouts.
+
+        with Deadline(30):
+            certificate.submit_customer_data()
+            certificate.submit_certificate_order()
+
+        with Deadline(timeout=(2, 5)):
+            netki.get_domains()
+
+    :param seconds: (Optional) Seconds from now until the deadline.
+    :param timeout: (Optional) Timeout in seconds, or a (connect, read) tuple.
+    """
+
+    def __init__(self, seconds=None, timeout=None):
+
+        self.expires_at = time.time() + seconds if seconds is not None else None
+        self.timeout = timeout
+
+    def remaining(self):
+        """ Seconds left until the deadline, None if this scope has no deadline. """
+
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.time())
+
+    @property
+    def expired(self):
+        return self.expires_at is not None and time.time() >= self.expires_at
+
+    def __enter__(self):
+        _scopes().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _scopes().remove(self)
+
+    @staticmethod
+    def current():
+        """ List of the Deadline scopes active in the calling thread, outermost first. """
+        return list(_scopes())
+
+
+class _ScopeStack(object):
+
+    def __init__(self, scopes):
+        self.scopes = scopes
+
+    def __enter__(self):
+        _scopes().extend(self.scopes)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.scopes:
+            del _scopes()[-len(self.scopes):]
+
+
+def activate(scopes):
+    """
+    Context manager making scopes, as returned by Deadline.current() in another thread, active in the calling thread.
+
+    :param scopes: List of Deadline objects.
+    """
+
+    return _ScopeStack(scopes)
+
+
+def check_deadline(scopes=None, method=None, uri=None):
+    """
+    Raise DeadlineExceededError if any of scopes, by default the calling thread's, has expired.
+
+    :return: Seconds remaining until the earliest deadline, None if there is none.
+    """
+
+    remaining = None
+    for scope in _scopes() if scopes is None else scopes:
+        scope_remaining = scope.remaining()
+        if scope_remaining is not None and (remaining is None or scope_remaining < remaining):
+            remaining = scope_remaining
+
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError('Deadline Exceeded', method=method, uri=uri)
+
+    return remaining
+
+
+def wait_before_retry(attempts, error, backoff, method=None, uri=None):
+    """
+    Sleep before retrying a call that failed with error: exponential backoff with jitter, at least the Retry-After of
+    a RateLimitError. Raises error instead if the wait would outlast the calling thread's deadline, as the retry
+    cannot complete in time.
+
+    :param attempts: Number of attempts made so far.
+    :param error: NetkiError of the last attempt.
+    :param backoff: Seconds to wait before the first retry, doubled for every further retry.
+    """
+
+    delay = backoff * 2 ** (attempts - 1) * (0.5 + random.random() / 2)
+    if isinstance(error, RateLimitError) and error.retry_after:
+        delay = max(delay, error.retry_after)
+
+    remaining = check_deadline(method=method, uri=uri)
+    if remaining is not None and delay >= remaining:
+        raise error
+
+    time.sleep(delay)
+
+
+def effective_timeout(timeout, override=None, method=None, uri=None):
+    """
+    Resolve the timeout for a call made by the calling thread. override, or else the innermost Deadline timeout,
+    replaces the default timeout, and both connect and read timeouts are capped by the time left until the earliest
+    deadline. Raises DeadlineExceededError if a deadline has already passed.
+
+    :param timeout: Default timeout in seconds, a (connect, read) tuple, or None for no timeout.
+    :param override: (Optional) Per-call timeout taking precedence over the default and any Deadline timeout.
+    :return: (connect, read) tuple, or None for no timeout.
+    """
+
+    scopes = _scopes()
+
+    if override is not None:
+        timeout = override
+    else:
+        for scope in reversed(scopes):
+            if scope.timeout is not None:
+                timeout = scope.timeout
+                break
+
+    remaining = check_deadline(scopes, method, uri)
+
+    if timeout is None:
+        connect = read = None
+    elif isinstance(timeout, tuple):
+        connect, read = timeout
+    else:
+        connect = read = timeout
+
+    if remaining is not None:
+        connect = remaining if connect is None else min(connect, remaining)
+        read = remaining if read is None else min(read, remaining)
+
+    if connect is None and read is None:
+        return None
+    return connect, read
@@ -3,6 +3,8 @@ __author__ = 'frank'
 from BaseObject import BaseObject
 from Requestor import process_request
 
+import Routes
+
 
 class Domain(BaseObject):
     """
@@ -32,7 +34,12 @@ class Domain(BaseObject):
         :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. Exception for error responses.
         """
 
-        process_request(self.netki_client, '/v1/partner/domain/' + self.name, 'DELETE')
+        process_request(self.netki_client, Routes.PARTNER_DOMAIN.expand(domain_name=self.name), 'DELETE')
+
+        # Hydrated listings cached by Netki.get_domains(hydrate=True) no longer match
+        domain_cache = getattr(self.netki_client, 'domain_cache', None)
+        if domain_cache is not None:
+            domain_cache.clear()
 
     def load_status(self):
         """
@@ -41,7 +48,7 @@ class Domain(BaseObject):
         :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. Exception for error responses.
         """
 
-        response = process_request(self.netki_client, '/v1/partner/domain/' + self.name, 'GET')
+        response = process_request(self.netki_client, Routes.PARTNER_DOMAIN.expand(domain_name=self.name), 'GET')
 
         self.status = response.get('status')
         self.delegation_status = response.get('delegation_status')
@@ -55,9 +62,20 @@ class Domain(BaseObject):
         :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. Exception for error responses.
         """
 
-        response = process_request(self.netki_client, '/v1/partner/domain/dnssec/' + self.name, 'GET')
+        response = process_request(self.netki_client, Routes.PARTNER_DOMAIN_DNSSEC.expand(domain_name=self.name), 'GET')
 
         self.public_key_signing_key = response.get('public_key_signing_key')
         self.ds_records = response.get('ds_records')
         self.nameservers = response.get('nameservers')
         self.next_roll = response.get('next_roll')
+
+    def refresh(self):
+        """
+        Call refresh() to reload both the domain status and its DNSSEC details. Wrap the call in a Deadline to bound
+        the refresh as a whole.
+
+        :return: Exception for error responses.
+        """
+
+        self.load_status()
+        self.load_dnssec_details()
@@ -0,0 +1,175 @@
+__author__ = 'frank'
+
+from attrdict import AttrDict
+
+
+class NetkiError(Exception):
+    """
+    Error returned by the Netki API, or raised while talking to it. str() gives the API message followed by the
+    individual failure messages, ``message [FAILURES: failure 1, failure 2]``, so existing log parsing keeps working,
+    while the parts are available as attributes.
+
+    :param message: Error message returned by the API.
+    :param status_code: HTTP status code, None when no response was received.
+    :param failures: List of failure dictionaries returned by the API, each with at least a ``message``.
+    :param method: Request method
+    :param uri: Request URI relative to the client api_url.
+    """
+
+    def __init__(self, message, status_code=None, failures=None, method=None, uri=None):
+
+        self.message = message
+        self.status_code = status_code
+        self.failures = [AttrDict(failure) for failure in failures or []]
+        self.method = method
+        self.uri = uri
+
+        super(NetkiError, self).__init__(self._format())
+
+    @property
+    def failure_messages(self):
+        """ List of the individual failure messages. """
+        return [failure.get('message') for failure in self.failures]
+
+    def _format(self):
+
+        message = self.message or ''
+        if self.failures:
+            message += ' [FAILURES: %s]' % ', '.join(self.failure_messages)
+        return message
+
+    def to_dict(self):
+        """ JSON serializable representation, the inverse of NetkiError.from_dict(). """
+
+        return {
+            'type': type(self).__name__,
+            'message': self.message,
+            'status_code': self.status_code,
+            'failures': [dict(failure) for failure in self.failures],
+            'method': self.method,
+            'uri': self.uri
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """
+        Rebuild an error saved with to_dict(). A plain string, as written by older checkpoints, becomes a NetkiError
+        with that message.
+        """
+
+        if not isinstance(data, dict):
+            return NetkiError(data)
+
+        error_class = _ERROR_CLASSES.get(data.get('type'), NetkiError)
+        kwargs = dict((k, v) for k, v in data.items() if k != 'type')
+        return error_class(**kwargs)
+
+    def __reduce__(self):
+        # Keep the structured fields when errors are pickled between worker processes
+        return type(self), (self.message, self.status_code, [dict(f) for f in self.failures], self.method, self.uri)
+
+
+class TransportError(NetkiError):
+    """ The request could not be sent or no response was received. """
+    pass
+
+
+class RequestTimeoutError(TransportError):
+    """ The API did not accept the connection or respond within the timeout. """
+    pass
+
+
+class DeadlineExceededError(RequestTimeoutError):
+    """ The Deadline of the operation passed before the call could be made or completed. """
+    pass
+
+
+class CircuitOpenError(TransportError):
+    """ The call was not sent because the circuit breaker of its endpoint group is open. """
+    pass
+
+
+class AuthenticationError(NetkiError):
+    """ The API rejected the client credentials or signature (401 / 403). """
+    pass
+
+
+class NotFoundError(NetkiError):
+    """ The requested object does not exist (404). """
+    pass
+
+
+class ValidationError(NetkiError):
+    """ The API rejected the submitted data (400 / 409 / 422). ``failures`` lists the offending fields or records. """
+    pass
+
+
+class RateLimitError(NetkiError):
+    """
+    The API is rate limiting the client (429).
+
+    :param retry_after: Seconds to wait before retrying, from the Retry-After header when present.
+    """
+
+    def __init__(self, message, status_code=None, failures=None, method=None, uri=None, retry_after=None):
+
+        self.retry_after = retry_after
+        super(RateLimitError, self).__init__(message, status_code, failures, method, uri)
+
+    def to_dict(self):
+
+        data = super(RateLimitError, self).to_dict()
+        data['retry_after'] = self.retry_after
+        return data
+
+    def __reduce__(self):
+        return type(self), (
+            self.message, self.status_code, [dict(f) for f in self.failures], self.method, self.uri, self.retry_after
+        )
+
+
+_ERROR_CLASSES = dict(
+    (error_class.__name__, error_class)
+    for error_class in (
+        NetkiError, TransportError, RequestTimeoutError, DeadlineExceededError, CircuitOpenError, AuthenticationError,
+        NotFoundError, ValidationError, RateLimitError
+    )
+)
+
+_STATUS_ERRORS = {
+    400: ValidationError,
+    401: AuthenticationError,
+    403: AuthenticationError,
+    404: NotFoundError,
+    409: ValidationError,
+    422: ValidationError,
+    429: RateLimitError
+}
+
+
+def error_from_response(status_code, rdata, method=None, uri=None, headers=None):
+    """
+    Build the NetkiError subclass matching an error response.
+
+    :param status_code: HTTP status code
+    :param rdata: Parsed response body
+    :param method: Request method
+    :param uri: Request URI relative to the client api_url.
+    :param headers: Response headers
+    :return: NetkiError
+    """
+
+    message = rdata.get('message')
+    failures = rdata.get('failures')
+    error_class = _STATUS_ERRORS.get(status_code, NetkiError)
+
+    if error_class is RateLimitError:
+        retry_after = (headers or {}).get('Retry-After')
+        try:
+            retry_after = float(retry_after) if retry_after is not None else None
+        except ValueError:
+            # HTTP-date form is not used by the API
+            retry_after = None
+        return RateLimitError(message, status_code, failures, method, uri, retry_after)
+
+    return error_class(message, status_code, failures, method, uri)
@@ -0,0 +1,257 @@
+__author__ = 'frank'
+
+import bisect
+import json
+import multiprocessing
+import os
+import time
+from datetime import datetime, timedelta
+
+from six.moves import map
+
+from CertificateBundle import parse_certificate
+from Errors import NetkiError
+from Requestor import process_request
+from WorkerPool import WorkerPool
+
+import Routes
+
+_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def _parse_expiry(item):
+    """
+    Process pool worker: parse one PEM into JSON serializable expiry fields. A PEM that can not be parsed yields an
+    error message instead of raising, so one bad certificate does not end the scan.
+    """
+
+    certificate_id, pem = item
+    if not pem:
+        return certificate_id, None, None, None, None
+
+    try:
+        parsed = parse_certificate(pem)
+        subject = dict(
+            (_text(key), _text(value)) for key, value in parsed.subject.items()
+        )
+    except Exception as e:
+        return certificate_id, None, None, None, 'Invalid Certificate: %s' % e
+
+    return certificate_id, parsed.not_after, parsed.serial, subject, None
+
+
+def _text(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+
+class ExpiryIndex(object):
+    """
+    Local index of certificate expiry data, sorted by not_after and persisted to disk as a JSON document. Entries are
+    dictionaries with ``certificate_id``, ``order_status``, ``order_error``, ``not_after`` (naive UTC datetime, None
+    until issued), ``serial``, ``subject`` and ``checked_at`` (epoch seconds of the last status fetch).
+
+    :param path: (Optional) Path the index is loaded from and saved to.
+    """
+
+    def __init__(self, path=None):
+
+        self.path = path
+        self._entries = {}
+        self._sorted = None
+
+        if path and os.path.exists(path):
+            with open(path) as source:
+                for entry in json.load(source)['certificates']:
+                    if entry['not_after']:
+                        entry['not_after'] = datetime.strptime(entry['not_after'], _TIME_FORMAT)
+                    self._entries[entry['certificate_id']] = entry
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, certificate_id):
+        return certificate_id in self._entries
+
+    def get(self, certificate_id):
+        """ Returns the entry of a certificate, None if it is not indexed. """
+        return self._entries.get(certificate_id)
+
+    def update(self, entry):
+        """ Add or replace the entry of a certificate. """
+
+        self._entries[entry['certificate_id']] = entry
+        self._sorted = None
+
+    def entries(self):
+        """ All entries of issued certificates, sorted by not_after. """
+
+        if self._sorted is None:
+            self._sorted = sorted(
+                (entry for entry in self._entries.values() if entry['not_after']),
+                key=lambda entry: (entry['not_after'], entry['certificate_id'])
+            )
+        return self._sorted
+
+    def expiring_before(self, when):
+        """
+        Entries of certificates expiring before when, soonest first.
+
+        :param when: Naive UTC datetime
+        """
+
+        entries = self.entries()
+        return entries[:bisect.bisect_left([entry['not_after'] for entry in entries], when)]
+
+    def save(self):
+        """ Write the index to path, replacing the previous file only once the new one is complete. """
+
+        certificates = []
+        for entry in self.entries() + [e for e in self._entries.values() if not e['not_after']]:
+            entry = dict(entry)
+            if entry['not_after']:
+                entry['not_after'] = entry['not_after'].strftime(_TIME_FORMAT)
+            certificates.append(entry)
+
+        temporary_path = self.path + '.tmp'
+        with open(temporary_path, 'w') as output:
+            json.dump({'certificates': certificates}, output, sort_keys=True)
+            output.flush()
+            os.fsync(output.fileno())
+        os.rename(temporary_path, self.path)
+
+
+class ScanReport(object):
+    """
+    Outcome of an ExpiryScanner run.
+
+    ``errors`` is a list of (certificate_id, NetkiError) tuples for statuses that could not be fetched or certificates
+    that could not be parsed; their previous index entries, if any, are kept. ``expiring`` lists the index entries expiring within the renewal window.
+    """
+
+    def __init__(self):
+
+        self.fetched = 0
+        self.skipped = 0
+        self.errors = []
+        self.expiring = []
+
+
+class ExpiryScanner(object):
+    """
+    Find certificates that are due for renewal across a large fleet. Statuses are fetched up to concurrency at a time
+    and the certificate bundles are parsed in a process pool while fetching continues. Results are kept in an
+    ExpiryIndex persisted at index_path, so later scans only fetch certificates that are new, not yet issued, failed
+    last time, expire within renew_within, or were last checked more than max_age ago.
+
+    :param netki_client: Netki client used for all API calls.
+    :param index_path: Path of the persisted ExpiryIndex.
+    :param renew_within: timedelta of the renewal window.
+    :param concurrency: Maximum number of status requests at once.
+    :param processes: Number of parsing processes, None for one per CPU, 0 to parse in the calling process.
+    :param max_age: (Optional) Seconds after which any indexed certificate is fetched again.
+    """
+
+    def __init__(self, netki_client, index_path, renew_within=timedelta(days=30), concurrency=8, processes=None,
+                 max_age=None):
+
+        self.netki_client = netki_client
+        self.index_path = index_path
+        self.renew_within = renew_within
+        self.concurrency = concurrency
+        self.processes = processes
+        self.max_age = max_age
+
+    def scan(self, ids, now=None):
+        """
+        Scan certificates and update the index.
+
+        :param ids: Certificate IDs to scan.
+        :param now: (Optional) Naive UTC datetime to scan at, defaults to the current time.
+        :return: ScanReport
+        """
+
+        now = now or datetime.utcnow()
+        report = ScanReport()
+        index = ExpiryIndex(self.index_path)
+
+        pending = [certificate_id for certificate_id in ids if self._needs_fetch(index.get(certificate_id), now)]
+        report.skipped = len(ids) - len(pending)
+
+        if pending:
+            statuses = {}
+            try:
+                with WorkerPool(self.concurrency) as pool:
+                    tasks = [(certificate_id, pool.submit(self._fetch, certificate_id)) for certificate_id in pending]
+                    fetched = self._collect(tasks, statuses, report)
+
+                    if self.processes == 0:
+                        parsed = map(_parse_expiry, fetched)
+                        self._apply(index, statuses, parsed, report)
+                    else:
+                        processes = multiprocessing.Pool(self.processes)
+                        try:
+                            self._apply(index, statuses, processes.imap_unordered(_parse_expiry, fetched, 16), report)
+                            processes.close()
+                        except BaseException:
+                            processes.terminate()
+                            raise
+                        finally:
+                            processes.join()
+            finally:
+                # Keep the certificates scanned so far even if the scan is interrupted
+                index.save()
+
+        report.expiring = index.expiring_before(now + self.renew_within)
+        return report
+
+    def _needs_fetch(self, entry, now):
+
+        if entry is None or entry['not_after'] is None:
+            return True
+
+        if entry['not_after'] - now <= self.renew_within:
+            return True
+
+        return self.max_age is not None and time.time() - entry['checked_at'] > self.max_age
+
+    def _fetch(self, certificate_id):
+
+        uri = Routes.CERTIFICATE.expand(certificate_id=certificate_id)
+        return process_request(self.netki_client, uri, 'GET', raise_errors=False)
+
+    @staticmethod
+    def _collect(tasks, statuses, report):
+        """ Yields (certificate_id, pem) as statuses arrive, recording statuses and errors. """
+
+        for certificate_id, task in tasks:
+            response = task.exception() or task.result()
+
+            if isinstance(response, Exception):
+                error = response if isinstance(response, NetkiError) else NetkiError(str(response))
+                report.errors.append((certificate_id, error))
+                continue
+
+            report.fetched += 1
+            statuses[certificate_id] = (response.get('order_status'), response.get('order_error'), time.time())
+
+            bundle = response.get('certificate_bundle') or {}
+            yield certificate_id, bundle.get('certificate')
+
+    @staticmethod
+    def _apply(index, statuses, parsed, report):
+
+        for certificate_id, not_after, serial, subject, error in parsed:
+            if error:
+                report.errors.append((certificate_id, NetkiError(error)))
+                continue
+
+            order_status, order_error, checked_at = statuses[certificate_id]
+            index.update({
+                'certificate_id': certificate_id,
+                'order_status': order_status,
+                'order_error': order_error,
+                'not_after': not_after,
+                'serial': serial,
+                'subject': subject,
+                'checked_at': checked_at
+            })
@@ -0,0 +1,253 @@
+__author__ = 'frank'
+
+import csv
+import json
+import os
+
+import six
+
+from Checkpoint import open_checkpoint, read_checkpoint, write_entry
+from Errors import NetkiError
+from Requestor import process_request
+from WorkerPool import WorkerPool
+
+import Routes
+
+WALLET_NAME_CSV_COLUMNS = ['id', 'domain_name', 'name', 'external_id', 'currency', 'wallet_address']
+DOMAIN_CSV_COLUMNS = ['domain_name', 'public_key_signing_key', 'ds_records', 'nameservers', 'next_roll']
+
+
+class ExportReport(object):
+    """
+    Outcome of an Exporter run.
+
+    ``errors`` is a list of (domain_name, NetkiError) tuples for domains that could not be exported. They are not
+    checkpointed, so running the export again retries them.
+    """
+
+    def __init__(self):
+
+        self.records = 0
+        self.domains = 0
+        self.resumed_domains = 0
+        self.errors = []
+
+
+class _NdjsonWriter(object):
+
+    def __init__(self, output, columns):
+        self.output = output
+
+    def write_header(self):
+        pass
+
+    def write(self, record):
+        self.output.write(json.dumps(record, sort_keys=True) + '\n')
+
+
+class _CsvWriter(object):
+
+    def __init__(self, output, columns):
+        self.columns = columns
+        self.writer = csv.writer(output)
+
+    def write_header(self):
+        self.writer.writerow(self.columns)
+
+    def write(self, record):
+        self.writer.writerow([self._cell(record.get(column)) for column in self.columns])
+
+    @staticmethod
+    def _cell(value):
+
+        if value is None:
+            return ''
+        if isinstance(value, (list, tuple, dict)):
+            # Lists such as ds_records keep their structure as a JSON cell
+            value = json.dumps(value)
+        if isinstance(value, six.text_type):
+            value = value.encode('utf-8')
+        return value
+
+
+_WRITERS = {'ndjson': _NdjsonWriter, 'csv': _CsvWriter}
+
+
+class Exporter(object):
+    """
+    Export Wallet Names or domains to an NDJSON or CSV file for audits. Records are fetched domain by domain, up to
+    concurrency domains at a time, and written as soon as a domain's response arrives in domain order, so memory use
+    is bounded by the largest domain rather than by the whole account.
+
+    When a checkpoint_path is given, every exported domain is recorded in it together with the output file size at
+    that point. Running the same export again with the same paths skips exported domains and appends the rest; any
+    partially written domain from an interrupted run is truncated from the output first.
+
+    NDJSON records are the API objects. CSV Wallet Name exports have one row per wallet address, or a single row
+    without currency for a Wallet Name without wallets. List values such as ds_records are written as JSON cells.
+
+    :param netki_client: Netki client used for all API calls.
+    :param path: Output file path.
+    :param format: ``ndjson`` or ``csv``
+    :param checkpoint_path: (Optional) Path of the checkpoint file.
+    :param concurrency: Maximum number of domains fetched at once.
+    """
+
+    def __init__(self, netki_client, path, format='ndjson', checkpoint_path=None, concurrency=8):
+
+        if format not in _WRITERS:
+            raise ValueError('Unsupported Export Format: %s' % format)
+
+        self.netki_client = netki_client
+        self.path = path
+        self.format = format
+        self.checkpoint_path = checkpoint_path
+        self.concurrency = concurrency
+
+    def export_wallet_names(self, domain_names=None):
+        """
+        Export every Wallet Name with its wallets.
+
+        :param domain_names: (Optional) Domains to export, defaults to all partner domains.
+        :return: ExportReport
+        """
+
+        return self._export(domain_names, self._fetch_wallet_names, WALLET_NAME_CSV_COLUMNS)
+
+    def export_domains(self, domain_names=None):
+        """
+        Export every domain with its DNSSEC details. DNSSEC details are looked up concurrently.
+
+        :param domain_names: (Optional) Domains to export, defaults to all partner domains.
+        :return: ExportReport
+        """
+
+        return self._export(domain_names, self._fetch_domain, DOMAIN_CSV_COLUMNS)
+
+    def _fetch_wallet_names(self, domain_name):
+
+        uri = Routes.WALLET_NAMES.expand(query=[('domain_name', domain_name)])
+        response = process_request(self.netki_client, uri, 'GET', raise_errors=False)
+
+        if isinstance(response, NetkiError) or not response.get('wallet_name_count'):
+            return response if isinstance(response, NetkiError) else []
+
+        records = []
+        for wn in response.get('wallet_names'):
+            record = {
+                'id': wn.get('id'),
+                'domain_name': wn['domain_name'],
+                'name': wn['name'],
+                'external_id': wn.get('external_id')
+            }
+            wallets = wn.get('wallets') or []
+
+            if self.format == 'csv':
+                for wallet in wallets:
+                    row = dict(record)
+                    row['currency'] = wallet['currency']
+                    row['wallet_address'] = wallet['wallet_address']
+                    records.append(row)
+                if not wallets:
+                    records.append(record)
+            else:
+                record['wallets'] = [
+                    {'currency': wallet['currency'], 'wallet_address': wallet['wallet_address']} for wallet in wallets
+                ]
+                records.append(record)
+
+        return records
+
+    def _fetch_domain(self, domain_name):
+
+        uri = Routes.PARTNER_DOMAIN_DNSSEC.expand(domain_name=domain_name)
+        response = process_request(self.netki_client, uri, 'GET', raise_errors=False)
+
+        if isinstance(response, NetkiError):
+            return response
+
+        return [{
+            'domain_name': domain_name,
+            'public_key_signing_key': response.get('public_key_signing_key'),
+            'ds_records': list(response.get('ds_records') or []),
+            'nameservers': list(response.get('nameservers') or []),
+            'next_roll': response.get('next_roll')
+        }]
+
+    def _export(self, domain_names, fetch, columns):
+
+        report = ExportReport()
+
+        if domain_names is None:
+            domains = process_request(self.netki_client, Routes.DOMAINS.expand(), 'GET').get('domains') or []
+            domain_names = [d['domain_name'] for d in domains]
+
+        completed, offset = self._load_checkpoint()
+        pending = [name for name in domain_names if name not in completed]
+        report.resumed_domains = len(domain_names) - len(pending)
+
+        output = self._open_output(offset)
+        checkpoint = open_checkpoint(self.checkpoint_path) if self.checkpoint_path else None
+        writer = _WRITERS[self.format](output, columns)
+
+        try:
+            if output.tell() == 0:
+                writer.write_header()
+
+            with WorkerPool(self.concurrency) as pool:
+                # Keep a bounded window of domains in flight and write them in order
+                window = 2 * self.concurrency
+                tasks = [pool.submit(fetch, name) for name in pending[:window]]
+
+                for index, domain_name in enumerate(pending):
+                    if index + window < len(pending):
+                        tasks.append(pool.submit(fetch, pending[index + window]))
+
+                    task = tasks[index]
+                    tasks[index] = None
+                    records = task.exception() or task.result()
+
+                    if isinstance(records, Exception):
+                        error = records if isinstance(records, NetkiError) else NetkiError(str(records))
+                        report.errors.append((domain_name, error))
+                        continue
+
+                    for record in records:
+                        writer.write(record)
+                    report.records += len(records)
+                    report.domains += 1
+
+                    output.flush()
+                    if checkpoint:
+                        write_entry(checkpoint, {'domain_name': domain_name, 'offset': output.tell()})
+        finally:
+            output.close()
+            if checkpoint:
+                checkpoint.close()
+
+        return report
+
+    def _open_output(self, offset):
+
+        if offset is None:
+            return open(self.path, 'wb')
+
+        if not os.path.exists(self.path):
+            raise ValueError('Export Output Missing For Checkpoint: %s' % self.path)
+
+        # Drop anything written after the last checkpointed domain
+        output = open(self.path, 'r+b')
+        output.truncate(offset)
+        output.seek(offset)
+        return output
+
+    def _load_checkpoint(self):
+
+        completed = set()
+        offset = None
+
+        for entry in read_checkpoint(self.checkpoint_path):
+            completed.add(entry['domain_name'])
+            offset = entry['offset']
+
+        return completed, offset
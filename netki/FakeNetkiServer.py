@@ -0,0 +1,318 @@
+__author__ = 'frank'
+
+import hashlib
+import json
+import re
+import socket
+import sys
+import threading
+import time
+import zlib
+
+from six.moves import BaseHTTPServer, socketserver
+from six.moves.urllib.parse import parse_qsl, urlsplit
+
+
+class RecordedRequest(object):
+    """
+    Request received by the FakeNetkiServer.
+
+    :param method: HTTP method
+    :param path: Request path without the query string
+    :param query: Dictionary of query string arguments
+    :param headers: Dictionary of request headers
+    :param raw_body: Body bytes as received on the wire
+    :param body: Decoded and parsed JSON body, None if the request had no body
+    """
+
+    def __init__(self, method, path, query, headers, raw_body, body):
+
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+        self.raw_body = raw_body
+        self.body = body
+
+
+class RawBody(object):
+    """
+    Route response body sent as is instead of as JSON, e.g. the HTML error page of a gateway.
+
+    :param data: Body bytes
+    :param content_type: Content-Type header
+    :param byte_delay: (Optional) Seconds to wait before sending each byte, to simulate a slow connection.
+    """
+
+    def __init__(self, data, content_type='text/html', byte_delay=None):
+
+        self.data = data
+        self.content_type = content_type
+        self.byte_delay = byte_delay
+
+
+class FakeNetkiServer(object):
+    """
+    Local stand-in for the Netki API used by integration tests. The server listens on an ephemeral localhost port and
+    answers from registered routes.
+
+    Routes are registered with route(). A route response is either a static (status, body) tuple or a callable
+    receiving the RecordedRequest plus any regex groups and returning (status, body) or (status, body, headers).
+    The body is sent as JSON, unless it is a RawBody.
+
+    :param response_encoding: Encoding applied to responses when the client accepts it. ``gzip``, ``deflate`` or None
+    :param accept_compressed_requests: When False, gzip request bodies are rejected with 415.
+    Faults added with inject_fault() take precedence over routes, to simulate an unhealthy API.
+
+    :param etags: When True, successful GET responses carry an ETag and matching If-None-Match requests get a 304.
+        Responses returning a Last-Modified header are also answered with 304 for a matching If-Modified-Since.
+    """
+
+    def __init__(self, response_encoding='gzip', accept_compressed_requests=True, etags=False):
+
+        self.response_encoding = response_encoding
+        self.accept_compressed_requests = accept_compressed_requests
+        self.etags = etags
+        self.requests = []
+
+        self._routes = []
+        self._faults = []
+        self._lock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self._httpd.server_address[1]
+
+    def route(self, method, pattern, response):
+        """
+        Register a route. Later registrations take precedence.
+
+        :param method: HTTP method
+        :param pattern: Regular expression that must match the whole request path. ``/v1/certificate/(\\w+)``
+        :param response: (status, body) tuple or callable
+        """
+
+        self._routes.insert(0, (method, re.compile(pattern + '$'), response))
+
+    def inject_fault(self, pattern='.*', status=503, times=None, drop_connection=False):
+        """
+        Fail matching requests until the fault is cleared or has been applied times times.
+
+        :param pattern: Regular expression that must match the whole request path.
+        :param status: Status code returned for matching requests.
+        :param times: (Optional) Number of requests to fail.
+        :param drop_connection: Close the connection without responding instead of returning status.
+        """
+
+        with self._lock:
+            self._faults.append([re.compile(pattern + '$'), status, times, drop_connection])
+
+    def clear_faults(self):
+        """ Remove all injected faults. """
+        with self._lock:
+            del self._faults[:]
+
+    def take_fault(self, request):
+        """ Returns the (status, drop_connection) fault applying to request, None if it should be served. """
+
+        with self._lock:
+            for fault in self._faults:
+                pattern, status, times, drop_connection = fault
+                if pattern.match(request.path):
+                    if times is not None:
+                        fault[2] -= 1
+                        if fault[2] <= 0:
+                            self._faults.remove(fault)
+                    return status, drop_connection
+        return None
+
+    def start(self):
+
+        server = self
+
+        class Handler(_Handler):
+            fake_server = server
+
+        self._httpd = _ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever, kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+
+        return self
+
+    def stop(self):
+
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd.close_connections()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def record(self, request):
+
+        with self._lock:
+            self.requests.append(request)
+
+    def dispatch(self, request):
+
+        for method, pattern, response in self._routes:
+            match = pattern.match(request.path)
+            if method == request.method and match:
+                if callable(response):
+                    return response(request, *match.groups())
+                return response
+
+        return 404, {'success': False, 'message': 'Not Found'}
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class):
+
+        BaseHTTPServer.HTTPServer.__init__(self, server_address, handler_class)
+        self._connections = set()
+        self._connections_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+
+        with self._connections_lock:
+            self._connections.add(request)
+        socketserver.ThreadingMixIn.process_request(self, request, client_address)
+
+    def shutdown_request(self, request):
+
+        with self._connections_lock:
+            self._connections.discard(request)
+        BaseHTTPServer.HTTPServer.shutdown_request(self, request)
+
+    def close_connections(self):
+        """ End kept-alive client connections, so their handler threads finish instead of outliving the server. """
+
+        with self._connections_lock:
+            connections = list(self._connections)
+
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a slow response (timeouts, deadlines) are expected, not worth a traceback
+        if not isinstance(sys.exc_info()[1], socket.error):
+            BaseHTTPServer.HTTPServer.handle_error(self, request, client_address)
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    fake_server = None
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle()
+
+    def do_POST(self):
+        self._handle()
+
+    def do_PUT(self):
+        self._handle()
+
+    def do_DELETE(self):
+        self._handle()
+
+    def _handle(self):
+
+        server = self.fake_server
+        split = urlsplit(self.path)
+
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        headers = dict((k.lower(), v) for k, v in self.headers.items())
+
+        body = raw_body
+        if headers.get('content-encoding') == 'gzip':
+            if not server.accept_compressed_requests:
+                server.record(RecordedRequest(self.command, split.path, dict(parse_qsl(split.query)), headers,
+                                              raw_body, None))
+                return self._respond(415, {'success': False, 'message': 'Unsupported Media Type'}, {})
+            body = zlib.decompress(raw_body, 16 + zlib.MAX_WBITS)
+
+        request = RecordedRequest(
+            self.command,
+            split.path,
+            dict(parse_qsl(split.query)),
+            headers,
+            raw_body,
+            json.loads(body.decode('utf-8')) if body else None
+        )
+        server.record(request)
+
+        fault = server.take_fault(request)
+        if fault:
+            status, drop_connection = fault
+            if drop_connection:
+                self.close_connection = 1
+                return
+            return self._respond(status, {'success': False, 'message': 'Injected Fault'}, {})
+
+        result = server.dispatch(request)
+        status, rbody = result[0], result[1]
+        extra_headers = dict(result[2]) if len(result) > 2 else {}
+
+        if request.method == 'GET' and status == 200:
+            if server.etags:
+                extra_headers['ETag'] = '"%s"' % hashlib.sha1(json.dumps(rbody, sort_keys=True)).hexdigest()
+
+            etag_matches = 'ETag' in extra_headers and headers.get('if-none-match') == extra_headers['ETag']
+            date_matches = ('Last-Modified' in extra_headers and
+                            headers.get('if-modified-since') == extra_headers['Last-Modified'])
+            if etag_matches or date_matches:
+                status, rbody = 304, None
+
+        self._respond(status, rbody, extra_headers)
+
+    def _respond(self, status, rbody, extra_headers):
+
+        raw = rbody if isinstance(rbody, RawBody) else None
+        if raw:
+            payload = raw.data
+        else:
+            payload = json.dumps(rbody).encode('utf-8') if rbody is not None else b''
+
+        encoding = self.fake_server.response_encoding
+        if payload and not raw and encoding and encoding in (self.headers.get('Accept-Encoding') or ''):
+            if encoding == 'gzip':
+                compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            else:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS)
+            payload = compressor.compress(payload) + compressor.flush()
+        else:
+            encoding = None
+
+        self.send_response(status)
+        self.send_header('Content-Type', raw.content_type if raw else 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        if encoding:
+            self.send_header('Content-Encoding', encoding)
+        for name, value in extra_headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+
+        if payload and raw and raw.byte_delay:
+            for index in range(len(payload)):
+                time.sleep(raw.byte_delay)
+                self.wfile.write(payload[index:index + 1])
+                self.wfile.flush()
+        elif payload:
+            self.wfile.write(payload)
@@ -0,0 +1,366 @@
+__author__ = 'frank'
+
+import csv
+import json
+import re
+import threading
+import time
+
+import six
+
+from CircuitBreaker import is_failure
+from Deadline import wait_before_retry
+from Errors import NetkiError
+from Requestor import process_request
+from WorkerPool import WorkerPool
+
+import Routes
+
+# Three or four letter currency identifiers per the Netki API documentation, e.g. btc, ltc, oap
+_CURRENCY = re.compile(r'^[a-z0-9]{3,4}$')
+# Wallet addresses and URIs are printable ASCII without whitespace
+_WALLET_ADDRESS = re.compile(r'^[\x21-\x7e]{1,512}$')
+
+
+def validate_wallet_name(record):
+    """
+    Cheap local validation of a Wallet Name record before it is sent to the API.
+
+    :param record: Dictionary in the ``wallet_names`` API format.
+    :return: Error message, None if the record is valid.
+    """
+
+    if not isinstance(record, dict):
+        return 'Invalid Wallet Name Record'
+
+    if not record.get('domain_name'):
+        return 'domain_name Required'
+    if not isinstance(record['domain_name'], six.string_types):
+        return 'Invalid domain_name'
+
+    if not record.get('name'):
+        return 'name Required'
+    if not isinstance(record['name'], six.string_types):
+        return 'Invalid name'
+
+    wallets = record.get('wallets')
+    if not wallets:
+        return 'At Least One Wallet Required'
+    if not isinstance(wallets, list):
+        return 'Invalid Wallets'
+
+    for wallet in wallets:
+        if not isinstance(wallet, dict):
+            return 'Invalid Wallets'
+
+        currency = wallet.get('currency') or ''
+        if not isinstance(currency, six.string_types) or not _CURRENCY.match(currency):
+            return 'Invalid Currency: %s' % (currency,)
+
+        wallet_address = wallet.get('wallet_address') or ''
+        if not isinstance(wallet_address, six.string_types) or not _WALLET_ADDRESS.match(wallet_address):
+            return 'Invalid Wallet Address for %s' % currency
+
+    return None
+
+
+def read_domain_names(path, format='ndjson'):
+    """
+    Returns the set of domain names referenced by an import file, read in one streaming pass. Unparseable lines are
+    skipped, the import itself rejects them.
+
+    :param path: Input file path.
+    :param format: ``ndjson`` or ``csv``
+    """
+
+    domain_names = set()
+
+    with open(path, 'rb') as source:
+        if format == 'csv':
+            for row in csv.DictReader(source):
+                if row.get('domain_name'):
+                    domain_names.add(row['domain_name'])
+            return domain_names
+
+        for line in source:
+            try:
+                domain_name = json.loads(line).get('domain_name')
+            except (ValueError, AttributeError):
+                continue
+            if domain_name:
+                domain_names.add(domain_name)
+
+    return domain_names
+
+
+def fetch_existing_ids(netki_client, domain_names, concurrency=4):
+    """
+    Look up the ids of the Wallet Names that exist in the given domains, one domain per request with up to
+    concurrency requests at once.
+
+    :return: Dictionary of (domain_name, name) to Wallet Name id, for use as Importer existing_ids.
+    """
+
+    def fetch(domain_name):
+        uri = Routes.WALLET_NAMES.expand(query=[('domain_name', domain_name)])
+        response = process_request(netki_client, uri, 'GET')
+        if not response.get('wallet_name_count'):
+            return []
+        return [((wn['domain_name'], wn['name']), wn['id']) for wn in response.get('wallet_names')]
+
+    existing_ids = {}
+    with WorkerPool(concurrency) as pool:
+        for task in pool.map(fetch, sorted(domain_names)):
+            existing_ids.update(task.result())
+
+    return existing_ids
+
+
+class ImportReport(object):
+    """
+    Progress and outcome of an Importer run, updated while the import runs.
+
+    ``rows`` counts input lines read, ``imported`` and ``rejected`` count Wallet Names. Rejected Wallet Names are
+    written to the reject file.
+    """
+
+    def __init__(self):
+
+        self.rows = 0
+        self.imported = 0
+        self.rejected = 0
+        self.batches = 0
+        self.started_at = time.time()
+        self.finished_at = None
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.time()) - self.started_at
+
+    @property
+    def rows_per_second(self):
+        elapsed = self.elapsed
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+
+class Importer(object):
+    """
+    Bulk import Wallet Names from NDJSON or CSV files, in the formats written by Export.Exporter. Input is streamed
+    from disk, validated locally and grouped into ``wallet_names`` batches, POSTed for new Wallet Names and PUT for
+    records with an id. Up to concurrency batches are in flight at once over the client's pooled connections, and
+    reading pauses while that many more batches are waiting, so memory stays bounded for any file size.
+
+    Batches failing with a transient error (transport errors, timeouts, rate limiting and 5xx responses) are retried
+    up to max_attempts with exponential backoff and jitter, honouring Retry-After. When the API rejects a batch and its
+    ``failures`` name the offending Wallet Names by domain_name and name, only those are rejected and the rest of the
+    batch is sent again; otherwise the whole batch is rejected.
+
+    Wallet Names failing validation or rejected by the API are written to reject_path as NDJSON records with ``line``
+    and ``error`` keys added. A reject file can be imported again once corrected.
+
+    CSV input has one row per wallet address; consecutive rows with the same domain_name and name form one Wallet
+    Name.
+
+    :param netki_client: Netki client used for all API calls.
+    :param reject_path: Path of the reject file.
+    :param format: ``ndjson`` or ``csv``
+    :param batch_size: Number of Wallet Names per API request.
+    :param concurrency: Maximum number of batches in flight at once.
+    :param progress: (Optional) Callable receiving the ImportReport after every completed batch.
+    :param existing_ids: (Optional) Dictionary of (domain_name, name) to the id of Wallet Names that already exist.
+        Matching records without an id update the existing Wallet Name instead of creating one.
+    :param max_attempts: Maximum number of requests per batch.
+    :param backoff: Seconds to wait before the first retry, doubled for every further retry.
+    """
+
+    def __init__(self, netki_client, reject_path, format='ndjson', batch_size=100, concurrency=4, progress=None,
+                 existing_ids=None, max_attempts=4, backoff=0.5):
+
+        if format not in ('ndjson', 'csv'):
+            raise ValueError('Unsupported Import Format: %s' % format)
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+
+        self.netki_client = netki_client
+        self.reject_path = reject_path
+        self.format = format
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.progress = progress
+        self.existing_ids = existing_ids or {}
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+
+        self._lock = threading.Lock()
+        self._rejects = None
+        self._report = None
+
+    def run(self, path):
+        """
+        Import every Wallet Name in path.
+
+        :param path: Input file path.
+        :return: ImportReport
+        """
+
+        self._report = report = ImportReport()
+        batches = {'POST': [], 'PUT': []}
+        # Batches queued or in flight, bounded so reading never runs far ahead of the API
+        slots = threading.BoundedSemaphore(2 * self.concurrency)
+
+        with open(path, 'rb') as source, open(self.reject_path, 'wb') as rejects:
+            self._rejects = rejects
+
+            with WorkerPool(self.concurrency) as pool:
+                for line, record in self._read(source):
+                    error = validate_wallet_name(record)
+                    if error:
+                        self._reject([(line, record)], error)
+                        continue
+
+                    if not record.get('id'):
+                        existing_id = self.existing_ids.get((record['domain_name'], record['name']))
+                        if existing_id:
+                            record['id'] = existing_id
+
+                    method = 'PUT' if record.get('id') else 'POST'
+                    batch = batches[method]
+                    batch.append((line, record))
+                    if len(batch) >= self.batch_size:
+                        self._submit(pool, slots, method, batch)
+                        del batch[:]
+
+                for method, batch in batches.items():
+                    if batch:
+                        self._submit(pool, slots, method, batch)
+
+        report.finished_at = time.time()
+        return report
+
+    def _read(self, source):
+
+        if self.format == 'ndjson':
+            for line_number, line in enumerate(source, 1):
+                with self._lock:
+                    self._report.rows += 1
+                if not line.strip():
+                    continue
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    self._reject([(line_number, {'raw': line.rstrip('\n')})], 'Invalid JSON')
+            return
+
+        reader = csv.DictReader(source)
+        current = None
+        for row in reader:
+            with self._lock:
+                self._report.rows += 1
+
+            key = (row.get('domain_name'), row.get('name'))
+            if current is None or (current[1]['domain_name'], current[1]['name']) != key:
+                if current is not None:
+                    yield current
+                current = (reader.line_num, {
+                    'domain_name': row.get('domain_name'),
+                    'name': row.get('name'),
+                    'external_id': row.get('external_id') or None,
+                    'wallets': []
+                })
+                if row.get('id'):
+                    current[1]['id'] = row['id']
+
+            if row.get('currency'):
+                current[1]['wallets'].append({'currency': row['currency'], 'wallet_address': row.get('wallet_address')})
+
+        if current is not None:
+            yield current
+
+    def _submit(self, pool, slots, method, batch):
+
+        slots.acquire()
+        pool.submit(self._send, slots, method, list(batch))
+
+    def _send(self, slots, method, batch):
+
+        try:
+            uri = Routes.WALLET_NAMES.expand()
+            pending = list(batch)
+            attempts = 0
+
+            while pending:
+                attempts += 1
+                payload = {'wallet_names': [self._api_data(record) for line, record in pending]}
+                try:
+                    response = process_request(self.netki_client, uri, method, payload, raise_errors=False)
+                except Exception as e:
+                    response = e if isinstance(e, NetkiError) else NetkiError(str(e))
+
+                if not isinstance(response, NetkiError):
+                    with self._lock:
+                        self._report.imported += len(pending)
+                    self.netki_client.metrics.incr('import_wallet_names', len(pending))
+                    break
+
+                if is_failure(response) and attempts < self.max_attempts:
+                    try:
+                        wait_before_retry(attempts, response, self.backoff, method, uri)
+                        continue
+                    except NetkiError as e:
+                        response = e
+
+                rejected = self._rejected_by(pending, response)
+                if not rejected or is_failure(response):
+                    self._reject(pending, str(response))
+                    break
+
+                for entry, error in rejected:
+                    self._reject([entry], error)
+                rejected_lines = set(line for (line, record), error in rejected)
+                pending = [(line, record) for line, record in pending if line not in rejected_lines]
+
+            with self._lock:
+                self._report.batches += 1
+
+            if self.progress:
+                self.progress(self._report)
+        finally:
+            slots.release()
+
+    @staticmethod
+    def _rejected_by(pending, error):
+        """ Returns (entry, error message) tuples for the entries named by the failures of error. """
+
+        entries = dict(((record['domain_name'], record['name']), (line, record)) for line, record in pending)
+        rejected = []
+
+        for failure in error.failures:
+            entry = entries.pop((failure.get('domain_name'), failure.get('name')), None)
+            if entry:
+                rejected.append((entry, str(NetkiError(error.message, error.status_code, [failure]))))
+
+        return rejected
+
+    @staticmethod
+    def _api_data(record):
+
+        data = {
+            'domain_name': record['domain_name'],
+            'name': record['name'],
+            'wallets': [{'currency': w['currency'], 'wallet_address': w['wallet_address']} for w in record['wallets']],
+            'external_id': record.get('external_id')
+        }
+        if record.get('id'):
+            data['id'] = record['id']
+        return data
+
+    def _reject(self, entries, error):
+
+        with self._lock:
+            for line, record in entries:
+                rejected = dict(record) if isinstance(record, dict) else {'raw': record}
+                rejected['line'] = line
+                rejected['error'] = error
+                self._rejects.write(json.dumps(rejected, sort_keys=True) + '\n')
+            self._rejects.flush()
+            self._report.rejected += len(entries)
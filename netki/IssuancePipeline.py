@@ -0,0 +1,383 @@
+__author__ = 'frank'
+
+import heapq
+import itertools
+import threading
+import time
+
+from Checkpoint import open_checkpoint, read_checkpoint, write_entry
+from Deadline import Deadline, activate
+from Errors import NetkiError, TransportError
+from WorkerPool import WorkerPool
+
+CUSTOMER_DATA = 'customer_data'
+ORDER = 'order'
+CSR = 'csr'
+STATUS = 'status'
+ISSUED = 'issued'
+
+STAGES = (CUSTOMER_DATA, ORDER, CSR, STATUS)
+# Stages whose API call creates something, and may have taken effect even if the pipeline never saw the response
+SUBMISSIONS = (CUSTOMER_DATA, ORDER, CSR)
+
+
+class IssuanceOrder(object):
+    """
+    One certificate moving through an IssuancePipeline.
+
+    :param key: Unique key of the order, e.g. a customer reference. Used to resume the order after a crash.
+    :param certificate: Certificate object with customer_data and product_id set.
+    :param pkey: OpenSSL.crypto.PKey used to sign the CSR. Private keys are never persisted, so orders resumed before
+        their CSR was submitted need it again.
+    """
+
+    def __init__(self, key, certificate, pkey=None):
+
+        self.key = key
+        self.certificate = certificate
+        self.pkey = pkey
+        self.stage = CUSTOMER_DATA
+        self.in_flight = None
+        self.error = None
+        self.next_poll_at = None
+
+    @property
+    def issued(self):
+        return self.stage == ISSUED
+
+    def state(self):
+        """ JSON serializable state persisted before every submission and after every stage. """
+
+        return {
+            'key': self.key,
+            'stage': self.stage,
+            'in_flight': self.in_flight,
+            'data_token': self.certificate.data_token,
+            'certificate_id': self.certificate.id,
+            'order_status': self.certificate.order_status,
+            'error': self.error.to_dict() if self.error else None
+        }
+
+    def restore(self, state):
+        """
+        Continue from a state saved by state(). A failed stage is run again, unless its submission was interrupted
+        (see IssuancePipeline).
+        """
+
+        self.stage = state['stage']
+        self.in_flight = state.get('in_flight')
+        self.certificate.data_token = state['data_token']
+        self.certificate.id = state['certificate_id']
+        self.certificate.order_status = state['order_status']
+
+
+class IssuanceReport(object):
+    """
+    Outcome of an IssuancePipeline run. ``failed`` holds the orders whose stage raised, with ``order.stage`` the
+    stage that failed and ``order.error`` its NetkiError. ``stages`` holds per stage statistics: ``completed``,
+    ``errors``, ``throughput`` (completions per second over the run) and the stage ``latency`` timing summary.
+    """
+
+    def __init__(self):
+
+        self.issued = []
+        self.failed = []
+        self.resumed = 0
+        self.elapsed = 0.0
+        self.stages = {}
+
+
+class IssuancePipeline(object):
+    """
+    Drive many certificate orders through submit_customer_data, submit_certificate_order, submit_csr and get_status
+    polling. Every stage has its own WorkerPool, so thousands of orders move through the stages concurrently, and
+    each stage admits at most queue_size + its concurrency orders at once. A full stage blocks the stage feeding it,
+    and ultimately run(), so memory and in-flight work stay bounded however many orders are submitted.
+
+    Orders waiting for their next status poll keep their place in the status stage but not a worker; a scheduler
+    thread hands them back to the status workers once poll_interval has passed.
+
+    When a state_path is given, the state of every order is appended to it as a JSON line after each stage, and
+    before each submission (customer data, order and CSR) with the submission marked in flight. Running the same
+    orders again with the same state_path skips issued orders and resumes the rest at the stage they reached, without
+    repeating completed API calls. A submission still marked in flight may have reached the API, e.g. when the run
+    crashed or the request timed out before the response arrived. Customer data is submitted again, as an extra token
+    is harmless, but interrupted order and CSR submissions are reported as failed rather than repeated, as a second
+    order is charged again. Check those orders, then run them with retry_interrupted to submit them again.
+
+    Per stage metrics are recorded on the client's metrics: ``pipeline_<stage>`` and ``pipeline_<stage>_errors``
+    counters and a ``pipeline_<stage>_latency`` timing.
+
+    :param netki_client: Netki client used for all API calls.
+    :param concurrency: Worker count for every stage, or a dictionary of stage name to worker count.
+    :param queue_size: Number of orders that may wait for each stage.
+    :param state_path: (Optional) Path of the order state file.
+    :param poll_interval: Seconds between status polls of an order.
+    :param stripe_token: (Optional) Stripe token passed to submit_certificate_order.
+    :param retry_interrupted: Run order and CSR submissions that were interrupted in a previous run again.
+    """
+
+    def __init__(self, netki_client, concurrency=4, queue_size=100, state_path=None, poll_interval=30,
+                 stripe_token=None, retry_interrupted=False):
+
+        if not isinstance(concurrency, dict):
+            concurrency = dict((stage, concurrency) for stage in STAGES)
+
+        self.netki_client = netki_client
+        self.concurrency = dict((stage, concurrency.get(stage, 4)) for stage in STAGES)
+        self.queue_size = queue_size
+        self.state_path = state_path
+        self.poll_interval = poll_interval
+        self.stripe_token = stripe_token
+        self.retry_interrupted = retry_interrupted
+
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._slots = {}
+        self._state = None
+        self._report = None
+        self._outstanding = 0
+        self._done = threading.Event()
+
+        # Orders waiting for a status poll, a heap of (next_poll_at, sequence, order, deadlines)
+        self._polls = []
+        self._polls_changed = threading.Condition()
+        self._polling = False
+        self._sequence = itertools.count()
+
+    def run(self, orders):
+        """
+        Run every order to completion.
+
+        :param orders: List of IssuanceOrder objects with unique keys.
+        :return: IssuanceReport
+        """
+
+        self._report = report = IssuanceReport()
+        started_at = time.time()
+        before = dict((stage, self._counts(stage)) for stage in STAGES)
+
+        states = {}
+        for entry in read_checkpoint(self.state_path):
+            states[entry['key']] = entry
+
+        pending = []
+        for order in orders:
+            if order.certificate.netki_client is None:
+                order.certificate.set_netki_client(self.netki_client)
+
+            state = states.get(order.key)
+            if state:
+                order.restore(state)
+                report.resumed += 1
+            if order.issued:
+                report.issued.append(order)
+            elif order.in_flight and not self._reconcile(order):
+                report.failed.append(order)
+            else:
+                pending.append(order)
+
+        self._outstanding = len(pending)
+        self._done.clear()
+        if not pending:
+            self._done.set()
+
+        self._state = open_checkpoint(self.state_path) if self.state_path else None
+        self._pools = dict((stage, WorkerPool(self.concurrency[stage])) for stage in STAGES)
+        self._slots = dict(
+            (stage, threading.BoundedSemaphore(self.queue_size + self.concurrency[stage])) for stage in STAGES
+        )
+
+        del self._polls[:]
+        self._polling = True
+        poller = threading.Thread(target=self._poll_when_due)
+        poller.daemon = True
+        poller.start()
+
+        try:
+            for order in pending:
+                self._enter(order, order.stage)
+            self._done.wait()
+        finally:
+            with self._polls_changed:
+                self._polling = False
+                self._polls_changed.notify()
+            poller.join()
+            for pool in self._pools.values():
+                pool.shutdown()
+            if self._state:
+                self._state.close()
+
+        report.elapsed = time.time() - started_at
+        for stage in STAGES:
+            completed, errors = [after - previous for after, previous in zip(self._counts(stage), before[stage])]
+            report.stages[stage] = {
+                'completed': completed,
+                'errors': errors,
+                'throughput': completed / report.elapsed if report.elapsed > 0 else 0.0,
+                'latency': self.netki_client.metrics.timing('pipeline_%s_latency' % stage)
+            }
+
+        return report
+
+    def _counts(self, stage):
+
+        metrics = self.netki_client.metrics
+        return metrics.get('pipeline_%s' % stage), metrics.get('pipeline_%s_errors' % stage)
+
+    def _reconcile(self, order):
+        """ Returns True if the stage of an order whose submission was interrupted may run again. """
+
+        if order.in_flight == CUSTOMER_DATA or self.retry_interrupted:
+            order.in_flight = None
+            return True
+
+        order.error = NetkiError('Interrupted During %s Submission - Verify Order Before Retrying' % order.in_flight)
+        return False
+
+    def _enter(self, order, stage):
+        """ Queue order for stage, blocking while the stage is full. """
+
+        self._slots[stage].acquire()
+        order.stage = stage
+        self._pools[stage].submit(self._run_stage, order)
+
+    def _run_stage(self, order):
+
+        stage = order.stage
+        try:
+            self._advance(order)
+        except Exception as e:
+            # Bookkeeping failed, e.g. the state file could not be written. Fail the order so run() does not wait for
+            # it forever.
+            order.error = e if isinstance(e, NetkiError) else NetkiError(str(e))
+            self.netki_client.metrics.incr('pipeline_%s_errors' % stage)
+            self._finish(order, failed=True, slot=stage)
+
+    def _advance(self, order):
+        """ Run the order's current stage and hand it to the next one. """
+
+        stage = order.stage
+        metrics = self.netki_client.metrics
+
+        if stage in SUBMISSIONS:
+            order.in_flight = stage
+            try:
+                self._save(order)
+            except Exception:
+                # Not submitted, as a resumed run could not tell whether the submission reached the API
+                order.in_flight = None
+                raise
+
+        started_at = time.time()
+        try:
+            next_stage = self._call(order)
+        except Exception as e:
+            order.error = e if isinstance(e, NetkiError) else NetkiError(str(e))
+            if not isinstance(order.error, TransportError):
+                # The API answered, so the submission did not take effect
+                order.in_flight = None
+            metrics.incr('pipeline_%s_errors' % stage)
+            self._finish(order, failed=True, slot=stage)
+            return
+        finally:
+            metrics.observe('pipeline_%s_latency' % stage, time.time() - started_at)
+
+        order.in_flight = None
+
+        if next_stage == STATUS and stage == STATUS:
+            # Still pending, poll again later without giving up the order's place in the stage
+            self._schedule_poll(order, time.time() + self.poll_interval)
+            return
+
+        metrics.incr('pipeline_%s' % stage)
+        order.error = None
+
+        if next_stage == ISSUED:
+            order.stage = ISSUED
+            self._finish(order, failed=False, slot=stage)
+            return
+
+        order.stage = next_stage
+        self._save(order)
+        self._enter(order, next_stage)
+        self._slots[stage].release()
+
+    def _call(self, order):
+        """ Run the order's current stage and return the stage it moves to. """
+
+        certificate = order.certificate
+
+        if order.stage == CUSTOMER_DATA:
+            certificate.submit_customer_data()
+            return ORDER
+
+        if order.stage == ORDER:
+            certificate.submit_certificate_order(self.stripe_token)
+            return CSR
+
+        if order.stage == CSR:
+            if order.pkey is None:
+                raise ValueError('Private Key Required For CSR Submission')
+            certificate.submit_csr(order.pkey)
+            return STATUS
+
+        if certificate.is_order_complete():
+            return ISSUED
+        if certificate.order_error:
+            raise NetkiError(certificate.order_error)
+        return STATUS
+
+    def _schedule_poll(self, order, poll_at):
+
+        order.next_poll_at = poll_at
+        with self._polls_changed:
+            heapq.heappush(self._polls, (poll_at, next(self._sequence), order, Deadline.current()))
+            self._polls_changed.notify()
+
+    def _poll_when_due(self):
+        """ Scheduler thread: hand orders back to the status workers once their next poll is due. """
+
+        with self._polls_changed:
+            while self._polling:
+                if not self._polls:
+                    self._polls_changed.wait()
+                    continue
+
+                wait = self._polls[0][0] - time.time()
+                if wait > 0:
+                    self._polls_changed.wait(wait)
+                    continue
+
+                poll_at, sequence, order, deadlines = heapq.heappop(self._polls)
+                # Deadlines of the thread that scheduled the poll still apply to it
+                with activate(deadlines):
+                    self._pools[STATUS].submit(self._run_stage, order)
+
+    def _save(self, order):
+
+        if self._state:
+            with self._lock:
+                write_entry(self._state, order.state())
+
+    def _finish(self, order, failed, slot):
+        """ Report order as issued or failed and release its place in the stage slot. Never raises. """
+
+        try:
+            self._save(order)
+        except Exception as e:
+            # Surface the write error; a resumed run continues from the last state that was saved
+            if not failed:
+                failed = True
+                order.error = NetkiError('Order State Not Saved: %s' % e)
+
+        with self._lock:
+            if failed:
+                self._report.failed.append(order)
+            else:
+                self._report.issued.append(order)
+            self._outstanding -= 1
+            if not self._outstanding:
+                self._done.set()
+
+        self._slots[slot].release()
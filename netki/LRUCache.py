@@ -0,0 +1,106 @@
+__author__ = 'frank'
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Thread-safe, size bounded cache evicting the least recently used entry. Hits, misses and evictions are counted
+    and, when metrics is given, reported as ``<name>_hits``, ``<name>_misses`` and ``<name>_evictions``. When ttl is
+    given, entries older than ttl seconds are dropped on lookup and counted as misses.
+
+    :param maxsize: Maximum number of entries.
+    :param metrics: (Optional) Metrics instance
+    :param name: Prefix used for metric names.
+    :param ttl: (Optional) Seconds an entry stays valid.
+    """
+
+    def __init__(self, maxsize, metrics=None, name='cache', ttl=None):
+
+        if maxsize < 1:
+            raise ValueError('LRUCache maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.metrics = metrics
+        self.name = name
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """ Returns the cached value for key and marks it as recently used, default if it is not cached. """
+
+        with self._lock:
+            try:
+                value, stored_at = self._data.pop(key)
+            except KeyError:
+                value, stored_at = default, None
+
+            if stored_at is None or (self.ttl is not None and time.time() - stored_at >= self.ttl):
+                self.misses += 1
+                self._count('misses')
+                return default
+
+            self._data[key] = value, stored_at
+            self.hits += 1
+
+        self._count('hits')
+        return value
+
+    def put(self, key, value):
+        """ Cache value for key, evicting the least recently used entry if the cache is full. """
+
+        evicted = 0
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value, time.time()
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+            self.evictions += evicted
+
+        if evicted:
+            self._count('evictions', evicted)
+
+    def pop(self, key, default=None):
+        """ Remove key from the cache and return its value, default if it is not cached. """
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._data.pop(key)[0]
+
+    def clear(self):
+        """ Remove all entries. Counters are kept. """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        """ Returns a dictionary with the current size, maxsize, hits, misses and evictions. """
+        with self._lock:
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def _count(self, event, value=1):
+        if self.metrics is not None:
+            self.metrics.incr('%s_%s' % (self.name, event), value)
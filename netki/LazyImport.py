@@ -0,0 +1,47 @@
+__author__ = 'frank'
+
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """
+    Module placeholder that imports the real module on first attribute access. Used for heavy dependencies such as
+    OpenSSL and ecdsa so that importing the netki package only pays for them when they are actually used.
+
+    :param name: Absolute module name. ``OpenSSL.crypto``
+    """
+
+    def __init__(self, name):
+        super(LazyModule, self).__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self):
+
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, name):
+        return getattr(self._load(), name)
+
+    @property
+    def loaded(self):
+        """ True once the real module has been imported. """
+        return self.__dict__['_lazy_module'] is not None
+
+
+def lazy_import(name):
+    """
+    Returns the module if it has already been imported, otherwise a LazyModule that imports it on first use.
+
+    :param name: Absolute module name.
+    """
+
+    if name in sys.modules:
+        return sys.modules[name]
+
+    return LazyModule(name)
@@ -0,0 +1,126 @@
+__author__ = 'frank'
+
+import threading
+from collections import deque
+
+# Number of recent observations kept per timing for percentiles
+TIMING_WINDOW = 1024
+
+
+class Metrics(object):
+    """
+    Thread-safe counters describing client activity. Every Netki client owns a Metrics instance available as
+    ``client.metrics``.
+
+    Timings such as ``request_latency`` are recorded with observe() and summarized with timing(); percentiles cover
+    the most recent TIMING_WINDOW observations.
+
+    Metrics is also the instrumentation hook for events, such as circuit breaker state changes. Listeners added with
+    add_listener() are called as ``listener(event, data)`` from the thread that emitted the event.
+    """
+
+    def __init__(self):
+
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._timings = {}
+        self._listeners = []
+
+    def incr(self, name, value=1):
+        """
+        Increment a counter, creating it if needed.
+
+        :param name: Counter name. ``response_wire_bytes``
+        :param value: Amount to add.
+        """
+
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name):
+        """ Returns the current value of a counter, 0 if it has never been incremented. """
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def observe(self, name, seconds):
+        """
+        Record a duration.
+
+        :param name: Timing name. ``request_latency``
+        :param seconds: Duration in seconds.
+        """
+
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = [0, 0.0, 0.0, deque(maxlen=TIMING_WINDOW)]
+            timing[0] += 1
+            timing[1] += seconds
+            timing[2] = max(timing[2], seconds)
+            timing[3].append(seconds)
+
+    def timing(self, name):
+        """
+        Summary of a timing: ``count``, ``mean`` and ``max`` over all observations and ``p50``, ``p95`` and ``p99``
+        over recent ones. All values are 0 if nothing has been observed.
+        """
+
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                return {'count': 0, 'mean': 0.0, 'max': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0}
+            count, total, maximum, recent = timing[0], timing[1], timing[2], sorted(timing[3])
+
+        def percentile(p):
+            return recent[min(len(recent) - 1, int(p * len(recent)))]
+
+        return {
+            'count': count,
+            'mean': total / count,
+            'max': maximum,
+            'p50': percentile(0.50),
+            'p95': percentile(0.95),
+            'p99': percentile(0.99)
+        }
+
+    def snapshot(self):
+        """ Returns a copy of all counters as a dictionary. """
+        with self._lock:
+            return dict(self._counters)
+
+    def reset(self):
+        """ Reset all counters and timings. """
+        with self._lock:
+            self._counters.clear()
+            self._timings.clear()
+
+    def add_listener(self, listener):
+        """
+        Register a callable receiving every emitted event.
+
+        :param listener: Callable taking the event name and a dictionary of event data.
+        """
+        with self._lock:
+            self._listeners = self._listeners + [listener]
+
+    def remove_listener(self, listener):
+        """ Unregister a listener added with add_listener(). """
+        with self._lock:
+            self._listeners = [l for l in self._listeners if l is not listener]
+
+    def emit(self, event, **data):
+        """
+        Count the event and pass it to every listener. A failing listener does not affect the API call that emitted
+        the event, its errors are counted as ``listener_errors``.
+
+        :param event: Event name. ``circuit_state_change``
+        :param data: Event data
+        """
+
+        self.incr(event)
+
+        for listener in self._listeners:
+            try:
+                listener(event, data)
+            except Exception:
+                self.incr('listener_errors')
@@ -1,26 +1,110 @@
 __author__ = 'frank'
 
+from collections import namedtuple
+from datetime import timedelta
+
 from Certificate import Certificate
+from CertificateBundle import load_bundles
+from CircuitBreaker import CircuitBreakers
 from Domain import Domain
+from ExpiryScanner import ExpiryScanner
+from Export import Exporter
+from Import import Importer, fetch_existing_ids, read_domain_names
+from IssuancePipeline import IssuancePipeline
+from LRUCache import LRUCache
+from Metrics import Metrics
 from Partner import Partner
+from Provisioning import PartnerProvisioner
+from RateLimiter import RateLimiter
 from Requestor import process_request
+from Revocation import CertificateRevoker
+from SingleFlight import SingleFlight
+from StringInterner import StringInterner
+from Transport import Transport
 from WalletName import WalletName
+from WalletNameTable import WalletNameTable
+from WorkerPool import WorkerPool
+
+import Routes
+
+
+Credentials = namedtuple(
+    'Credentials',
+    ['auth_type', 'api_url', 'api_key', 'partner_id', 'key_signing_key', 'signed_user_key', 'user_key']
+)
+
+
+# Default (connect, read) timeouts in seconds
+DEFAULT_TIMEOUT = (10, 60)
 
 
-class Netki:
+class Netki(object):
     """
     General methods for interacting with Netki's Partner API.
 
+    A Netki client is safe to share between threads. Credentials are immutable once the client is created, requests
+    go through a thread-safe Transport with a shared connection pool, and metrics are updated under a lock. Objects
+    returned by the client (WalletName, Domain, ...) keep a reference to the client but are not themselves meant to
+    be modified from several threads at once.
+
     :param partner_id: Your Partner ID available in the API Keys section of your My Account page.
     :param api_key: API Key available in the API Key section of your My Account page.
     :param api_url: https://api.netki.com unless otherwise noted
     """
     def __init__(self, api_key, partner_id, api_url='https://api.netki.com'):
 
-        self.api_key = api_key
-        self.api_url = api_url
-        self.partner_id = partner_id
-        self._auth_type = 'api_key'
+        self._credentials = Credentials('api_key', api_url, api_key, partner_id, None, None, None)
+
+        self.metrics = Metrics()
+        self.transport = Transport()
+        self.timeout = DEFAULT_TIMEOUT
+        self.request_compression_threshold = None
+        self.signed_header_cache = LRUCache(256, self.metrics, 'signed_header_cache')
+        self.string_interner = StringInterner()
+        self.domain_cache = LRUCache(64, self.metrics, 'domain_cache', ttl=60)
+        self.response_cache = None
+        self.single_flight = None
+        self.circuit_breakers = None
+        self.rate_limiter = None
+        self.cache_namespace = None
+
+    @property
+    def credentials(self):
+        return self._credentials
+
+    @property
+    def api_key(self):
+        return self._credentials.api_key
+
+    @property
+    def api_url(self):
+        return self._credentials.api_url
+
+    @property
+    def partner_id(self):
+        return self._credentials.partner_id
+
+    @property
+    def key_signing_key(self):
+        if self._auth_type != 'distributed':
+            raise AttributeError('key_signing_key Only Available for Distributed API Access')
+        return self._credentials.key_signing_key
+
+    @property
+    def signed_user_key(self):
+        if self._auth_type != 'distributed':
+            raise AttributeError('signed_user_key Only Available for Distributed API Access')
+        return self._credentials.signed_user_key
+
+    @property
+    def user_key(self):
+        if self._auth_type == 'api_key':
+            raise AttributeError('user_key Only Available for Distributed or Certificate API Access')
+        return self._credentials.user_key
+
+    @property
+    def _auth_type(self):
+        return self._credentials.auth_type
 
     @classmethod
     def distributed_api_access(cls, key_signing_key, signed_user_key, user_key, api_url='https://api.netki.com'):
@@ -35,21 +119,21 @@ class Netki:
         :param api_url: https://api.netki.com unless otherwise noted
         :return: Netki client.
         """
-        client = cls(None, None, api_url)
-        client.key_signing_key = key_signing_key
-        client.signed_user_key = signed_user_key
-        client.user_key = user_key
-        client._auth_type = 'distributed'
 
-        if not client.key_signing_key:
+        if not key_signing_key:
             raise ValueError('key_signing_key Required for Distributed API Access')
 
-        if not client.signed_user_key:
+        if not signed_user_key:
             raise ValueError('signed_user_key Required for Distributed API Access')
 
         if not user_key:
             raise ValueError('user_key Required for Distributed API Access')
 
+        client = cls(None, None, api_url)
+        client._credentials = Credentials(
+            'distributed', api_url, None, None, key_signing_key, signed_user_key, user_key
+        )
+
         return client
 
     @classmethod
@@ -62,19 +146,144 @@ class Netki:
         :param api_url: https://api.netki.com unless otherwise noted
         :return: Netki client.
         """
-        client = cls(None, None, api_url)
-        client.user_key = user_key
-        client.partner_id = partner_id
-        client._auth_type = 'certificate'
 
-        if not client.user_key:
+        if not user_key:
             raise ValueError('user_key Required for Certificate API Access')
 
-        if not client.partner_id:
+        if not partner_id:
             raise ValueError('partner_id Required for Certificate API Access')
 
+        client = cls(None, None, api_url)
+        client._credentials = Credentials('certificate', api_url, None, partner_id, None, None, user_key)
+
+        return client
+
+    @classmethod
+    def from_credentials(cls, credentials):
+        """
+        Instantiate a Netki Client from the credentials of another client, e.g. ``client.credentials``. Used to
+        create independent clients with the same identity in worker processes.
+
+        :param credentials: Credentials tuple
+        :return: Netki client.
+        """
+
+        client = cls(None, None, credentials.api_url)
+        client._credentials = credentials
+
         return client
 
+    def set_signed_header_cache(self, maxsize=256):
+        """
+        Distributed and certificate access sign every request. Signed headers for identical requests (same method,
+        URI and body) are reused from a bounded LRU cache so polling loops skip the ECDSA signing step. Hits, misses
+        and evictions are reported through ``metrics`` as ``signed_header_cache_*``.
+
+        :param maxsize: Maximum number of cached header sets. None disables the cache.
+        """
+
+        self.signed_header_cache = LRUCache(maxsize, self.metrics, 'signed_header_cache') if maxsize else None
+
+    def set_response_cache(self, maxsize=1024):
+        """
+        Cache GET responses that carry an ETag or Last-Modified validator, such as get_wallet_names(), get_domains()
+        and Domain.load_dnssec_details(). Later requests for the same URI are sent as conditional requests and a
+        304 Not Modified response is served from the cache without transferring the body again. Lookups, evictions
+        and 304s are reported through ``metrics`` as ``response_cache_*``.
+
+        :param maxsize: Maximum number of cached responses. None disables the cache.
+        """
+
+        self.response_cache = LRUCache(maxsize, self.metrics, 'response_cache') if maxsize else None
+
+    def set_domain_cache(self, ttl=60, maxsize=64):
+        """
+        Domain listings hydrated by ``get_domains(hydrate=True)`` are kept for ttl seconds, so that repeated reads,
+        e.g. from a dashboard, are served from memory instead of issuing two requests per domain again. The cache is
+        cleared when a domain is created or deleted through this client. Lookups and evictions are reported through
+        ``metrics`` as ``domain_cache_*``.
+
+        :param ttl: Seconds a hydrated listing is served from the cache. None disables the cache.
+        :param maxsize: Maximum number of cached listings.
+        """
+
+        self.domain_cache = LRUCache(maxsize, self.metrics, 'domain_cache', ttl) if ttl else None
+
+    def set_timeouts(self, connect=DEFAULT_TIMEOUT[0], read=DEFAULT_TIMEOUT[1]):
+        """
+        Set the timeouts applied to every API call. A call that cannot connect within connect seconds, or waits more
+        than read seconds for data from the API, raises RequestTimeoutError. Timeouts can be overridden for a block
+        of calls with ``Deadline(timeout=...)``, and a Deadline bounds several calls as a whole.
+
+        :param connect: Connect timeout in seconds. None disables it.
+        :param read: Read timeout in seconds. None disables it.
+        """
+
+        self.timeout = (connect, read)
+
+    def set_rate_limit(self, rate, burst=None):
+        """
+        Limit the rate of API calls made through this client, across all threads. Calls wait for their turn, or fail
+        with DeadlineExceededError if an active Deadline passes first.
+
+        :param rate: Calls per second. None removes the limit.
+        :param burst: Maximum number of calls made back to back, defaults to rate rounded up.
+        """
+
+        self.rate_limiter = RateLimiter(rate, burst, self.metrics) if rate else None
+
+    def enable_circuit_breakers(self, failure_ratio=0.5, minimum_calls=10, window=20, reset_timeout=30,
+                                half_open_probes=1):
+        """
+        Put a circuit breaker in front of each endpoint group (walletname, domain, certificate, admin). When the share
+        of failed calls (transport errors, timeouts, 429 and 5xx responses) among the last window calls to a group
+        reaches failure_ratio, calls to that group fail fast with CircuitOpenError for reset_timeout seconds. Then
+        half_open_probes calls are let through, and the circuit closes once they succeed.
+
+        State changes are emitted as ``circuit_state_change`` events, see Metrics.add_listener().
+
+        :param failure_ratio: Failure ratio, between 0 and 1, opening a circuit. None disables circuit breakers.
+        :param minimum_calls: Number of calls in the window before the failure ratio is evaluated.
+        :param window: Number of recent calls the failure ratio is computed over.
+        :param reset_timeout: Seconds a circuit stays open before probing.
+        :param half_open_probes: Number of successful probe calls required to close a circuit.
+        """
+
+        if failure_ratio is None:
+            self.circuit_breakers = None
+            return
+
+        self.circuit_breakers = CircuitBreakers(
+            self.metrics,
+            failure_ratio=failure_ratio,
+            minimum_calls=minimum_calls,
+            window=window,
+            reset_timeout=reset_timeout,
+            half_open_probes=half_open_probes
+        )
+
+    def enable_request_coalescing(self, routes):
+        """
+        Share one API call between concurrent identical GET requests (same credentials, method and URI) to the given
+        routes, e.g. ``[Routes.DOMAINS, Routes.CERTIFICATE]`` for get_domains() and Certificate.get_status() polled
+        from many threads. Coalesced calls are counted in ``metrics`` as ``coalesced_requests``.
+
+        :param routes: List of Routes.Route objects to coalesce. An empty list disables coalescing.
+        """
+
+        self.single_flight = SingleFlight(routes, self.metrics) if routes else None
+
+    def set_request_compression(self, min_size=1024):
+        """
+        Gzip PUT / POST bodies of at least min_size bytes, such as bulk Wallet Name saves. If the API rejects a
+        compressed body with 415 Unsupported Media Type, the request is resent uncompressed and compression is turned
+        off for this client. Byte counts before and after compression are reported through ``metrics``.
+
+        :param min_size: Minimum serialized body size in bytes to compress. None disables request compression.
+        """
+
+        self.request_compression_threshold = min_size
+
     # Wallet Name Operations #
     def get_wallet_names(self, domain_name=None, external_id=None):
         """
@@ -93,42 +302,37 @@ class Netki:
         :return: List of WalletName objects.
         """
 
-        args = []
-        if domain_name:
-            args.append('domain_name=%s' % domain_name)
-
-        if external_id:
-            args.append('external_id=%s' % external_id)
-
-        uri = '/v1/partner/walletname'
-
-        if args:
-            uri = uri + '?' + '&'.join(args)
+        uri = Routes.WALLET_NAMES.expand(query=[('domain_name', domain_name), ('external_id', external_id)])
 
         response = process_request(self, uri, 'GET')
 
         if not response.wallet_name_count:
             return []
 
-        # Assemble and return a list of Wallet Name objects from the response data
-        all_wallet_names = []
+        # Use the raw dictionaries, attribute access on the response would convert every nested record to an AttrDict
+        return WalletName.from_api_data(response.get('wallet_names'), self, self.string_interner)
 
-        for wn in response.wallet_names:
-            wallet_name = WalletName(
-                domain_name=wn.domain_name,
-                name=wn.name,
-                external_id=wn.external_id,
-                id=wn.id
-            )
+    def get_wallet_names_table(self, domain_name=None, external_id=None):
+        """
+        Wallet Name Operation
 
-            for wallet in wn.wallets:
-                wallet_name.set_currency_address(wallet.currency, wallet.wallet_address)
+        Retrieve Wallet Names like get_wallet_names(), as a columnar WalletNameTable instead of a list of WalletName
+        objects. Use it for large Wallet Name sets that are filtered or counted rather than edited, e.g. names per
+        currency per domain; WalletName objects are built only for the rows that are accessed.
 
-            wallet_name.set_netki_client(self)
+        :param domain_name: Domain name to which the requested Wallet Names belong. ``partnerdomain.com``
+        :param external_id: Your unique customer identifier specified when creating a Wallet Name.
+        :return: WalletNameTable
+        """
 
-            all_wallet_names.append(wallet_name)
+        uri = Routes.WALLET_NAMES.expand(query=[('domain_name', domain_name), ('external_id', external_id)])
 
-        return all_wallet_names
+        response = process_request(self, uri, 'GET')
+
+        if not response.wallet_name_count:
+            return WalletNameTable(self)
+
+        return WalletNameTable.from_api_data(response.get('wallet_names'), self)
 
     def create_wallet_name(self, domain_name, name, external_id, currency, wallet_address):
         """
@@ -154,6 +358,34 @@ class Netki:
 
         return wallet_name
 
+    def save_wallet_names(self, wallet_names):
+        """
+        Wallet Name Operation
+
+        Commit a batch of WalletName objects with one API request for new Wallet Names and one for updates, instead of
+        calling save() on each object. Server generated ids are set on new WalletName objects.
+
+        :param wallet_names: List of WalletName objects.
+        :return: List of WalletName objects.
+        """
+
+        new_wallet_names = [wn for wn in wallet_names if not wn.id]
+        existing_wallet_names = [wn for wn in wallet_names if wn.id]
+
+        for method, batch in (('POST', new_wallet_names), ('PUT', existing_wallet_names)):
+            if not batch:
+                continue
+
+            wn_api_data = {'wallet_names': [wn.get_api_data() for wn in batch]}
+            response = process_request(self, Routes.WALLET_NAMES.expand(), method, wn_api_data)
+
+            ids = dict(((wn.domain_name, wn.name), wn.id) for wn in response.wallet_names)
+            for wallet_name in batch:
+                wallet_name.id = ids.get((wallet_name.domain_name, wallet_name.name), wallet_name.id)
+                wallet_name.set_netki_client(self)
+
+        return wallet_names
+
     # Partner Operations #
     def get_partners(self):
         """
@@ -164,7 +396,7 @@ class Netki:
         :return: List containing Partner objects
         """
 
-        response = process_request(self, '/v1/admin/partner', 'GET')
+        response = process_request(self, Routes.PARTNERS.expand(), 'GET')
 
         partner_objects = list()
         for p in response.partners:
@@ -185,24 +417,103 @@ class Netki:
         :return: Partner object
         """
 
-        response = process_request(self, '/v1/admin/partner/' + partner_name, 'POST')
+        response = process_request(self, Routes.PARTNER.expand(partner_name=partner_name), 'POST')
 
         partner = Partner(id=response.partner.id, name=response.partner.name)
         partner.set_netki_client(self)
 
         return partner
 
+    def provision_partners(self, specs, concurrency=8):
+        """
+        Sub-partner Operation
+
+        Provision many sub-partners concurrently. For each PartnerSpec the sub-partner is created, then its domains,
+        then its Wallet Names in a single bulk request. Errors are collected per sub-partner instead of being raised.
+
+        :param specs: List of Provisioning.PartnerSpec objects.
+        :param concurrency: Maximum number of API calls in flight at once.
+        :return: List of Provisioning.ProvisioningResult objects in the same order as specs.
+        """
+
+        return PartnerProvisioner(self, concurrency).run(specs)
+
+    def export_wallet_names(self, path, format='ndjson', checkpoint_path=None, concurrency=8):
+        """
+        Wallet Name Operation
+
+        Export every Wallet Name with its wallets to an NDJSON or CSV file, fetching domains concurrently and writing
+        records as they arrive. See Export.Exporter for the file format and checkpoint behaviour.
+
+        :param path: Output file path.
+        :param format: ``ndjson`` or ``csv``
+        :param checkpoint_path: (Optional) Checkpoint file path, allowing an interrupted export to resume.
+        :param concurrency: Maximum number of domains fetched at once.
+        :return: Export.ExportReport
+        """
+
+        return Exporter(self, path, format, checkpoint_path, concurrency).export_wallet_names()
+
+    def import_wallet_names(self, path, reject_path, format='ndjson', batch_size=100, concurrency=4, progress=None):
+        """
+        Wallet Name Operation
+
+        Bulk import Wallet Names from an NDJSON or CSV file, as written by export_wallet_names(), in batches of
+        batch_size with up to concurrency batches in flight. Records with an id update existing Wallet Names. Invalid
+        or rejected Wallet Names are written to reject_path. See Import.Importer for details.
+
+        :param path: Input file path.
+        :param reject_path: Path of the reject file.
+        :param format: ``ndjson`` or ``csv``
+        :param batch_size: Number of Wallet Names per API request.
+        :param concurrency: Maximum number of batches in flight at once.
+        :param progress: (Optional) Callable receiving the Import.ImportReport after every completed batch.
+        :return: Import.ImportReport
+        """
+
+        return Importer(self, reject_path, format, batch_size, concurrency, progress).run(path)
+
+    def sync_wallet_names(self, path, reject_path, format='ndjson', batch_size=100, concurrency=4, progress=None):
+        """
+        Wallet Name Operation
+
+        Make the account match an import file: Wallet Names in the file that already exist in their domain are
+        updated, the others are created. Wallet Names missing from the file are left untouched. Accepts the same
+        arguments as import_wallet_names().
+
+        :return: Import.ImportReport
+        """
+
+        existing_ids = fetch_existing_ids(self, read_domain_names(path, format), concurrency)
+
+        return Importer(self, reject_path, format, batch_size, concurrency, progress, existing_ids).run(path)
+
     # Domain Operations #
-    def get_domains(self, domain_name=None):
+    def get_domains(self, domain_name=None, hydrate=False, concurrency=8):
         """
         Domain Operation
 
         Retrieve all domains associated with your partner_id or a specific domain_name if supplied
 
+        With hydrate, the status and DNSSEC details of every domain are loaded as well, as by Domain.refresh(), up to
+        concurrency domains at a time. Hydrated listings are cached, see set_domain_cache(); cached Domain objects are
+        shared between the lists returned.
+
+        :param domain_name: (Optional) Domain name to retrieve.
+        :param hydrate: Load the status and DNSSEC details of every domain.
+        :param concurrency: Maximum number of domains hydrated at once.
         :return: List of Domain objects.
         """
 
-        response = process_request(self, '/api/domain/%s' % domain_name if domain_name else '/api/domain', 'GET')
+        if hydrate:
+            return self._get_hydrated_domains(domain_name, concurrency)
+
+        if domain_name:
+            uri = Routes.DOMAIN.expand(domain_name=domain_name)
+        else:
+            uri = Routes.DOMAINS.expand()
+
+        response = process_request(self, uri, 'GET')
 
         if not response.get('domains'):
             return []
@@ -216,6 +527,41 @@ class Netki:
 
         return domain_list
 
+    def _get_hydrated_domains(self, domain_name, concurrency):
+
+        cache = self.domain_cache
+        key = (self.cache_namespace, domain_name)
+
+        domains = cache.get(key) if cache is not None else None
+        if domains is None:
+            domains = self.get_domains(domain_name)
+
+            if domains:
+                with WorkerPool(min(concurrency, len(domains))) as pool:
+                    for task in pool.map(lambda domain: domain.refresh(), domains):
+                        task.result()
+
+            if cache is not None:
+                cache.put(key, domains)
+
+        return list(domains)
+
+    def export_domains(self, path, format='ndjson', checkpoint_path=None, concurrency=8):
+        """
+        Domain Operation
+
+        Export every domain with its DNSSEC details to an NDJSON or CSV file. DNSSEC details are looked up
+        concurrently. See Export.Exporter for the file format and checkpoint behaviour.
+
+        :param path: Output file path.
+        :param format: ``ndjson`` or ``csv``
+        :param checkpoint_path: (Optional) Checkpoint file path, allowing an interrupted export to resume.
+        :param concurrency: Maximum number of DNSSEC lookups at once.
+        :return: Export.ExportReport
+        """
+
+        return Exporter(self, path, format, checkpoint_path, concurrency).export_domains()
+
     def create_partner_domain(self, domain_name, sub_partner_id=None):
         """
         Domain Operation
@@ -230,7 +576,7 @@ class Netki:
 
         post_data = {'partner_id': sub_partner_id} if sub_partner_id else ''
 
-        response = process_request(self, '/v1/partner/domain/' + domain_name, 'POST', post_data)
+        response = process_request(self, Routes.PARTNER_DOMAIN.expand(domain_name=domain_name), 'POST', post_data)
 
         domain = Domain(response.domain_name)
         domain.status = response.status
@@ -238,6 +584,9 @@ class Netki:
 
         domain.set_netki_client(self)
 
+        if self.domain_cache is not None:
+            self.domain_cache.clear()
+
         return domain
 
     # Certificate Operations #
@@ -278,6 +627,92 @@ class Netki:
 
         return certificate
 
+    def get_certificates(self, ids, concurrency=8):
+        """
+        Certificate Operation
+
+        Retrieve many existing certificates by certificate ID, fetching up to concurrency statuses at once. Issued
+        certificates are parsed once, so not_after, serial and subject can be read for renewal scanning without further
+        parsing. See CertificateBundle.load_bundles.
+
+        :param ids: List of certificate IDs.
+        :param concurrency: Maximum number of status requests at once.
+        :return: List of Certificate objects in the order of ids.
+        """
+
+        certificates = []
+        for id in ids:
+            if not id:
+                raise ValueError('Certificate ID Required')
+
+            certificate = Certificate()
+            certificate.id = id
+            certificate.set_netki_client(self)
+            certificates.append(certificate)
+
+        load_bundles(certificates, concurrency)
+
+        return certificates
+
+    def scan_certificate_expiry(self, ids, index_path, renew_within_days=30, concurrency=8, processes=None):
+        """
+        Certificate Operation
+
+        Find certificates expiring within renew_within_days. Statuses are fetched concurrently and kept in an expiry
+        index at index_path, so later scans only fetch certificates that are new, not yet issued or close to expiry.
+        See ExpiryScanner.ExpiryScanner.
+
+        :param ids: List of certificate IDs.
+        :param index_path: Path of the persisted expiry index.
+        :param renew_within_days: Renewal window in days.
+        :param concurrency: Maximum number of status requests at once.
+        :param processes: Number of bundle parsing processes, None for one per CPU.
+        :return: ExpiryScanner.ScanReport, whose ``expiring`` entries are sorted by not_after.
+        """
+
+        scanner = ExpiryScanner(self, index_path, timedelta(days=renew_within_days), concurrency, processes)
+        return scanner.scan(ids)
+
+    def issue_certificates(self, orders, concurrency=4, queue_size=100, state_path=None, poll_interval=30,
+                           stripe_token=None, retry_interrupted=False):
+        """
+        Certificate Operation
+
+        Run many certificate orders through customer data submission, order submission, CSR submission and status
+        polling, with every stage running concurrently. See IssuancePipeline.IssuancePipeline.
+
+        :param orders: List of IssuancePipeline.IssuanceOrder objects.
+        :param concurrency: Worker count for every stage, or a dictionary of stage name to worker count.
+        :param queue_size: Number of orders that may wait for each stage.
+        :param state_path: (Optional) Order state file path, allowing an interrupted run to resume.
+        :param poll_interval: Seconds between status polls of an order.
+        :param stripe_token: (Optional) Stripe token passed with every order.
+        :param retry_interrupted: Submit orders and CSRs whose submission was interrupted in a previous run again.
+        :return: IssuancePipeline.IssuanceReport
+        """
+
+        pipeline = IssuancePipeline(
+            self, concurrency, queue_size, state_path, poll_interval, stripe_token, retry_interrupted
+        )
+        return pipeline.run(orders)
+
+    def revoke_certificates(self, ids_or_certs, reason, concurrency=8, max_attempts=4, checkpoint_path=None):
+        """
+        Certificate Operation
+
+        Revoke many certificates concurrently, retrying transient failures. See Revocation.CertificateRevoker.
+
+        :param ids_or_certs: List of certificate IDs or Certificate objects.
+        :param reason: Reason for revocation, such as private key compromised.
+        :param concurrency: Maximum number of revocations in flight at once.
+        :param max_attempts: Maximum number of attempts per certificate.
+        :param checkpoint_path: (Optional) Checkpoint file path, allowing an interrupted run to resume.
+        :return: Revocation.RevocationReport with one outcome per certificate. ``report.to_dicts()`` can be persisted.
+        """
+
+        revoker = CertificateRevoker(self, concurrency, max_attempts, checkpoint_path=checkpoint_path)
+        return revoker.revoke(ids_or_certs, reason)
+
     def get_available_products(self):
         """
         Certificate Operation
@@ -287,7 +722,7 @@ class Netki:
         :return: Dictionary containing product details.
         """
 
-        return process_request(self, '/v1/certificate/products', 'GET').get('products')
+        return process_request(self, Routes.CERTIFICATE_PRODUCTS.expand(), 'GET').get('products')
 
     def get_ca_bundle(self):
         """
@@ -298,7 +733,7 @@ class Netki:
         :return: Dictionary containing certificate bundle.
         """
 
-        return process_request(self, '/v1/certificate/cacert', 'GET').get('cacerts')
+        return process_request(self, Routes.CERTIFICATE_CACERT.expand(), 'GET').get('cacerts')
 
     def get_account_balance(self):
         """
@@ -309,4 +744,4 @@ class Netki:
         :return: Dictionary containing available balance.
         """
 
-        return process_request(self, '/v1/certificate/balance', 'GET').get('available_balance')
+        return process_request(self, Routes.CERTIFICATE_BALANCE.expand(), 'GET').get('available_balance')
@@ -4,6 +4,8 @@ __author__ = 'frank'
 from BaseObject import BaseObject
 from Requestor import process_request
 
+import Routes
+
 
 class Partner(BaseObject):
     """
@@ -26,4 +28,4 @@ class Partner(BaseObject):
 
         :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. Exception for error responses.
         """
-        process_request(self.netki_client, '/v1/admin/partner/' + self.name, 'DELETE')
+        process_request(self.netki_client, Routes.PARTNER.expand(partner_name=self.name), 'DELETE')
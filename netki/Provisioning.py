@@ -0,0 +1,147 @@
+__author__ = 'frank'
+
+import threading
+
+from WorkerPool import WorkerPool
+
+
+class PartnerSpec(object):
+    """
+    Description of a sub-partner to provision.
+
+    :param name: Sub-partner name.
+    :param domains: List of domain names to create for the sub-partner.
+    :param wallet_names: List of WalletName objects to create once the sub-partner's domains exist.
+    """
+
+    def __init__(self, name, domains=None, wallet_names=None):
+
+        self.name = name
+        self.domains = domains or []
+        self.wallet_names = wallet_names or []
+
+
+class ProvisioningResult(object):
+    """
+    Outcome of provisioning a single sub-partner.
+
+    ``errors`` holds (stage, target, exception) tuples where stage is ``partner``, ``domain`` or ``wallet_names``.
+
+    :param spec: PartnerSpec this result belongs to.
+    """
+
+    def __init__(self, spec):
+
+        self.spec = spec
+        self.partner = None
+        self.domains = []
+        self.wallet_names = []
+        self.errors = []
+
+        self._lock = threading.Lock()
+        self._pending_domains = 0
+        self._created_domains = {}
+        self._complete = threading.Event()
+
+    @property
+    def succeeded(self):
+        return self.partner is not None and not self.errors
+
+    def add_error(self, stage, target, error):
+        with self._lock:
+            self.errors.append((stage, target, error))
+
+
+class PartnerProvisioner(object):
+    """
+    Provision many sub-partners concurrently. Each sub-partner moves through create_partner, create_partner_domain
+    for each of its domains, then a single bulk save of its Wallet Names. A stage is queued as soon as the stage
+    before it completes for that sub-partner, so slow partners do not hold up the rest of the batch.
+
+    :param netki_client: Netki client used for all API calls.
+    :param concurrency: Maximum number of API calls in flight at once.
+    """
+
+    def __init__(self, netki_client, concurrency=8):
+
+        self.netki_client = netki_client
+        self.concurrency = concurrency
+        self._pool = None
+
+    def run(self, specs):
+        """
+        Provision all specs and wait for completion.
+
+        :param specs: List of PartnerSpec objects.
+        :return: List of ProvisioningResult objects in the same order as specs.
+        """
+
+        results = [ProvisioningResult(spec) for spec in specs]
+
+        self._pool = WorkerPool(self.concurrency)
+        try:
+            for result in results:
+                self._pool.submit(self._create_partner, result)
+
+            for result in results:
+                result._complete.wait()
+        finally:
+            self._pool.shutdown()
+            self._pool = None
+
+        return results
+
+    def _create_partner(self, result):
+
+        try:
+            result.partner = self.netki_client.create_partner(result.spec.name)
+        except Exception as e:
+            result.add_error('partner', result.spec.name, e)
+            result._complete.set()
+            return
+
+        if not result.spec.domains:
+            self._pool.submit(self._create_wallet_names, result)
+            return
+
+        result._pending_domains = len(result.spec.domains)
+        for index, domain_name in enumerate(result.spec.domains):
+            self._pool.submit(self._create_domain, result, index, domain_name)
+
+    def _create_domain(self, result, index, domain_name):
+
+        try:
+            domain = self.netki_client.create_partner_domain(domain_name, result.partner.id)
+            with result._lock:
+                result._created_domains[index] = domain
+        except Exception as e:
+            result.add_error('domain', domain_name, e)
+
+        with result._lock:
+            result._pending_domains -= 1
+            last_domain = result._pending_domains == 0
+
+        if last_domain:
+            result.domains = [result._created_domains[i] for i in sorted(result._created_domains)]
+            self._pool.submit(self._create_wallet_names, result)
+
+    def _create_wallet_names(self, result):
+
+        try:
+            failed_domains = set(target for stage, target, error in result.errors if stage == 'domain')
+            wallet_names = [wn for wn in result.spec.wallet_names if wn.domain_name not in failed_domains]
+
+            for wallet_name in result.spec.wallet_names:
+                if wallet_name.domain_name in failed_domains:
+                    result.add_error(
+                        'wallet_names',
+                        wallet_name.name,
+                        Exception('Domain %s Was Not Created' % wallet_name.domain_name)
+                    )
+
+            if wallet_names:
+                result.wallet_names = self.netki_client.save_wallet_names(wallet_names)
+        except Exception as e:
+            result.add_error('wallet_names', result.spec.name, e)
+        finally:
+            result._complete.set()
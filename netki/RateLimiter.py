@@ -0,0 +1,58 @@
+__author__ = 'frank'
+
+import threading
+import time
+
+
+class RateLimiter(object):
+    """
+    Thread-safe token bucket limiting the rate of API calls. Tokens are added at ``rate`` per second up to ``burst``
+    and every call takes one, waiting for it if the bucket is empty. Time spent waiting is reported through metrics as
+    ``rate_limit_wait_seconds``.
+
+    :param rate: Calls per second.
+    :param burst: Maximum number of calls made back to back, defaults to rate rounded up.
+    :param metrics: (Optional) Metrics instance
+    """
+
+    def __init__(self, rate, burst=None, metrics=None):
+
+        if rate <= 0:
+            raise ValueError('RateLimiter rate must be greater than 0')
+
+        self.rate = float(rate)
+        self.burst = burst if burst is not None else max(1, int(-(-rate // 1)))
+        self.metrics = metrics
+
+        if self.burst < 1:
+            raise ValueError('RateLimiter burst must be at least 1')
+
+        self._tokens = float(self.burst)
+        self._updated = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """
+        Take a token, waiting for one if needed.
+
+        :param timeout: (Optional) Maximum number of seconds to wait.
+        :return: True if a token was taken, False if none became available within timeout.
+        """
+
+        # Tokens are reserved up front, so concurrent callers queue up behind each other instead of racing
+        with self._lock:
+            now = time.time()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.0
+            if timeout is not None and wait > timeout:
+                return False
+            self._tokens -= 1
+
+        if wait > 0:
+            if self.metrics is not None:
+                self.metrics.incr('rate_limit_wait_seconds', wait)
+            time.sleep(wait)
+
+        return True
@@ -2,13 +2,24 @@ __author__ = 'frank'
 
 import hashlib
 import json
-import requests
+import time
+import zlib
 from attrdict import AttrDict
-from ecdsa import SigningKey
-from ecdsa.util import sigencode_der
 
+from Compression import ACCEPT_ENCODING, compress_body, read_body
+from Deadline import check_deadline, effective_timeout
+from Errors import DeadlineExceededError, NetkiError, RequestTimeoutError, TransportError, error_from_response
+from LazyImport import lazy_import
+from Routes import endpoint_group, join_url
 
-def process_request(netki_client, uri, method, data=''):
+# ecdsa is only needed for distributed and certificate access, load it on first use
+ecdsa = lazy_import('ecdsa')
+ecdsa_util = lazy_import('ecdsa.util')
+requests_exceptions = lazy_import('requests.exceptions')
+urllib3_exceptions = lazy_import('requests.packages.urllib3.exceptions')
+
+
+def process_request(netki_client, uri, method, data='', raise_errors=True, timeout=None):
     """
     API request processor handling supported API methods and error messages returned from API. Refer to the Netki
     Apiary documentation for additional information. http://docs.netki.apiary.io/
@@ -17,13 +28,76 @@ def process_request(netki_client, uri, method, data=''):
     :param uri: api_url from Netki class init
     :param method: Request method
     :param data: PUT / POST data
-    :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. Exception for error responses.
+    :param raise_errors: When False, API error responses are returned as a NetkiError instead of being raised.
+    :param timeout: (Optional) Timeout in seconds, or a (connect, read) tuple, overriding the client timeouts.
+    :return: AttrDict for valid, non-error responses. Empty dict for 204 responses. NetkiError for error responses.
+
+    Error responses raise the NetkiError subclass matching the status code (AuthenticationError, NotFoundError,
+    ValidationError, RateLimitError), carrying the status code, the API failures list and the request method and URI.
+    Connection failures, including a connection dropped or a corrupt body while the response is read, raise
+    TransportError, timeouts RequestTimeoutError. A response body that is not JSON, e.g. a gateway error page, gives
+    the error class of its status code with an excerpt of the body as message. Bulk callers can pass
+    raise_errors=False and test the result with isinstance(result, NetkiError) to collect errors without raising them.
+
+    Responses are requested with gzip / deflate encoding and decoded as they stream in. Request bodies are gzipped
+    when the client has request compression enabled (see Netki.set_request_compression) and the body is large enough.
+
+    When the client has a response cache (see Netki.set_response_cache), GET responses carrying an ETag or
+    Last-Modified validator are cached per URI and revalidated with a conditional request. On 304 Not Modified the
+    cached AttrDict is returned; it is shared between callers and must not be modified.
+
+    When the client has a rate limiter (see Netki.set_rate_limit), calls wait for it before being sent.
+
+    Calls are bounded by the client timeouts (see Netki.set_timeouts) and by any active Deadline, which caps the
+    timeouts by the time remaining and fails with DeadlineExceededError once it has passed, including while the
+    response body is still arriving.
+
+    When the client has circuit breakers (see Netki.enable_circuit_breakers), calls to an endpoint group whose circuit
+    is open fail fast with CircuitOpenError.
+
+    When the client coalesces requests (see Netki.enable_request_coalescing), concurrent identical GETs to the
+    selected routes share a single API call and the same AttrDict.
     """
 
     if method not in ['GET', 'POST', 'PUT', 'DELETE']:
         raise Exception('Unsupported HTTP method: %s' % method)
 
-    headers = {}
+    single_flight = netki_client.single_flight
+    if method == 'GET' and single_flight is not None and single_flight.applies(uri):
+        rdata = single_flight.do(
+            (netki_client.credentials, method, uri),
+            lambda: _call(netki_client, uri, method, data, timeout)
+        )
+    else:
+        rdata = _call(netki_client, uri, method, data, timeout)
+
+    if isinstance(rdata, NetkiError) and raise_errors:
+        raise rdata
+
+    return rdata
+
+
+def _call(netki_client, uri, method, data, timeout):
+    """ Run the request through the circuit breaker of its endpoint group, when the client has circuit breakers. """
+
+    breakers = netki_client.circuit_breakers
+    if breakers is None:
+        return _process_request(netki_client, uri, method, data, timeout)
+
+    return breakers.get(endpoint_group(uri)).call(
+        lambda: _process_request(netki_client, uri, method, data, timeout),
+        method,
+        uri
+    )
+
+
+def _process_request(netki_client, uri, method, data, timeout):
+    """ Send the request and return the parsed response, or the NetkiError describing an error response. """
+
+    timeout = effective_timeout(netki_client.timeout, timeout, method, uri)
+    url = join_url(netki_client.api_url, uri)
+
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
     if data:
         headers['Content-Type'] = 'application/json'
         data = json.dumps(data)
@@ -34,57 +108,161 @@ def process_request(netki_client, uri, method, data=''):
             'X-Partner-ID': netki_client.partner_id
         })
 
-    elif netki_client._auth_type == 'distributed':
+    elif netki_client._auth_type in ('distributed', 'certificate'):
+        headers.update(_signed_headers(netki_client, method, uri, url, data))
 
-        key = SigningKey.from_der(netki_client.user_key.decode('hex'))
+    else:
+        raise Exception('Invalid Access Type Defined')
 
-        encoded_user_pub_key = key.get_verifying_key().to_der().encode('hex')
-        encoded_data_sig = key.sign(
-            netki_client.api_url + uri + data,
-            hashfunc=hashlib.sha256, sigencode=sigencode_der
-        ).encode('hex')
+    # Conditional GET using validators of a previously cached response
+    cache = netki_client.response_cache if method == 'GET' else None
+    cache_key = (netki_client.cache_namespace, uri)
+    cached = cache.get(cache_key) if cache is not None else None
 
-        headers.update({
-            'X-Partner-Key': netki_client.key_signing_key,
-            'X-Partner-KeySig': netki_client.signed_user_key,
-            'X-Identity': encoded_user_pub_key,
-            'X-Signature': encoded_data_sig
-        })
+    if cached:
+        etag, last_modified, cached_rdata = cached
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
 
-    elif netki_client._auth_type == 'certificate':
+    # Wait for the rate limiter, but no longer than the active deadline allows
+    rate_limiter = netki_client.rate_limiter
+    if rate_limiter is not None and not rate_limiter.acquire(check_deadline()):
+        raise DeadlineExceededError('Deadline Exceeded', method=method, uri=uri)
 
-        key = SigningKey.from_der(netki_client.user_key.decode('hex'))
+    body = data if data else None
+    transport = netki_client.transport
+    metrics = netki_client.metrics
+    threshold = netki_client.request_compression_threshold
 
-        encoded_user_pub_key = key.get_verifying_key().to_der().encode('hex')
-        encoded_data_sig = key.sign(netki_client.api_url + uri + data, hashfunc=hashlib.sha256, sigencode=sigencode_der).encode('hex')
+    if body:
+        metrics.incr('request_bytes', len(body))
 
-        headers.update({
-            'X-Identity': encoded_user_pub_key,
-            'X-Signature': encoded_data_sig,
-            'X-Partner-ID': netki_client.partner_id
-        })
+    if body and threshold is not None and len(body) >= threshold:
+        compressed_headers = dict(headers)
+        compressed_headers['Content-Encoding'] = 'gzip'
+        response = _send(transport, metrics, timeout, method, uri, url, compressed_headers, compress_body(body))
 
+        if response.status_code == 415:
+            # Server does not accept compressed request bodies, stop compressing for this client. The error body is
+            # drained so the pooled connection can be reused for the uncompressed request.
+            read_body(response)
+            response.close()
+            netki_client.request_compression_threshold = None
+            response = _send(transport, metrics, timeout, method, uri, url, headers, body)
     else:
-        raise Exception('Invalid Access Type Defined')
+        response = _send(transport, metrics, timeout, method, uri, url, headers, body)
 
-    response = requests.request(method=method, url=netki_client.api_url + uri, headers=headers, data=data if data else None)
+    try:
+        if method == 'DELETE' and response.status_code == 204:
+            return {}
 
-    if method == 'DELETE' and response.status_code == 204:
-        return {}
+        # An active Deadline bounds reading the body as a whole, not only each read from the socket
+        remaining = check_deadline(method=method, uri=uri)
 
-    rdata = AttrDict(response.json())
+        if cached and response.status_code == 304:
+            read_body(response, metrics, remaining)
+            metrics.incr('response_cache_not_modified')
+            return cached_rdata
 
-    if response.status_code >= 300 or not rdata.success:
-        error_message = rdata.message
+        body = read_body(response, metrics, remaining)
+    except DeadlineExceededError as e:
+        metrics.incr('request_timeouts')
+        raise DeadlineExceededError(e.message, response.status_code, method=method, uri=uri)
+    except urllib3_exceptions.ReadTimeoutError as e:
+        # The read timeout also applies to each read of the streamed body
+        metrics.incr('request_timeouts')
+        raise RequestTimeoutError(str(e), response.status_code, method=method, uri=uri)
+    except (urllib3_exceptions.ProtocolError, urllib3_exceptions.DecodeError, zlib.error) as e:
+        # Connection dropped or corrupt encoding while reading the body
+        raise TransportError(str(e), response.status_code, method=method, uri=uri)
+    finally:
+        response.close()
+
+    try:
+        rdata = json.loads(body)
+    except ValueError:
+        rdata = None
 
-        if 'failures' in rdata:
-            error_message += ' [FAILURES: '
-            failures = []
-            for failure in rdata.failures:
-                failures.append(failure.message)
+    if not isinstance(rdata, dict):
+        # Not an API response, e.g. the HTML error page of a gateway. Raise the error class of the status code.
+        excerpt = body[:200].decode('utf-8', 'replace').strip()
+        return error_from_response(
+            response.status_code, {'message': 'Invalid API Response: %s' % excerpt}, method, uri, response.headers
+        )
 
-            error_message = error_message + ', '.join(failures) + ']'
+    rdata = AttrDict(rdata)
+
+    if response.status_code >= 300 or not rdata.success:
+        return error_from_response(response.status_code, rdata, method, uri, response.headers)
 
-        raise Exception(error_message)
+    if cache is not None:
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            cache.put(cache_key, (etag, last_modified, rdata))
 
     return rdata
+
+
+def _signed_headers(netki_client, method, uri, url, data):
+    """
+    Build the identity and signature headers for distributed and certificate access. The signed string carries no
+    nonce, so prepared headers are kept in the client's signed_header_cache keyed by (cache namespace, method, uri,
+    body hash) and reused for identical requests without signing again.
+    """
+
+    cache = netki_client.signed_header_cache
+    cache_key = None
+
+    if cache is not None:
+        cache_key = (netki_client.cache_namespace, method, uri, hashlib.sha256(data).hexdigest())
+        cached_headers = cache.get(cache_key)
+        if cached_headers is not None:
+            return cached_headers
+
+    key = ecdsa.SigningKey.from_der(netki_client.user_key.decode('hex'))
+
+    encoded_user_pub_key = key.get_verifying_key().to_der().encode('hex')
+    encoded_data_sig = key.sign(
+        url + data,
+        hashfunc=hashlib.sha256, sigencode=ecdsa_util.sigencode_der
+    ).encode('hex')
+
+    if netki_client._auth_type == 'distributed':
+        signed_headers = {
+            'X-Partner-Key': netki_client.key_signing_key,
+            'X-Partner-KeySig': netki_client.signed_user_key,
+            'X-Identity': encoded_user_pub_key,
+            'X-Signature': encoded_data_sig
+        }
+    else:
+        signed_headers = {
+            'X-Identity': encoded_user_pub_key,
+            'X-Signature': encoded_data_sig,
+            'X-Partner-ID': netki_client.partner_id
+        }
+
+    if cache is not None:
+        cache.put(cache_key, signed_headers)
+
+    return signed_headers
+
+
+def _send(transport, metrics, timeout, method, uri, url, headers, body):
+
+    if body:
+        metrics.incr('request_wire_bytes', len(body))
+
+    start = time.time()
+    try:
+        response = transport.request(method=method, url=url, headers=headers, data=body, stream=True, timeout=timeout)
+        metrics.incr('requests')
+        metrics.observe('request_latency', time.time() - start)
+        return response
+    except requests_exceptions.Timeout as e:
+        metrics.incr('request_timeouts')
+        raise RequestTimeoutError(str(e), method=method, uri=uri)
+    except requests_exceptions.RequestException as e:
+        raise TransportError(str(e), method=method, uri=uri)
@@ -0,0 +1,180 @@
+__author__ = 'frank'
+
+import threading
+
+from Checkpoint import open_checkpoint, read_checkpoint, write_entry
+from CircuitBreaker import is_failure
+from Deadline import wait_before_retry
+from Errors import NetkiError
+from Requestor import process_request
+from WorkerPool import WorkerPool
+
+import Routes
+
+REVOKED = 'revoked'
+FAILED = 'failed'
+
+
+class RevocationOutcome(object):
+    """
+    Outcome of revoking one certificate.
+
+    :param certificate_id: Certificate ID
+    :param status: ``revoked`` or ``failed``
+    :param attempts: Number of DELETE requests sent.
+    :param error: NetkiError of the last attempt for failed revocations, None otherwise.
+    """
+
+    def __init__(self, certificate_id, status, attempts, error=None):
+
+        self.certificate_id = certificate_id
+        self.status = status
+        self.attempts = attempts
+        self.error = error
+
+    def to_dict(self):
+        """ JSON serializable representation, the inverse of RevocationOutcome.from_dict(). """
+
+        return {
+            'certificate_id': self.certificate_id,
+            'status': self.status,
+            'attempts': self.attempts,
+            'error': self.error.to_dict() if self.error else None
+        }
+
+    @staticmethod
+    def from_dict(data):
+        error = NetkiError.from_dict(data['error']) if data.get('error') else None
+        return RevocationOutcome(data['certificate_id'], data['status'], data['attempts'], error)
+
+
+class RevocationReport(object):
+    """
+    Outcome of a CertificateRevoker run. ``outcomes`` holds a RevocationOutcome per certificate, in input order.
+    """
+
+    def __init__(self):
+
+        self.outcomes = []
+        self.resumed = 0
+
+    @property
+    def revoked(self):
+        return [outcome for outcome in self.outcomes if outcome.status == REVOKED]
+
+    @property
+    def failed(self):
+        return [outcome for outcome in self.outcomes if outcome.status == FAILED]
+
+    def to_dicts(self):
+        """ List of JSON serializable outcomes, e.g. to persist the report. """
+        return [outcome.to_dict() for outcome in self.outcomes]
+
+
+class CertificateRevoker(object):
+    """
+    Revoke many certificates concurrently, e.g. after a key compromise. Up to concurrency DELETE requests are in
+    flight at once over the client's pooled connections, subject to the client's rate limit and circuit breakers.
+
+    Transient failures (transport errors, timeouts, rate limiting and 5xx responses) are retried up to max_attempts
+    with exponential backoff and jitter, honouring Retry-After. Revocation is idempotent: a 409 Conflict on a retry
+    means an earlier attempt whose response was lost already revoked the certificate, and counts as revoked.
+
+    When a checkpoint_path is given, every outcome is appended to it as a JSON line. Running the revocation again with
+    the same checkpoint_path skips certificates already revoked and retries the failed ones.
+
+    :param netki_client: Netki client used for all API calls.
+    :param concurrency: Maximum number of revocations in flight at once.
+    :param max_attempts: Maximum number of DELETE requests per certificate.
+    :param backoff: Seconds to wait before the first retry, doubled for every further retry.
+    :param checkpoint_path: (Optional) Path of the checkpoint file.
+    """
+
+    def __init__(self, netki_client, concurrency=8, max_attempts=4, backoff=0.5, checkpoint_path=None):
+
+        if max_attempts < 1:
+            raise ValueError('max_attempts must be at least 1')
+
+        self.netki_client = netki_client
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.checkpoint_path = checkpoint_path
+
+        self._lock = threading.Lock()
+
+    def revoke(self, ids_or_certs, reason):
+        """
+        Revoke every certificate.
+
+        :param ids_or_certs: List of certificate IDs or Certificate objects.
+        :param reason: Reason for revocation, such as private key compromised.
+        :return: RevocationReport
+        """
+
+        certificate_ids = [getattr(item, 'id', item) for item in ids_or_certs]
+        if not all(certificate_ids):
+            raise ValueError('Missing ID - Order Not Yet Submitted')
+
+        report = RevocationReport()
+        revoked = dict(
+            (entry['certificate_id'], RevocationOutcome.from_dict(entry))
+            for entry in read_checkpoint(self.checkpoint_path) if entry['status'] == REVOKED
+        )
+
+        pending = [certificate_id for certificate_id in certificate_ids if certificate_id not in revoked]
+        report.resumed = len(certificate_ids) - len(pending)
+
+        outcomes = {}
+        if pending:
+            checkpoint = open_checkpoint(self.checkpoint_path) if self.checkpoint_path else None
+            try:
+                with WorkerPool(self.concurrency) as pool:
+                    tasks = pool.map(lambda certificate_id: self._revoke(certificate_id, reason, checkpoint), pending)
+                for certificate_id, task in zip(pending, tasks):
+                    outcomes[certificate_id] = task.result()
+            finally:
+                if checkpoint:
+                    checkpoint.close()
+
+        for certificate_id in certificate_ids:
+            report.outcomes.append(outcomes.get(certificate_id) or revoked[certificate_id])
+
+        return report
+
+    def _revoke(self, certificate_id, reason, checkpoint):
+
+        uri = Routes.CERTIFICATE.expand(certificate_id=certificate_id)
+        attempts = 0
+        error = None
+
+        while attempts < self.max_attempts:
+            if attempts:
+                try:
+                    wait_before_retry(attempts, error, self.backoff, 'DELETE', uri)
+                except NetkiError as e:
+                    error = e
+                    break
+
+            attempts += 1
+            try:
+                process_request(self.netki_client, uri, 'DELETE', {'revocation_reason': reason})
+                error = None
+                break
+            except Exception as e:
+                # Unexpected errors fail this certificate only, not the whole revocation
+                error = e if isinstance(e, NetkiError) else NetkiError(str(e))
+                if attempts > 1 and error.status_code == 409:
+                    error = None
+                    break
+                if not is_failure(error):
+                    break
+
+        outcome = RevocationOutcome(certificate_id, FAILED if error else REVOKED, attempts, error)
+        self.netki_client.metrics.incr('revocations_failed' if error else 'revocations')
+
+        if checkpoint:
+            with self._lock:
+                write_entry(checkpoint, outcome.to_dict())
+
+        return outcome
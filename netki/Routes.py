@@ -0,0 +1,173 @@
+__author__ = 'frank'
+
+import re
+
+import six
+from six.moves.urllib.parse import quote
+
+_PLACEHOLDER = re.compile(r'\{(\w+)\}')
+_QUOTE_CACHE_SIZE = 4096
+
+_quote_cache = {}
+_base_url_cache = {}
+
+
+def quote_component(value):
+    """
+    Percent-encode a single path segment or query value. Unicode values are UTF-8 encoded first and ``/`` is encoded,
+    so a value can never escape its segment. Recently encoded values are memoized since bulk operations tend to reuse
+    the same domain names and identifiers (see benchmarks/bench_routes.py).
+
+    :param value: Value to encode. Non-string values are converted with str().
+    :return: Percent-encoded string.
+    """
+
+    # Keyed by type as well, equal values such as 1, 1.0 and True encode differently
+    key = (type(value), value)
+    try:
+        return _quote_cache[key]
+    except KeyError:
+        pass
+    except TypeError:
+        return _quote(value)
+
+    encoded = _quote(value)
+
+    if len(_quote_cache) >= _QUOTE_CACHE_SIZE:
+        _quote_cache.clear()
+    _quote_cache[key] = encoded
+
+    return encoded
+
+
+def _quote(value):
+
+    if isinstance(value, six.text_type):
+        return quote(value.encode('utf-8'), safe='')
+    if isinstance(value, six.binary_type):
+        return quote(value, safe='')
+    return quote(str(value), safe='')
+
+
+def build_query(params):
+    """
+    Build a query string from an ordered sequence of (name, value) pairs. Pairs with an empty value are skipped.
+
+    :param params: Sequence of (name, value) tuples.
+    :return: Encoded query string without the leading ``?``. Empty string when no values are present.
+    """
+
+    return '&'.join(['%s=%s' % (name, quote_component(value)) for name, value in params if value])
+
+
+def join_url(api_url, uri):
+    """
+    Join the client api_url and a route URI. The normalized base URL is cached per api_url so a trailing slash on
+    the configured api_url does not produce a double slash.
+
+    :param api_url: Netki client api_url. ``https://api.netki.com``
+    :param uri: URI produced by a Route. ``/v1/partner/walletname``
+    :return: Absolute URL.
+    """
+
+    try:
+        base = _base_url_cache[api_url]
+    except KeyError:
+        base = _base_url_cache[api_url] = api_url.rstrip('/') if api_url else ''
+
+    return base + uri
+
+
+class Route(object):
+    """
+    Precompiled URI template. Placeholders are written as ``{name}`` and the template is split into literal and
+    parameter parts once, when the route table is loaded.
+
+    :param template: URI template. ``/v1/partner/domain/{domain_name}``
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+        pieces = _PLACEHOLDER.split(template)
+        self._params = tuple(pieces[1::2])
+        self._format = '%s'.join(literal.replace('%', '%%') for literal in pieces[0::2])
+        self._pattern = re.compile('[^/?]+'.join(re.escape(literal) for literal in pieces[0::2]) + r'(\?.*)?$')
+
+    def expand(self, query=None, **params):
+        """
+        Build the URI for this route.
+
+        :param query: (Optional) Sequence of (name, value) tuples appended as a percent-encoded query string.
+        :param params: Values for the template placeholders. Each value is percent-encoded as a path segment.
+        :return: URI relative to the client api_url.
+        """
+
+        if self._params:
+            try:
+                uri = self._format % tuple([quote_component(params[name]) for name in self._params])
+            except KeyError as e:
+                raise ValueError('Missing URI parameter: %s' % e.args[0])
+        else:
+            uri = self.template
+
+        if query:
+            query_string = build_query(query)
+            if query_string:
+                uri = uri + '?' + query_string
+
+        return uri
+
+    def matches(self, uri):
+        """
+        Returns True if uri was built from this route, with any parameter values and query string.
+
+        :param uri: URI relative to the client api_url.
+        """
+
+        return self._pattern.match(uri) is not None
+
+    def __repr__(self):
+        return 'Route(%r)' % self.template
+
+
+# Route Table #
+WALLET_NAMES = Route('/v1/partner/walletname')
+
+PARTNERS = Route('/v1/admin/partner')
+PARTNER = Route('/v1/admin/partner/{partner_name}')
+
+DOMAINS = Route('/api/domain')
+DOMAIN = Route('/api/domain/{domain_name}')
+PARTNER_DOMAIN = Route('/v1/partner/domain/{domain_name}')
+PARTNER_DOMAIN_DNSSEC = Route('/v1/partner/domain/dnssec/{domain_name}')
+
+CERTIFICATE_TOKEN = Route('/v1/certificate/token')
+CERTIFICATE_ORDER = Route('/v1/certificate')
+CERTIFICATE = Route('/v1/certificate/{certificate_id}')
+CERTIFICATE_CSR = Route('/v1/certificate/{certificate_id}/csr')
+CERTIFICATE_PRODUCTS = Route('/v1/certificate/products')
+CERTIFICATE_CACERT = Route('/v1/certificate/cacert')
+CERTIFICATE_BALANCE = Route('/v1/certificate/balance')
+
+# Endpoint groups, used to isolate failures of one part of the API (see CircuitBreaker) #
+_ENDPOINT_GROUPS = (
+    ('/v1/partner/walletname', 'walletname'),
+    ('/v1/partner/domain', 'domain'),
+    ('/api/domain', 'domain'),
+    ('/v1/certificate', 'certificate'),
+    ('/v1/admin', 'admin')
+)
+
+
+def endpoint_group(uri):
+    """
+    Returns the endpoint group of uri: ``walletname``, ``domain``, ``certificate``, ``admin`` or ``other``.
+
+    :param uri: URI relative to the client api_url.
+    """
+
+    for prefix, group in _ENDPOINT_GROUPS:
+        if uri.startswith(prefix):
+            return group
+    return 'other'
@@ -0,0 +1,77 @@
+__author__ = 'frank'
+
+import sys
+import threading
+
+import six
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.exc_info = None
+
+
+class SingleFlight(object):
+    """
+    Coalesce identical concurrent calls. While a call for a key is in flight, other callers with the same key wait
+    for it and receive its result, or its exception, instead of making their own call. Only routes passed to the
+    constructor are coalesced. Callers that shared another call's result are counted in metrics as
+    ``coalesced_requests``.
+
+    :param routes: List of Routes.Route objects whose GET requests may be coalesced.
+    :param metrics: (Optional) Metrics instance
+    """
+
+    def __init__(self, routes, metrics=None):
+
+        self.routes = list(routes)
+        self.metrics = metrics
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def applies(self, uri):
+        """ Returns True if uri belongs to one of the coalesced routes. """
+
+        for route in self.routes:
+            if route.matches(uri):
+                return True
+        return False
+
+    def do(self, key, func):
+        """
+        Run func(), or wait for the in-flight call with the same key and share its outcome.
+
+        :param key: Hashable call identity, e.g. (credentials, method, uri)
+        :param func: Callable making the call.
+        :return: Result of func()
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if self.metrics is not None:
+                self.metrics.incr('coalesced_requests')
+
+            call.event.wait()
+            if call.exc_info:
+                six.reraise(*call.exc_info)
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception:
+            call.exc_info = sys.exc_info()
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
@@ -0,0 +1,43 @@
+__author__ = 'frank'
+
+
+class StringInterner(object):
+    """
+    Size bounded intern table for values repeated across the records of a response, e.g. domain names and currency
+    codes in Wallet Name listings. The JSON decoder creates a new string object for every occurrence; interning maps
+    equal values to one shared object so that the duplicates can be freed.
+
+    Unlike the builtin intern(), which only accepts byte strings on Python 2, this handles unicode values and is kept
+    per client. Once maxsize values are interned, new values are returned as is, so a stream of unique values can not
+    grow the table without bound.
+
+    :param maxsize: Maximum number of interned values.
+    """
+
+    def __init__(self, maxsize=10000):
+
+        if maxsize < 1:
+            raise ValueError('StringInterner maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self._table = {}
+
+    def intern(self, value):
+        """ Returns the interned object equal to value, interning value if there is room. """
+
+        try:
+            return self._table[value]
+        except KeyError:
+            if len(self._table) >= self.maxsize:
+                return value
+            return self._table.setdefault(value, value)
+
+    def clear(self):
+        """ Remove all interned values. """
+        self._table.clear()
+
+    def __len__(self):
+        return len(self._table)
+
+    def __contains__(self, value):
+        return value in self._table
@@ -0,0 +1,71 @@
+__author__ = 'frank'
+
+import threading
+
+from six.moves import http_cookiejar
+
+from LazyImport import lazy_import
+
+# requests is loaded when the first request is sent rather than when the client is created
+requests = lazy_import('requests')
+requests_adapters = lazy_import('requests.adapters')
+
+
+class Transport(object):
+    """
+    Thread-safe HTTP transport shared by every thread using a Netki client. Connections are pooled in a single
+    HTTPAdapter, which is safe to share, while each thread gets its own requests.Session so no per-request session
+    state is shared between threads. Sessions accept no cookies: a transport may serve several partners, see
+    ClientPool, and a cookie set in a response to one of them must not be sent with the requests of another.
+
+    :param pool_maxsize: Maximum number of pooled connections kept per host.
+    :param pool_block: When True, threads wait for a free pooled connection instead of opening extra connections.
+    """
+
+    def __init__(self, pool_maxsize=10, pool_block=False):
+
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+
+        self._adapter = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def adapter(self):
+        """ HTTPAdapter holding the shared connection pool, created on first use. """
+
+        if self._adapter is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = requests_adapters.HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=self.pool_block
+                    )
+
+        return self._adapter
+
+    @property
+    def session(self):
+        """ requests.Session for the calling thread, mounted on the shared connection pool. """
+
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = requests.Session()
+            session.cookies.set_policy(http_cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+            self._local.session = session
+
+        return session
+
+    def request(self, method, url, **kwargs):
+        """ Same signature as requests.request(), sent over the shared connection pool. """
+        return self.session.request(method=method, url=url, **kwargs)
+
+    def close(self):
+        """ Close all pooled connections. """
+        if self._adapter is not None:
+            self._adapter.close()
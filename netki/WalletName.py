@@ -5,6 +5,12 @@ import json
 from BaseObject import BaseObject
 from Requestor import process_request
 
+import Routes
+
+
+def _identity(value):
+    return value
+
 
 class WalletName(BaseObject):
     """
@@ -25,6 +31,39 @@ class WalletName(BaseObject):
         self.id = id
         self.wallets = {}
 
+    @classmethod
+    def from_api_data(cls, records, netki_client=None, interner=None):
+        """
+        Build WalletName objects in bulk from the raw ``wallet_names`` dictionaries of an API response. Objects are
+        populated directly rather than through __init__ and set_currency_address(), and all share netki_client, which
+        makes this much faster than building them one by one for large listings.
+
+        :param records: List of Wallet Name dictionaries in the ``wallet_names`` API format.
+        :param netki_client: (Optional) Netki client set on every WalletName.
+        :param interner: (Optional) StringInterner used to share one object per distinct domain_name and currency.
+        :return: List of WalletName objects.
+        """
+
+        new = cls.__new__
+        wallet_names = []
+        append = wallet_names.append
+        intern = interner.intern if interner is not None else _identity
+        for record in records:
+            wallet_name = new(cls)
+            wallet_name.__dict__.update(
+                netki_client=netki_client,
+                domain_name=intern(record['domain_name']),
+                name=record['name'],
+                external_id=record.get('external_id'),
+                id=record.get('id'),
+                wallets=dict([
+                    (intern(wallet['currency']), wallet['wallet_address']) for wallet in record.get('wallets') or ()
+                ])
+            )
+            append(wallet_name)
+
+        return wallet_names
+
     def get_used_currencies(self):
         """
         Returns wallets dictionary containing currencies and wallet addresses.
@@ -50,13 +89,10 @@ class WalletName(BaseObject):
         if self.wallets[currency]:
             del self.wallets[currency]
 
-    def save(self):
+    def get_api_data(self):
         """
-        Commit changes to a WalletName object by submitting them to the API. For new Wallet Names, an id will
-        automatically be generated by the server. Run Netki.create_wallet_name() to create a new WalletName object,
-        then run save() on your WalletName object to submit it to the API. To update a Wallet Name, run
-        Netki.get_wallet_names() to retrieve the Wallet Name object, make your updates, then run save() on the
-        WalletName object to commit changes to the API.
+        Returns the Wallet Name as a dictionary in the format used by the ``wallet_names`` list of the Wallet Name API.
+        The id is included for Wallet Names that exist remotely.
         """
 
         wallet_data = []
@@ -74,21 +110,34 @@ class WalletName(BaseObject):
             'external_id': self.external_id
         }
 
-        wn_api_data = {'wallet_names': [wallet_name_data]}
+        if self.id:
+            wallet_name_data['id'] = self.id
+
+        return wallet_name_data
+
+    def save(self):
+        """
+        Commit changes to a WalletName object by submitting them to the API. For new Wallet Names, an id will
+        automatically be generated by the server. Run Netki.create_wallet_name() to create a new WalletName object,
+        then run save() on your WalletName object to submit it to the API. To update a Wallet Name, run
+        Netki.get_wallet_names() to retrieve the Wallet Name object, make your updates, then run save() on the
+        WalletName object to commit changes to the API.
+        """
+
+        wn_api_data = {'wallet_names': [self.get_api_data()]}
 
         # If an ID is present it exists in Netki's systems, therefore submit an update
         if self.id:
-            wallet_name_data['id'] = self.id
             response = process_request(
                 self.netki_client,
-                '/v1/partner/walletname',
+                Routes.WALLET_NAMES.expand(),
                 'PUT',
                 wn_api_data
             )
         else:
             response = process_request(
                 self.netki_client,
-                '/v1/partner/walletname',
+                Routes.WALLET_NAMES.expand(),
                 'POST',
                 wn_api_data
             )
@@ -117,7 +166,7 @@ class WalletName(BaseObject):
 
         process_request(
             self.netki_client,
-            '/v1/partner/walletname',
+            Routes.WALLET_NAMES.expand(),
             'DELETE',
             wn_api_data
         )
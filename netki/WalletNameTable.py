@@ -0,0 +1,248 @@
+__author__ = 'frank'
+
+from array import array
+from collections import Counter
+from itertools import compress
+
+from six.moves import zip
+
+from WalletName import WalletName
+
+_GROUP_FIELDS = ('domain_name', 'currency')
+
+
+class _StringPool(object):
+    """ Interned values of a low cardinality column, stored once and referenced by integer code. """
+
+    def __init__(self):
+
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value):
+        """ Code of value, None if it has not been seen. """
+        return self._codes.get(value)
+
+
+class WalletNameTable(object):
+    """
+    Columnar container for large Wallet Name sets, for analytics such as counting names per currency per domain.
+
+    Rows are stored column by column instead of as one WalletName object each. Domain names and currencies are
+    interned and stored as integer codes in compact ``array`` columns; names, external ids and ids are plain lists.
+    Wallets are stored flat, with ``wallet_offsets[i]:wallet_offsets[i + 1]`` the wallets of row i. WalletName objects
+    are only built when rows are accessed, by index or iteration.
+
+        table = netki.get_wallet_names_table()
+        table.count_by('domain_name', 'currency')      # {('domain.com', 'btc'): 1200, ...}
+        for wallet_name in table.filter(currency='ltc'):
+            ...
+
+    :param netki_client: (Optional) Netki client set on WalletName objects built from the table.
+    """
+
+    def __init__(self, netki_client=None):
+
+        self.netki_client = netki_client
+
+        self.names = []
+        self.external_ids = []
+        self.ids = []
+        self.domain_codes = array('i')
+        self.wallet_offsets = array('l', [0])
+        self.wallet_currency_codes = array('i')
+        self.wallet_addresses = []
+
+        self._domains = _StringPool()
+        self._currencies = _StringPool()
+
+    @classmethod
+    def from_api_data(cls, records, netki_client=None):
+        """
+        Build a table from the raw ``wallet_names`` dictionaries of an API response.
+
+        :param records: List of Wallet Name dictionaries in the ``wallet_names`` API format.
+        :param netki_client: (Optional) Netki client
+        :return: WalletNameTable
+        """
+
+        table = cls(netki_client)
+        for record in records:
+            table.append(
+                record['domain_name'],
+                record['name'],
+                record.get('external_id'),
+                record.get('id'),
+                [(wallet['currency'], wallet['wallet_address']) for wallet in record.get('wallets') or ()]
+            )
+        return table
+
+    @classmethod
+    def from_wallet_names(cls, wallet_names, netki_client=None):
+        """
+        Build a table from WalletName objects.
+
+        :param wallet_names: Iterable of WalletName objects.
+        :param netki_client: (Optional) Netki client
+        :return: WalletNameTable
+        """
+
+        table = cls(netki_client)
+        for wallet_name in wallet_names:
+            table.append(
+                wallet_name.domain_name, wallet_name.name, wallet_name.external_id, wallet_name.id,
+                wallet_name.wallets.items()
+            )
+        return table
+
+    def append(self, domain_name, name, external_id=None, id=None, wallets=()):
+        """
+        Add a row.
+
+        :param wallets: Iterable of (currency, wallet_address) tuples.
+        """
+
+        self.domain_codes.append(self._domains.code(domain_name))
+        self.names.append(name)
+        self.external_ids.append(external_id)
+        self.ids.append(id)
+
+        for currency, wallet_address in wallets:
+            self.wallet_currency_codes.append(self._currencies.code(currency))
+            self.wallet_addresses.append(wallet_address)
+        self.wallet_offsets.append(len(self.wallet_addresses))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        """ Returns row index as a new WalletName object. """
+
+        if index < 0:
+            index += len(self)
+
+        wallet_name = WalletName(
+            self._domains.values[self.domain_codes[index]], self.names[index], self.external_ids[index],
+            self.ids[index]
+        )
+
+        currencies = self._currencies.values
+        start, end = self.wallet_offsets[index], self.wallet_offsets[index + 1]
+        wallet_name.wallets = dict(
+            (currencies[code], address)
+            for code, address in zip(self.wallet_currency_codes[start:end], self.wallet_addresses[start:end])
+        )
+        wallet_name.set_netki_client(self.netki_client)
+
+        return wallet_name
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_wallet_names(self):
+        """ Returns every row as a WalletName object. """
+        return list(self)
+
+    @property
+    def domain_names(self):
+        """ Column of domain names, one per row. """
+        values = self._domains.values
+        return [values[code] for code in self.domain_codes]
+
+    def wallets_of(self, index):
+        """ List of (currency, wallet_address) tuples of row index. """
+
+        currencies = self._currencies.values
+        start, end = self.wallet_offsets[index], self.wallet_offsets[index + 1]
+        return [
+            (currencies[code], address)
+            for code, address in zip(self.wallet_currency_codes[start:end], self.wallet_addresses[start:end])
+        ]
+
+    def filter(self, domain_name=None, currency=None):
+        """
+        Returns a new table with the rows of domain_name and/or the rows having a wallet for currency. The new table
+        shares the interned values of this one.
+        """
+
+        selected = [True] * len(self)
+
+        if domain_name is not None:
+            code = self._domains.find(domain_name)
+            selected = [keep and row_code == code for keep, row_code in zip(selected, self.domain_codes)]
+
+        if currency is not None:
+            code = self._currencies.find(currency)
+            has_currency = [False] * len(self)
+            for row, wallet_code in zip(self._wallet_rows(), self.wallet_currency_codes):
+                if wallet_code == code:
+                    has_currency[row] = True
+            selected = [keep and has for keep, has in zip(selected, has_currency)]
+
+        return self._take(selected)
+
+    def count_by(self, *fields):
+        """
+        Count Wallet Names per group. Grouping by currency counts the Wallet Names having a wallet for that currency.
+
+        :param fields: ``domain_name`` and/or ``currency``
+        :return: Dictionary of group value, or tuple of values for several fields, to Wallet Name count.
+        """
+
+        if not fields or any(field not in _GROUP_FIELDS for field in fields):
+            raise ValueError('count_by Fields Must Be Among: %s' % ', '.join(_GROUP_FIELDS))
+
+        pools = {'domain_name': self._domains.values, 'currency': self._currencies.values}
+
+        if 'currency' in fields:
+            # Domain code of every wallet, to group wallets by the domain of their row
+            wallet_domains = array('i', [self.domain_codes[row] for row in self._wallet_rows()])
+            columns = {'domain_name': wallet_domains, 'currency': self.wallet_currency_codes}
+        else:
+            columns = {'domain_name': self.domain_codes}
+
+        if len(fields) == 1:
+            values = pools[fields[0]]
+            return dict((values[code], count) for code, count in Counter(columns[fields[0]]).items())
+
+        counts = Counter(zip(*[columns[field] for field in fields]))
+        return dict(
+            (tuple(pools[field][code] for field, code in zip(fields, key)), count) for key, count in counts.items()
+        )
+
+    def _wallet_rows(self):
+        """ Row index of every wallet. """
+
+        rows = []
+        offsets = self.wallet_offsets
+        for row in range(len(self)):
+            rows.extend([row] * (offsets[row + 1] - offsets[row]))
+        return rows
+
+    def _take(self, selected):
+
+        table = WalletNameTable(self.netki_client)
+        table._domains = self._domains
+        table._currencies = self._currencies
+
+        table.names = list(compress(self.names, selected))
+        table.external_ids = list(compress(self.external_ids, selected))
+        table.ids = list(compress(self.ids, selected))
+        table.domain_codes = array('i', compress(self.domain_codes, selected))
+
+        for row in compress(range(len(self)), selected):
+            start, end = self.wallet_offsets[row], self.wallet_offsets[row + 1]
+            table.wallet_currency_codes.extend(self.wallet_currency_codes[start:end])
+            table.wallet_addresses.extend(self.wallet_addresses[start:end])
+            table.wallet_offsets.append(len(table.wallet_addresses))
+
+        return table
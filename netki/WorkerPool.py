@@ -0,0 +1,140 @@
+__author__ = 'frank'
+
+import sys
+import threading
+
+from six.moves import queue
+
+from Deadline import Deadline, activate
+
+_STOP = object()
+
+
+class Task(object):
+    """
+    Handle for work submitted to a WorkerPool. The Deadline scopes active in the submitting thread also apply while
+    the task runs.
+    """
+
+    def __init__(self, func, args, kwargs):
+
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._deadlines = Deadline.current()
+        self._event = threading.Event()
+        self._result = None
+        self._exc_info = None
+
+    def run(self):
+
+        try:
+            with activate(self._deadlines):
+                self._result = self._func(*self._args, **self._kwargs)
+        except Exception:
+            self._exc_info = sys.exc_info()
+        finally:
+            self._event.set()
+
+    def done(self):
+        """ Returns True once the task has finished running. """
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """ Wait for the task to finish. Returns True if it finished within timeout. """
+        return self._event.wait(timeout)
+
+    def exception(self):
+        """ Wait for the task and return the exception it raised, None if it succeeded. """
+        self._event.wait()
+        return self._exc_info[1] if self._exc_info else None
+
+    def result(self):
+        """ Wait for the task and return its result, re-raising any exception it raised. """
+        self._event.wait()
+        if self._exc_info:
+            raise self._exc_info[1]
+        return self._result
+
+
+class WorkerPool(object):
+    """
+    Fixed number of worker threads consuming submitted tasks. The pool size is the concurrency budget: at most ``size``
+    tasks, and therefore API calls, run at once. Tasks may submit follow-up tasks to the same pool.
+
+    :param size: Number of worker threads.
+    """
+
+    def __init__(self, size):
+
+        if size < 1:
+            raise ValueError('WorkerPool size must be at least 1')
+
+        self.size = size
+        self._queue = queue.Queue()
+        self._threads = []
+        self._closed = False
+
+        for _ in range(size):
+            thread = threading.Thread(target=self._worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _worker(self):
+
+        while True:
+            task = self._queue.get()
+            if task is _STOP:
+                return
+            task.run()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue func(*args, **kwargs) for execution.
+
+        :return: Task
+        """
+
+        if self._closed:
+            raise Exception('WorkerPool Has Been Shut Down')
+
+        task = Task(func, args, kwargs)
+        self._queue.put(task)
+        return task
+
+    def map(self, func, items):
+        """
+        Run func over items concurrently and wait for all of them.
+
+        :return: List of Tasks in the same order as items.
+        """
+
+        tasks = [self.submit(func, item) for item in items]
+        for task in tasks:
+            task.wait()
+        return tasks
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers once queued tasks have run.
+
+        :param wait: Block until all worker threads have exited.
+        """
+
+        if self._closed:
+            return
+
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(_STOP)
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
@@ -74,6 +74,23 @@ class TestSubmitCustomerData(TestCase):
         self.assertEqual(0, self.mockProcessRequest.call_count)
 
 
+class TestBuildCustomerDataPayload(TestCase):
+
+    def test_go_right(self):
+
+        customer_data = {
+            'first_name': 'first_name',
+            'partner_name': 'partner_name',
+            'identity_expiration': datetime(2020, 01, 03)
+        }
+
+        self.assertDictEqual(
+            {'first_name': 'first_name', 'identity_expiration': '2020-01-03', 'product': 'product_id'},
+            Certificate.build_customer_data_payload(customer_data, 'product_id')
+        )
+        self.assertIn('partner_name', customer_data)
+
+
 class TestSubmitCertificateOrder(TestCase):
     def setUp(self):
         self.patcher1 = patch('Certificate.process_request')
@@ -326,6 +343,18 @@ class TestIsOrderComplete(TestCase):
         self.assertFalse(self.cert.is_order_complete())
         self.assertEqual(1, self.mockGetStatus.call_count)
 
+    def test_completed_on_refresh(self):
+
+        self.cert.order_status = 'pending'
+
+        def get_status():
+            self.cert.order_status = 'Order Finalized'
+
+        self.mockGetStatus.side_effect = get_status
+
+        self.assertTrue(self.cert.is_order_complete())
+        self.assertEqual(1, self.mockGetStatus.call_count)
+
 
 class TestSetPartnerName(TestCase):
     def test_go_right(self):
@@ -0,0 +1,194 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from Certificate import Certificate
+from CertificateBatch import CustomerDataSubmitter, record_keys
+from Errors import ValidationError
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+
+
+class TestCustomerDataSubmitter(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.server.route('POST', '/v1/certificate/token', self.create_token)
+
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmpdir, 'checkpoint.jsonl')
+
+        self.certificates = [
+            Certificate({
+                'first_name': 'first%d' % i,
+                'partner_name': 'partner_name',
+                'identity_expiration': datetime(2030, 1, 3),
+                'email': 'user%d@example.com' % i
+            }, 'product_id') for i in range(20)
+        ]
+        self.certificates[7].customer_data['first_name'] = 'invalid'
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def create_token(self, request):
+
+        if request.body['first_name'] == 'invalid':
+            return 400, {
+                'success': False,
+                'message': 'Invalid customer data',
+                'failures': [{'message': 'first_name is invalid'}]
+            }
+
+        return 200, {'success': True, 'token': 'token-' + request.body['first_name']}
+
+    def keys(self, certificates):
+        return record_keys(Certificate.build_customer_data_payloads(
+            [c.customer_data for c in certificates], [c.product_id for c in certificates]
+        ))
+
+    def test_go_right(self):
+
+        report = CustomerDataSubmitter(self.netki, processes=3, chunksize=4).submit(self.certificates)
+
+        self.assertEqual(20, report.submitted)
+        self.assertEqual(0, report.resumed)
+        for i, cert in enumerate(self.certificates):
+            if i != 7:
+                self.assertEqual('token-first%d' % i, cert.data_token)
+        self.assertIsNone(self.certificates[7].data_token)
+
+        self.assertEqual([7], [index for index, error in report.failures])
+        error = report.failures[0][1]
+        self.assertIsInstance(error, ValidationError)
+        self.assertEqual(400, error.status_code)
+        self.assertEqual(['first_name is invalid'], error.failure_messages)
+        self.assertEqual({'Invalid customer data [FAILURES: first_name is invalid]': 1}, report.failure_counts)
+
+        # Payloads are formatted the same way as Certificate.submit_customer_data
+        request = [r for r in self.server.requests if r.body['first_name'] == 'first0'][0]
+        self.assertDictEqual({
+            'first_name': 'first0',
+            'identity_expiration': '2030-01-03',
+            'email': 'user0@example.com',
+            'product': 'product_id'
+        }, request.body)
+
+    def test_checkpoint_and_resume(self):
+
+        keys = self.keys(self.certificates)
+
+        # Simulate a previous run that crashed after two records and while writing a third
+        with open(self.checkpoint_path, 'w') as checkpoint:
+            checkpoint.write(json.dumps({'key': keys[0], 'token': 'previous0', 'error': None}) + '\n')
+            checkpoint.write(json.dumps({'key': keys[7], 'token': None, 'error': 'Invalid customer data'}) + '\n')
+            checkpoint.write('{"key": "%s", "tok' % keys[3])
+
+        submitter = CustomerDataSubmitter(self.netki, processes=2, checkpoint_path=self.checkpoint_path)
+        report = submitter.submit(self.certificates)
+
+        self.assertEqual(2, report.resumed)
+        self.assertEqual(18, report.submitted)
+        self.assertEqual('previous0', self.certificates[0].data_token)
+        self.assertEqual('token-first3', self.certificates[3].data_token)
+        self.assertEqual([(7, 'Invalid customer data')], [(i, str(e)) for i, e in report.failures])
+        self.assertEqual(18, len(self.server.requests))
+
+        # Every record is now in the checkpoint, a second run submits nothing
+        report = submitter.submit(self.certificates)
+
+        self.assertEqual(20, report.resumed)
+        self.assertEqual(0, report.submitted)
+        self.assertEqual(18, len(self.server.requests))
+
+    def test_checkpoint_keeps_structured_errors(self):
+
+        submitter = CustomerDataSubmitter(self.netki, processes=2, checkpoint_path=self.checkpoint_path)
+        submitter.submit(self.certificates)
+        report = submitter.submit(self.certificates)
+
+        self.assertEqual(20, report.resumed)
+        index, error = report.failures[0]
+        self.assertEqual(7, index)
+        self.assertIsInstance(error, ValidationError)
+        self.assertEqual('first_name is invalid', error.failures[0].message)
+
+    def test_retry_failed(self):
+
+        with open(self.checkpoint_path, 'w') as checkpoint:
+            checkpoint.write(json.dumps({
+                'key': self.keys(self.certificates[:2])[1], 'token': None, 'error': 'Temporary error'
+            }) + '\n')
+
+        submitter = CustomerDataSubmitter(
+            self.netki, processes=2, checkpoint_path=self.checkpoint_path, retry_failed=True
+        )
+        report = submitter.submit(self.certificates[:2])
+
+        self.assertEqual(2, report.submitted)
+        self.assertEqual('token-first1', self.certificates[1].data_token)
+
+    def test_resume_reordered_input(self):
+
+        submitter = CustomerDataSubmitter(self.netki, processes=2, checkpoint_path=self.checkpoint_path)
+        submitter.submit(self.certificates[:10])
+
+        # Records are matched by their data, not their position
+        for certificate in self.certificates:
+            certificate.data_token = None
+        reordered = list(reversed(self.certificates))
+        reordered[0].customer_data['email'] = 'edited@example.com'
+
+        report = submitter.submit(reordered)
+
+        self.assertEqual(10, report.resumed)
+        self.assertEqual(10, report.submitted)
+        expected = ['token-first%d' % i for i in range(20)]
+        expected[7] = None
+        self.assertEqual(expected, [c.data_token for c in self.certificates])
+        self.assertEqual([12], [index for index, error in report.failures])
+
+    def test_ignores_positional_checkpoints(self):
+
+        with open(self.checkpoint_path, 'w') as checkpoint:
+            checkpoint.write(json.dumps({'index': 0, 'token': 'other record', 'error': None}) + '\n')
+
+        report = CustomerDataSubmitter(self.netki, processes=2, checkpoint_path=self.checkpoint_path).submit(
+            self.certificates[:2]
+        )
+
+        self.assertEqual((0, 2), (report.resumed, report.submitted))
+        self.assertEqual('token-first0', self.certificates[0].data_token)
+
+    def test_transient_errors_not_checkpointed(self):
+
+        self.server.inject_fault('/v1/certificate/token', status=503, times=2)
+        submitter = CustomerDataSubmitter(self.netki, processes=1, checkpoint_path=self.checkpoint_path)
+
+        report = submitter.submit(self.certificates[:4])
+        self.assertEqual([503, 503], [error.status_code for index, error in report.failures])
+
+        # The outage is over, the records that hit it are submitted again without retry_failed
+        report = submitter.submit(self.certificates[:4])
+
+        self.assertEqual((2, 2), (report.resumed, report.submitted))
+        self.assertEqual([], report.failures)
+        self.assertEqual(['token-first%d' % i for i in range(4)], [c.data_token for c in self.certificates[:4]])
+
+    def test_missing_customer_data(self):
+
+        self.certificates[2].customer_data = None
+
+        self.assertRaisesRegexp(
+            ValueError,
+            '^customer_data must be set on Certificate object$',
+            CustomerDataSubmitter(self.netki).submit,
+            self.certificates
+        )
@@ -0,0 +1,144 @@
+__author__ = 'frank'
+
+from datetime import datetime
+from unittest import TestCase
+
+from OpenSSL import crypto
+from mock import patch
+
+from Certificate import Certificate
+from CertificateBundle import asn1_time, load_bundles, parse_certificate
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+
+_KEY = None
+
+
+def make_pem(serial, not_after, common_name='First Last'):
+    """ Self-signed PEM certificate expiring at not_after, a naive UTC datetime. """
+
+    global _KEY
+    if _KEY is None:
+        _KEY = crypto.PKey()
+        _KEY.generate_key(crypto.TYPE_RSA, 1024)
+
+    x509 = crypto.X509()
+    x509.set_serial_number(serial)
+    x509.get_subject().CN = common_name
+    x509.set_issuer(x509.get_subject())
+    x509.set_notBefore(b'20200101000000Z')
+    x509.set_notAfter(not_after.strftime('%Y%m%d%H%M%SZ').encode('ascii'))
+    x509.set_pubkey(_KEY)
+    x509.sign(_KEY, 'sha256')
+
+    return crypto.dump_certificate(crypto.FILETYPE_PEM, x509)
+
+
+class TestParseCertificate(TestCase):
+
+    def test_go_right(self):
+
+        parsed = parse_certificate(make_pem(42, datetime(2030, 1, 3, 4, 5, 6)))
+
+        self.assertEqual(datetime(2030, 1, 3, 4, 5, 6), parsed.not_after)
+        self.assertEqual(42, parsed.serial)
+        self.assertEqual({b'CN': b'First Last'}, parsed.subject)
+        self.assertEqual(42, parsed.x509.get_serial_number())
+
+    def test_asn1_time(self):
+
+        self.assertEqual(datetime(2030, 1, 3), asn1_time(b'20300103000000Z'))
+        self.assertEqual(datetime(2030, 1, 3), asn1_time(u'20300103000000Z'))
+
+
+class TestCertificateAccessors(TestCase):
+    def setUp(self):
+        self.cert = Certificate()
+
+    def test_not_issued(self):
+
+        self.assertIsNone(self.cert.certificate_x509)
+        self.assertIsNone(self.cert.not_after)
+        self.assertIsNone(self.cert.serial)
+        self.assertIsNone(self.cert.subject)
+
+    def test_parsed_once(self):
+
+        self.cert.bundle['certificate'] = make_pem(7, datetime(2030, 1, 3))
+
+        with patch('Certificate.parse_certificate', wraps=parse_certificate) as mockParse:
+            self.assertEqual(datetime(2030, 1, 3), self.cert.not_after)
+            self.assertEqual(7, self.cert.serial)
+            self.assertEqual({b'CN': b'First Last'}, self.cert.subject)
+            self.assertEqual(7, self.cert.certificate_x509.get_serial_number())
+
+            self.assertEqual(1, mockParse.call_count)
+
+            # A renewed certificate is parsed again
+            self.cert.bundle['certificate'] = make_pem(8, datetime(2031, 1, 3))
+
+            self.assertEqual(8, self.cert.serial)
+            self.assertEqual(2, mockParse.call_count)
+
+
+class TestLoadBundles(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.pems = {
+            'c1': make_pem(1, datetime(2031, 1, 1)),
+            'c2': make_pem(2, datetime(2029, 1, 1)),
+            'c3': None
+        }
+        self.server.route('GET', '/v1/certificate/(\\w+)', self.certificate)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def certificate(self, request, certificate_id):
+
+        if not self.pems[certificate_id]:
+            return 200, {'success': True, 'order_status': 'Pending', 'order_error': None}
+
+        return 200, {'success': True, 'order_status': 'Order Finalized', 'order_error': None, 'certificate_bundle': {
+            'root': 'rootpem', 'intermediate': [], 'certificate': self.pems[certificate_id]
+        }}
+
+    def test_get_certificates(self):
+
+        certificates = self.netki.get_certificates(['c1', 'c2', 'c3'], concurrency=3)
+
+        self.assertEqual(['c1', 'c2', 'c3'], [c.id for c in certificates])
+        self.assertEqual(['Order Finalized', 'Order Finalized', 'Pending'], [c.order_status for c in certificates])
+        self.assertEqual([1, 2, None], [c.serial for c in certificates])
+        self.assertEqual(3, len(self.server.requests))
+
+    def test_load_bundles_sorted_by_expiry(self):
+
+        loaded = Certificate()
+        loaded.id = 'c1'
+        loaded.bundle['certificate'] = self.pems['c1']
+
+        certificates = [loaded]
+        for certificate_id in ('c2', 'c3'):
+            certificate = Certificate()
+            certificate.id = certificate_id
+            certificate.set_netki_client(self.netki)
+            certificates.append(certificate)
+
+        expiries = load_bundles(certificates)
+
+        # Only certificates without a bundle are fetched
+        self.assertEqual(
+            ['/v1/certificate/c2', '/v1/certificate/c3'], sorted(r.path for r in self.server.requests)
+        )
+        self.assertEqual(
+            [('c2', datetime(2029, 1, 1), 2), ('c1', datetime(2031, 1, 1), 1)],
+            [(e.certificate_id, e.not_after, e.serial) for e in expiries]
+        )
+        self.assertEqual({b'CN': b'First Last'}, expiries[0].subject)
+
+    def test_get_certificates_requires_ids(self):
+
+        self.assertRaisesRegexp(ValueError, '^Certificate ID Required$', self.netki.get_certificates, ['c1', None])
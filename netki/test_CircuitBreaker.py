@@ -0,0 +1,236 @@
+__author__ = 'frank'
+
+import time
+from unittest import TestCase
+
+from CircuitBreaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitBreakers, is_failure
+from Errors import (
+    CircuitOpenError, DeadlineExceededError, NetkiError, RateLimitError, RequestTimeoutError, TransportError,
+    ValidationError
+)
+from Deadline import Deadline
+from FakeNetkiServer import FakeNetkiServer, RawBody
+from Metrics import Metrics
+from NetkiClient import Netki
+
+
+class TestIsFailure(TestCase):
+
+    def test_go_right(self):
+
+        self.assertTrue(is_failure(TransportError('Connection refused')))
+        self.assertTrue(is_failure(RequestTimeoutError('Read timed out')))
+        self.assertTrue(is_failure(RateLimitError('Slow Down', 429)))
+        self.assertTrue(is_failure(NetkiError('Server Error', 503)))
+
+        self.assertFalse(is_failure({'success': True}))
+        self.assertFalse(is_failure(ValidationError('Bad request', 400)))
+        self.assertFalse(is_failure(NetkiError('Bad request')))
+        self.assertFalse(is_failure(ValueError('Bug')))
+
+        # Raised by the client itself, not by the API
+        self.assertFalse(is_failure(DeadlineExceededError('Deadline Exceeded')))
+        self.assertFalse(is_failure(CircuitOpenError('Circuit Open')))
+
+
+class TestCircuitBreaker(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.events = []
+        self.metrics.add_listener(lambda event, data: self.events.append((event, data)))
+
+        self.breaker = CircuitBreaker(
+            'walletname', failure_ratio=0.5, minimum_calls=4, window=4, reset_timeout=0.05, metrics=self.metrics
+        )
+
+    def record(self, *outcomes):
+        for failed in outcomes:
+            self.breaker.after_call(self.breaker.before_call(), failed)
+
+    def test_opens_on_failure_ratio(self):
+
+        self.record(False, True, False)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+        self.record(True)
+        self.assertEqual(OPEN, self.breaker.state)
+        self.assertEqual(
+            [('circuit_state_change', {'group': 'walletname', 'previous': CLOSED, 'state': OPEN})],
+            self.events
+        )
+
+    def test_window_slides(self):
+
+        self.record(True, False, False, False, False, False)
+        self.record(True)
+
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_fail_fast_while_open(self):
+
+        self.record(True, True, True, True)
+
+        self.assertRaisesRegexp(
+            CircuitOpenError,
+            '^Circuit Open for walletname Endpoints$',
+            self.breaker.before_call
+        )
+        self.assertEqual(1, self.metrics.get('circuit_rejections'))
+
+    def test_half_open_probe_closes(self):
+
+        self.record(True, True, True, True)
+        time.sleep(0.06)
+
+        token = self.breaker.before_call()
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+
+        # Only one probe at a time
+        self.assertRaises(CircuitOpenError, self.breaker.before_call)
+
+        self.breaker.after_call(token, False)
+        self.assertEqual(CLOSED, self.breaker.state)
+        self.assertEqual([CLOSED, OPEN, HALF_OPEN], [data['previous'] for event, data in self.events])
+
+    def test_half_open_probe_failure_reopens(self):
+
+        self.record(True, True, True, True)
+        time.sleep(0.06)
+
+        self.record(True)
+
+        self.assertEqual(OPEN, self.breaker.state)
+        self.assertRaises(CircuitOpenError, self.breaker.before_call)
+
+    def test_stale_outcomes_ignored(self):
+
+        token = self.breaker.before_call()
+        self.record(True, True, True, True)
+        time.sleep(0.06)
+        probe = self.breaker.before_call()
+
+        # A call admitted while closed completing during the probe does not close the circuit
+        self.breaker.after_call(token, False)
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+
+        self.breaker.after_call(probe, False)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_released_probe(self):
+
+        self.record(True, True, True, True)
+        time.sleep(0.06)
+
+        self.record(None)
+        self.assertEqual(HALF_OPEN, self.breaker.state)
+
+        self.record(False)
+        self.assertEqual(CLOSED, self.breaker.state)
+
+    def test_invalid_settings(self):
+
+        self.assertRaises(ValueError, CircuitBreaker, 'group', failure_ratio=0)
+        self.assertRaises(ValueError, CircuitBreaker, 'group', minimum_calls=30, window=20)
+        self.assertRaises(ValueError, CircuitBreakers, failure_ratio=2)
+
+
+class TestCircuitBreakerIntegration(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.server.route('GET', '/v1/partner/walletname', (200, {'success': True, 'wallet_name_count': 0}))
+        self.server.route('GET', '/api/domain', (200, {'success': True, 'domains': []}))
+
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+        self.netki.enable_circuit_breakers(failure_ratio=0.5, minimum_calls=4, window=4, reset_timeout=0.2)
+
+        self.events = []
+        self.netki.metrics.add_listener(lambda event, data: self.events.append((data['group'], data['state'])))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def fail_calls(self, func, count):
+        for _ in range(count):
+            self.assertRaises(NetkiError, func)
+
+    def test_open_fail_fast_and_recover(self):
+
+        self.server.inject_fault('/v1/partner/walletname', status=503)
+        self.fail_calls(self.netki.get_wallet_names, 4)
+
+        # Fail fast without reaching the server
+        self.assertRaises(CircuitOpenError, self.netki.get_wallet_names)
+        self.assertEqual(4, len(self.server.requests))
+
+        # Other endpoint groups are not affected
+        self.assertEqual([], self.netki.get_domains())
+        self.assertEqual({'walletname': OPEN, 'domain': CLOSED}, self.netki.circuit_breakers.states())
+
+        self.server.clear_faults()
+        time.sleep(0.25)
+
+        self.assertEqual([], self.netki.get_wallet_names())
+        self.assertEqual([('walletname', OPEN), ('walletname', HALF_OPEN), ('walletname', CLOSED)], self.events)
+
+    def test_dropped_connections(self):
+
+        self.server.inject_fault('/v1/partner/walletname', drop_connection=True)
+
+        for _ in range(4):
+            self.assertRaises(TransportError, self.netki.get_wallet_names)
+
+        self.assertRaises(CircuitOpenError, self.netki.get_wallet_names)
+
+    def test_gateway_error_pages(self):
+
+        page = RawBody(b'<html><body><h1>503 Service Unavailable</h1></body></html>')
+        self.server.route('GET', '/v1/partner/walletname', (503, page))
+        self.fail_calls(self.netki.get_wallet_names, 4)
+
+        self.assertRaises(CircuitOpenError, self.netki.get_wallet_names)
+        self.assertEqual([('walletname', OPEN)], self.events)
+
+    def test_expired_deadlines_do_not_open(self):
+
+        self.netki.set_rate_limit(1, burst=1)
+        self.netki.enable_circuit_breakers(minimum_calls=2, window=4)
+
+        # The first call takes the only token, the others give up waiting for the rate limiter
+        with Deadline(0.01):
+            self.netki.get_domains()
+            for _ in range(4):
+                self.assertRaises(DeadlineExceededError, self.netki.get_domains)
+
+        with Deadline(0):
+            self.assertRaises(DeadlineExceededError, self.netki.get_domains)
+
+        self.assertEqual({'domain': CLOSED}, self.netki.circuit_breakers.states())
+        self.assertEqual([], self.events)
+
+    def test_validation_errors_do_not_open(self):
+
+        self.server.inject_fault('/v1/partner/walletname', status=400)
+        self.fail_calls(self.netki.get_wallet_names, 6)
+
+        self.assertEqual(6, len(self.server.requests))
+        self.assertEqual([], self.events)
+
+    def test_failed_probe_reopens(self):
+
+        self.server.inject_fault('/v1/partner/walletname', status=500)
+        self.fail_calls(self.netki.get_wallet_names, 4)
+        time.sleep(0.25)
+
+        self.fail_calls(self.netki.get_wallet_names, 1)
+        self.assertRaises(CircuitOpenError, self.netki.get_wallet_names)
+
+        self.assertEqual(5, len(self.server.requests))
+        self.assertEqual([('walletname', OPEN), ('walletname', HALF_OPEN), ('walletname', OPEN)], self.events)
+
+    def test_disabled(self):
+
+        self.netki.enable_circuit_breakers(None)
+        self.server.inject_fault('/v1/partner/walletname', status=503)
+        self.fail_calls(self.netki.get_wallet_names, 6)
+
+        self.assertEqual(6, len(self.server.requests))
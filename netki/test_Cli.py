@@ -0,0 +1,205 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import TestCase
+
+from six import StringIO
+
+from Cli import main
+from FakeNetkiServer import FakeNetkiServer
+
+DOMAINS = ['d0.com', 'd1.com']
+
+
+class TestCli(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.server = FakeNetkiServer().start()
+        self.certificate_polls = 0
+
+        self.server.route('GET', '/api/domain', (200, {
+            'success': True,
+            'domains': [{'domain_name': name} for name in DOMAINS]
+        }))
+        self.server.route('GET', '/v1/partner/domain/([^/]+)', lambda request, name: (200, {
+            'success': True, 'status': 'ok', 'delegation_status': True, 'wallet_name_count': 1
+        }))
+        self.server.route('GET', '/v1/partner/domain/dnssec/([^/]+)', lambda request, name: (200, {
+            'success': True, 'ds_records': [], 'nameservers': [], 'next_roll': '2026-11-01'
+        }))
+        self.server.route('GET', '/v1/partner/walletname', lambda request: (200, {
+            'success': True,
+            'wallet_name_count': 1,
+            'wallet_names': [{
+                'id': 'id-' + request.query['domain_name'],
+                'domain_name': request.query['domain_name'],
+                'name': 'wallet',
+                'external_id': None,
+                'wallets': [{'currency': 'btc', 'wallet_address': '1btc'}]
+            }]
+        }))
+        self.server.route('POST', '/v1/partner/walletname', self.save)
+        self.server.route('PUT', '/v1/partner/walletname', self.save)
+        self.server.route('GET', '/v1/admin/partner', (200, {
+            'success': True, 'partners': [{'id': 'p1', 'name': 'Partner One'}]
+        }))
+        self.server.route('GET', '/v1/certificate/(\\w+)', self.certificate)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def save(self, request):
+        return 200, {'success': True, 'wallet_names': [
+            dict(wn, id=wn.get('id') or 'new-' + wn['name']) for wn in request.body['wallet_names']
+        ]}
+
+    def certificate(self, request, certificate_id):
+        self.certificate_polls += 1
+        status = 'Order Finalized' if self.certificate_polls > 2 else 'Pending'
+        return 200, {'success': True, 'order_status': status, 'order_error': None}
+
+    def run_cli(self, *argv):
+
+        stdout, stderr = StringIO(), StringIO()
+        status = main(
+            ['--api-url', self.server.url, '--api-key', 'key', '--partner-id', 'partner', '--progress-interval', '0']
+            + list(argv), stdout, stderr
+        )
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def path(self, name):
+        return os.path.join(self.tmpdir, name)
+
+    def test_wallet_name_export_import_sync(self):
+
+        status, out, err = self.run_cli('--concurrency', '2', 'wallet-name', 'export', self.path('export'))
+
+        self.assertEqual(0, status)
+        self.assertEqual('exported 2 wallet names from 2 domains (0 resumed)\n', out)
+        self.assertRegexpMatches(err, r'^summary: [\d.]+s, 3 requests \([\d.]+/s\), latency p50 \d+ms p95 \d+ms')
+
+        with open(self.path('export')) as exported:
+            records = [json.loads(line) for line in exported]
+        with open(self.path('import'), 'w') as source:
+            for record in records:
+                record.pop('id')
+                source.write(json.dumps(record) + '\n')
+            source.write('{"broken\n')
+
+        status, out, err = self.run_cli('--batch-size', '1', 'wallet-name', 'import', self.path('import'))
+
+        self.assertEqual(1, status)
+        self.assertRegexpMatches(out, r'^imported 2 wallet names, rejected 1 \(.*import\.rejects\) from 3 rows')
+        self.assertIn('3 rows', err)
+        self.assertEqual(['POST', 'POST'], [r.method for r in self.server.requests[-2:]])
+
+        del self.server.requests[:]
+        status, out, err = self.run_cli(
+            'wallet-name', 'sync', self.path('import'), '--reject-file', self.path('sync.rejects')
+        )
+
+        self.assertEqual(1, status)
+        puts = [r.body['wallet_names'] for r in self.server.requests if r.method == 'PUT']
+        self.assertEqual(['id-d0.com', 'id-d1.com'], sorted(wn['id'] for batch in puts for wn in batch))
+
+    def test_domain_refresh(self):
+
+        status, out, err = self.run_cli('domain', 'refresh')
+
+        self.assertEqual(0, status)
+        self.assertEqual(['d0.com\tok\tTrue\t2026-11-01', 'd1.com\tok\tTrue\t2026-11-01'], out.splitlines())
+
+    def test_domain_refresh_not_found(self):
+
+        self.server.route('GET', '/api/domain/(d0\\.com)', lambda request, name: (200, {
+            'success': True, 'domains': [{'domain_name': name}]
+        }))
+        self.server.route('GET', '/api/domain/missing\\.com', (200, {'success': True, 'domains': []}))
+        self.server.route('GET', '/api/domain/gone\\.com', (404, {'success': False, 'message': 'Not Found'}))
+
+        status, out, err = self.run_cli('domain', 'refresh', 'missing.com', 'd0.com', 'gone.com')
+
+        self.assertEqual(1, status)
+        self.assertEqual([
+            'missing.com\tERROR\tDomain Not Found',
+            'gone.com\tERROR\tDomain Not Found',
+            'd0.com\tok\tTrue\t2026-11-01'
+        ], out.splitlines())
+
+    def test_certificate_status_wait(self):
+
+        status, out, err = self.run_cli('certificate', 'status', 'abc123', '--wait', '--poll-interval', '0.01')
+
+        self.assertEqual(0, status)
+        self.assertEqual('abc123\tOrder Finalized\t\n', out)
+        self.assertEqual(3, self.certificate_polls)
+
+    def test_certificate_status(self):
+
+        status, out, err = self.run_cli('certificate', 'status', 'abc123')
+
+        self.assertEqual((0, 'abc123\tPending\t\n'), (status, out))
+        self.assertEqual(1, self.certificate_polls)
+
+    def test_certificate_status_wait_deadline(self):
+
+        started_at = time.time()
+        status, out, err = self.run_cli(
+            '--deadline', '0.3', 'certificate', 'status', 'abc123', '--wait', '--poll-interval', '60'
+        )
+
+        self.assertEqual((1, 'abc123\tERROR\tDeadline Exceeded\n'), (status, out))
+        self.assertLess(time.time() - started_at, 10)
+
+    def test_partner_list_and_errors(self):
+
+        status, out, err = self.run_cli('--rate-limit', '100', '--timeout', '5', 'partner', 'list')
+
+        self.assertEqual((0, 'p1\tPartner One\n'), (status, out))
+
+        self.server.inject_fault('/v1/admin/partner', status=403)
+        status, out, err = self.run_cli('partner', 'list')
+
+        self.assertEqual(1, status)
+        self.assertIn('error: ', err)
+
+    def test_invalid_credentials(self):
+
+        stdout, stderr = StringIO(), StringIO()
+        status = main(
+            ['--api-url', self.server.url, '--user-key', '00', '--partner-id', '', 'partner', 'list'], stdout, stderr
+        )
+
+        self.assertEqual((1, 'error: partner_id Required for Certificate API Access\n'), (status, stderr.getvalue()))
+
+    def test_progress_lines(self):
+
+        stdout, stderr = StringIO(), StringIO()
+        status = main([
+            '--api-url', self.server.url, '--api-key', 'key', '--partner-id', 'partner', '--progress-interval', '0.01',
+            'certificate', 'status', 'abc123', '--wait', '--poll-interval', '0.05'
+        ], stdout, stderr)
+
+        self.assertEqual(0, status)
+        self.assertIn('progress: ', stderr.getvalue())
+
+    def test_subprocess(self):
+
+        env = dict(os.environ, NETKI_API_URL=self.server.url, NETKI_API_KEY='key', NETKI_PARTNER_ID='partner')
+        process = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Cli.py'), 'partner', 'list'],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env
+        )
+        out, err = process.communicate()
+
+        self.assertEqual(0, process.returncode)
+        self.assertEqual(b'p1\tPartner One\n', out)
+        self.assertIn(b'summary: ', err)
+        self.assertEqual('partner', self.server.requests[0].headers.get('x-partner-id'))
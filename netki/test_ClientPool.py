@@ -0,0 +1,122 @@
+__author__ = 'frank'
+
+import time
+from unittest import TestCase
+
+from ClientPool import ClientPool
+from Deadline import Deadline
+from Errors import CircuitOpenError, DeadlineExceededError
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+
+
+class TestClientPool(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer(etags=True).start()
+        self.pool = ClientPool(self.server.url, max_tenants=2, response_cache_size=16)
+
+        def domains(request):
+            return 200, {'success': True, 'domains': [{'domain_name': request.headers['x-partner-id'] + '.com'}]}
+
+        self.server.route('GET', '/api/domain', domains)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+
+    def test_views_share_resources(self):
+
+        first = self.pool.client('key1', 'partner1')
+        second = self.pool.client('key2', 'partner2')
+
+        self.assertIs(first, self.pool.client('key1', 'partner1'))
+        self.assertIsInstance(first, Netki)
+        self.assertEqual(('key1', 'partner1', self.server.url), (first.api_key, first.partner_id, first.api_url))
+
+        for attribute in ['transport', 'metrics', 'response_cache', 'signed_header_cache', 'string_interner']:
+            self.assertIs(getattr(first, attribute), getattr(second, attribute))
+
+        first.get_domains()
+        second.get_domains()
+
+        # One connection pool for every partner
+        pools = self.pool.transport.adapter.poolmanager.pools
+        self.assertEqual(1, len(pools))
+        self.assertEqual(1, pools[pools.keys()[0]].num_connections)
+
+    def test_cache_namespaces(self):
+
+        first = self.pool.client('key1', 'partner1')
+        second = self.pool.client('key2', 'partner2')
+
+        self.assertEqual('partner1.com', first.get_domains()[0].name)
+        self.assertEqual('partner2.com', second.get_domains()[0].name)
+        self.assertEqual('partner1.com', first.get_domains()[0].name)
+
+        self.assertEqual('partner1', self.server.requests[2].headers['x-partner-id'])
+        self.assertIn('if-none-match', self.server.requests[2].headers)
+        self.assertEqual(1, self.pool.metrics.get('response_cache_not_modified'))
+
+    def test_idle_tenants_evicted(self):
+
+        first = self.pool.client('key1', 'partner1')
+        self.pool.client('key2', 'partner2')
+        self.pool.client('key1', 'partner1')
+        self.pool.client('key3', 'partner3')
+
+        self.assertEqual(2, len(self.pool))
+        self.assertIs(first, self.pool.client('key1', 'partner1'))
+        self.assertEqual(1, self.pool.metrics.get('client_pool_evictions'))
+
+        # Evicted views are recreated on their next use
+        self.assertEqual('partner2.com', self.pool.client('key2', 'partner2').get_domains()[0].name)
+
+    def test_from_credentials(self):
+
+        credentials = Netki.certificate_api_access('user_key', 'partner_id', self.server.url).credentials
+        view = self.pool.from_credentials(credentials)
+
+        self.assertEqual('certificate', view._auth_type)
+        self.assertIs(view, self.pool.from_credentials(credentials))
+
+    def test_shared_rate_limit(self):
+
+        pool = ClientPool(self.server.url, rate_limit=5)
+
+        # A burst of 5 calls, the 6th waits for the shared bucket whichever partner makes it
+        start = time.time()
+        for i in range(6):
+            pool.client('key%d' % (i % 3), 'partner%d' % (i % 3)).get_domains()
+
+        self.assertGreaterEqual(time.time() - start, 0.15)
+        self.assertIs(pool.client('key1', 'partner1').rate_limiter, pool.client('key2', 'partner2').rate_limiter)
+
+        # Waiting for the rate limiter respects deadlines
+        with Deadline(0.01):
+            self.assertRaises(DeadlineExceededError, pool.client('key1', 'partner1').get_domains)
+
+        pool.close()
+
+    def test_shared_circuit_breakers(self):
+
+        self.pool.enable_circuit_breakers(failure_ratio=0.5, minimum_calls=2, window=2)
+        self.server.inject_fault('/api/domain', status=503)
+
+        for i in range(2):
+            self.assertRaises(Exception, self.pool.client('key%d' % i, 'partner%d' % i).get_domains)
+
+        self.assertRaises(CircuitOpenError, self.pool.client('key3', 'partner3').get_domains)
+
+    def test_set_timeouts(self):
+
+        self.pool.set_timeouts(connect=1, read=2)
+
+        self.assertEqual((1, 2), self.pool.client('key1', 'partner1').timeout)
+
+    def test_many_tenants(self):
+
+        pool = ClientPool(self.server.url, max_tenants=5000)
+        views = [pool.client('key%d' % i, 'partner%d' % i) for i in range(5000)]
+
+        self.assertEqual(5000, len(pool))
+        self.assertEqual(1, len(set(id(view.transport) for view in views)))
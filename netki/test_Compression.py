@@ -0,0 +1,157 @@
+__author__ = 'frank'
+
+import json
+import zlib
+from mock import Mock
+from unittest import TestCase
+
+from Compression import StreamDecoder, compress_body, read_body
+from FakeNetkiServer import FakeNetkiServer
+from Metrics import Metrics
+from NetkiClient import Netki
+
+
+def _wallet_names_response(count):
+    return {
+        'success': True,
+        'wallet_name_count': count,
+        'wallet_names': [
+            {
+                'id': 'id%d' % i,
+                'domain_name': 'testdomain.com',
+                'name': 'name%d' % i,
+                'external_id': 'external_id%d' % i,
+                'wallets': [{'currency': 'btc', 'wallet_address': '1btcaddress%d' % i}]
+            } for i in range(count)
+        ]
+    }
+
+
+class TestStreamDecoder(TestCase):
+    def setUp(self):
+        self.data = json.dumps(_wallet_names_response(50)).encode('utf-8')
+
+    def decode_in_chunks(self, decoder, encoded):
+        chunks = [decoder.decode(encoded[i:i + 100]) for i in range(0, len(encoded), 100)]
+        chunks.append(decoder.flush())
+        return b''.join(chunks)
+
+    def test_identity(self):
+
+        self.assertEqual(self.data, self.decode_in_chunks(StreamDecoder(None), self.data))
+
+    def test_gzip(self):
+
+        self.assertEqual(self.data, self.decode_in_chunks(StreamDecoder('gzip'), compress_body(self.data)))
+
+    def test_deflate_zlib_wrapped(self):
+
+        self.assertEqual(self.data, self.decode_in_chunks(StreamDecoder('deflate'), zlib.compress(self.data)))
+
+    def test_deflate_raw(self):
+
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        encoded = compressor.compress(self.data) + compressor.flush()
+
+        self.assertEqual(self.data, self.decode_in_chunks(StreamDecoder('deflate'), encoded))
+
+    def test_unsupported_encoding(self):
+
+        self.assertRaisesRegexp(Exception, '^Unsupported Content-Encoding: br$', StreamDecoder, 'br')
+
+
+class TestReadBody(TestCase):
+
+    def test_go_right(self):
+
+        data = b'{"success": true}' * 100
+        encoded = compress_body(data)
+
+        response = Mock()
+        response.headers = {'Content-Encoding': 'gzip'}
+        response.raw.stream.return_value = [encoded[:10], encoded[10:]]
+        metrics = Metrics()
+
+        self.assertEqual(data, read_body(response, metrics))
+        self.assertEqual(len(encoded), metrics.get('response_wire_bytes'))
+        self.assertEqual(len(data), metrics.get('response_bytes'))
+        self.assertFalse(response.raw.stream.call_args[1]['decode_content'])
+
+
+class TestCompressionAgainstServer(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.server.route('GET', '/v1/partner/walletname', (200, _wallet_names_response(200)))
+        self.server.route('POST', '/v1/partner/walletname', lambda request: (200, {
+            'success': True,
+            'wallet_names': [dict(wn, id='new_id') for wn in request.body['wallet_names']]
+        }))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_compressed_response(self):
+
+        wallet_names = self.netki.get_wallet_names()
+
+        self.assertEqual(200, len(wallet_names))
+        self.assertEqual({'btc': '1btcaddress199'}, wallet_names[199].wallets)
+        self.assertIn('gzip', self.server.requests[0].headers['accept-encoding'])
+
+        metrics = self.netki.metrics
+        self.assertGreater(metrics.get('response_wire_bytes'), 0)
+        self.assertLess(metrics.get('response_wire_bytes'), metrics.get('response_bytes'))
+
+    def test_deflate_response(self):
+
+        self.server.response_encoding = 'deflate'
+
+        self.assertEqual(200, len(self.netki.get_wallet_names()))
+        self.assertLess(self.netki.metrics.get('response_wire_bytes'), self.netki.metrics.get('response_bytes'))
+
+    def test_uncompressed_response(self):
+
+        self.server.response_encoding = None
+
+        self.assertEqual(200, len(self.netki.get_wallet_names()))
+        self.assertEqual(self.netki.metrics.get('response_wire_bytes'), self.netki.metrics.get('response_bytes'))
+
+    def test_request_compression(self):
+
+        self.netki.set_request_compression(min_size=100)
+
+        wallet_name = self.netki.create_wallet_name('testdomain.com', 'name', 'external_id', 'btc', '1btcaddress' * 20)
+        wallet_name.save()
+
+        request = self.server.requests[0]
+        self.assertEqual('gzip', request.headers['content-encoding'])
+        self.assertEqual('new_id', wallet_name.id)
+
+        metrics = self.netki.metrics
+        self.assertEqual(len(request.raw_body), metrics.get('request_wire_bytes'))
+        self.assertLess(metrics.get('request_wire_bytes'), metrics.get('request_bytes'))
+
+    def test_request_compression_below_threshold(self):
+
+        self.netki.set_request_compression(min_size=100000)
+
+        self.netki.create_wallet_name('testdomain.com', 'name', 'external_id', 'btc', '1btcaddress').save()
+
+        self.assertNotIn('content-encoding', self.server.requests[0].headers)
+        self.assertEqual(self.netki.metrics.get('request_wire_bytes'), self.netki.metrics.get('request_bytes'))
+
+    def test_request_compression_rejected(self):
+
+        self.server.accept_compressed_requests = False
+        self.netki.set_request_compression(min_size=100)
+
+        wallet_name = self.netki.create_wallet_name('testdomain.com', 'name', 'external_id', 'btc', '1btcaddress' * 20)
+        wallet_name.save()
+
+        self.assertEqual(2, len(self.server.requests))
+        self.assertEqual('gzip', self.server.requests[0].headers['content-encoding'])
+        self.assertNotIn('content-encoding', self.server.requests[1].headers)
+        self.assertEqual('new_id', wallet_name.id)
+        self.assertIsNone(self.netki.request_compression_threshold)
@@ -0,0 +1,143 @@
+__author__ = 'frank'
+
+from datetime import datetime, timedelta, tzinfo
+from unittest import TestCase, skipUnless
+
+from Certificate import Certificate
+from CustomerData import build_customer_data_payloads
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pandas
+except ImportError:
+    pandas = None
+
+
+class FixedOffset(tzinfo):
+
+    def __init__(self, hours):
+        self.offset = timedelta(hours=hours)
+
+    def utcoffset(self, dt):
+        return self.offset
+
+    def dst(self, dt):
+        return timedelta(0)
+
+
+def customer(index):
+
+    return {
+        'partner_name': 'Partner',
+        'first_name': 'First%d' % index,
+        'last_name': 'Last%d' % index,
+        'email': 'user%d@example.com' % index,
+        'dob': datetime(1980 + index % 3, 1, 2, 3, 4),
+        'identity_expiration': datetime(2030, 1, 3)
+    }
+
+
+class TestBuildCustomerDataPayloads(TestCase):
+
+    def assertMatchesPerRecord(self, records, payloads, product_ids):
+
+        self.assertEqual(
+            [Certificate.build_customer_data_payload(record, product) for record, product in zip(records, product_ids)],
+            payloads
+        )
+
+    def test_list_of_dicts(self):
+
+        records = [customer(i) for i in range(10)]
+
+        payloads = Certificate.build_customer_data_payloads(records, 'product_id')
+
+        self.assertMatchesPerRecord(records, payloads, ['product_id'] * 10)
+        self.assertEqual('1981-01-02', payloads[1]['dob'])
+        self.assertNotIn('partner_name', payloads[0])
+        # Input records are left untouched
+        self.assertEqual('Partner', records[0]['partner_name'])
+        self.assertIsInstance(records[0]['dob'], datetime)
+
+    def test_sparse_and_mixed_columns(self):
+
+        records = [
+            {'first_name': 'First', 'dob': datetime(1980, 1, 2)},
+            {'first_name': 'Second', 'dob': '1981-02-03', 'product': 'ignored'},
+            {'last_name': 'Last', 'partner_name': 'Partner'},
+            {}
+        ]
+        product_ids = ['p1', 'p2', 'p3', 'p4']
+
+        payloads = build_customer_data_payloads(iter(records), product_ids)
+
+        self.assertMatchesPerRecord(records, payloads, product_ids)
+        self.assertEqual([{'product': 'p4'}], payloads[3:])
+
+    def test_mixed_timezones(self):
+
+        # The same instant, on a different date in each timezone
+        records = [
+            {'dob': datetime(1980, 1, 2, 23, 30, tzinfo=FixedOffset(0))},
+            {'dob': datetime(1980, 1, 3, 1, 30, tzinfo=FixedOffset(2))},
+            {'dob': datetime(1980, 1, 2, 23, 30)},
+            {'dob': datetime(1980, 1, 3)}
+        ]
+
+        payloads = build_customer_data_payloads(records, 'product_id')
+
+        self.assertMatchesPerRecord(records, payloads, ['product_id'] * 4)
+        self.assertEqual(['1980-01-02', '1980-01-03', '1980-01-02', '1980-01-03'], [p['dob'] for p in payloads])
+
+    def test_empty(self):
+
+        self.assertEqual([], build_customer_data_payloads([], 'product_id'))
+
+    def test_product_id_list_length(self):
+
+        self.assertRaisesRegexp(
+            ValueError, '^product_id List Must Have One Entry Per Record$',
+            build_customer_data_payloads, [customer(1)], ['p1', 'p2']
+        )
+
+    @skipUnless(numpy, 'numpy not installed')
+    def test_numpy_structured_array(self):
+
+        records = numpy.array([
+            ('First1', 'Partner', numpy.datetime64('1980-01-02T03:04')),
+            ('First2', 'Partner', numpy.datetime64('NaT'))
+        ], dtype=[('first_name', 'U16'), ('partner_name', 'U16'), ('dob', 'datetime64[s]')])
+
+        payloads = build_customer_data_payloads(records, 'product_id')
+
+        rows = [dict(zip(records.dtype.names, row.tolist())) for row in records]
+        self.assertMatchesPerRecord(rows, payloads, ['product_id'] * 2)
+        self.assertEqual('1980-01-02', payloads[0]['dob'])
+
+    @skipUnless(pandas, 'pandas not installed')
+    def test_pandas_dataframe(self):
+
+        records = [customer(i) for i in range(5)]
+
+        payloads = build_customer_data_payloads(pandas.DataFrame(records), 'product_id')
+
+        self.assertMatchesPerRecord(records, payloads, ['product_id'] * 5)
+
+        # Missing dates become NaT in the DataFrame and None in the payload
+        records[2]['dob'] = None
+        frame = pandas.DataFrame(records)
+        self.assertEqual('M', frame['dob'].dtype.kind)
+
+        payloads = build_customer_data_payloads(frame, 'product_id')
+
+        self.assertMatchesPerRecord(records, payloads, ['product_id'] * 5)
+        self.assertEqual(['1980-01-02', '1981-01-02', None], [p['dob'] for p in payloads[:3]])
+
+        # NaT mixed with other values in an object column
+        frame = pandas.DataFrame({'dob': pandas.Series([datetime(1980, 1, 2), pandas.NaT, 'unknown'], dtype=object)})
+
+        self.assertEqual(['1980-01-02', None, 'unknown'], [p['dob'] for p in build_customer_data_payloads(frame, 'p')])
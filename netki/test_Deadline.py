@@ -0,0 +1,133 @@
+__author__ = 'frank'
+
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from Deadline import Deadline, activate, check_deadline, effective_timeout, wait_before_retry
+from Errors import DeadlineExceededError, NetkiError, RateLimitError
+
+
+class TestDeadline(TestCase):
+
+    def test_remaining(self):
+
+        deadline = Deadline(10)
+
+        self.assertTrue(9 < deadline.remaining() <= 10)
+        self.assertFalse(deadline.expired)
+        self.assertIsNone(Deadline().remaining())
+        self.assertTrue(Deadline(0).expired)
+
+    def test_scopes(self):
+
+        self.assertEqual([], Deadline.current())
+
+        with Deadline(10) as outer:
+            with Deadline(timeout=5) as inner:
+                self.assertEqual([outer, inner], Deadline.current())
+            self.assertEqual([outer], Deadline.current())
+
+        self.assertEqual([], Deadline.current())
+
+    def test_check_deadline(self):
+
+        self.assertIsNone(check_deadline())
+
+        with Deadline(10):
+            with Deadline(5):
+                self.assertTrue(4 < check_deadline() <= 5)
+
+            with Deadline(0):
+                self.assertRaisesRegexp(DeadlineExceededError, '^Deadline Exceeded$', check_deadline)
+
+    def test_activate_in_other_thread(self):
+
+        remaining = []
+
+        with Deadline(5):
+            scopes = Deadline.current()
+
+        def worker():
+            with activate(scopes):
+                remaining.append(check_deadline())
+            remaining.append(check_deadline())
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+        self.assertTrue(0 < remaining[0] <= 5)
+        self.assertIsNone(remaining[1])
+
+
+class TestWaitBeforeRetry(TestCase):
+
+    @patch('Deadline.time.sleep')
+    def test_backoff(self, mock_sleep):
+
+        error = NetkiError('Internal Error', 500)
+        for attempts in (1, 2, 3):
+            wait_before_retry(attempts, error, 1.0)
+
+        delays = [call[0][0] for call in mock_sleep.call_args_list]
+        for delay, expected in zip(delays, (1.0, 2.0, 4.0)):
+            self.assertTrue(expected / 2 <= delay <= expected)
+
+    @patch('Deadline.time.sleep')
+    def test_retry_after(self, mock_sleep):
+
+        wait_before_retry(1, RateLimitError('Too Many Requests', 429, retry_after=7), 0.1)
+
+        mock_sleep.assert_called_once_with(7)
+
+    @patch('Deadline.time.sleep')
+    def test_past_deadline(self, mock_sleep):
+
+        error = RateLimitError('Too Many Requests', 429, retry_after=7)
+
+        with Deadline(5):
+            self.assertRaises(RateLimitError, wait_before_retry, 1, error, 0.1)
+        self.assertEqual(0, mock_sleep.call_count)
+
+
+class TestEffectiveTimeout(TestCase):
+
+    def test_client_timeout(self):
+
+        self.assertIsNone(effective_timeout(None))
+        self.assertEqual((3, 3), effective_timeout(3))
+        self.assertEqual((1, 2), effective_timeout((1, 2)))
+        self.assertEqual((None, 2), effective_timeout((None, 2)))
+
+    def test_overrides(self):
+
+        with Deadline(timeout=(4, 5)):
+            self.assertEqual((4, 5), effective_timeout((1, 2)))
+            self.assertEqual((6, 6), effective_timeout((1, 2), 6))
+
+            with Deadline(timeout=7):
+                self.assertEqual((7, 7), effective_timeout((1, 2)))
+
+    def test_capped_by_deadline(self):
+
+        with Deadline(2):
+            connect, read = effective_timeout((1, 60))
+            self.assertEqual(1, connect)
+            self.assertTrue(1 < read <= 2)
+
+            connect, read = effective_timeout(None)
+            self.assertTrue(1 < connect <= 2)
+            self.assertTrue(1 < read <= 2)
+
+    def test_deadline_exceeded(self):
+
+        with Deadline(0.01):
+            time.sleep(0.02)
+            try:
+                effective_timeout((1, 2), method='GET', uri='/uri')
+                self.fail('DeadlineExceededError not raised')
+            except DeadlineExceededError as e:
+                self.assertEqual(('GET', '/uri'), (e.method, e.uri))
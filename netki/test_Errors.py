@@ -0,0 +1,64 @@
+__author__ = 'frank'
+
+import pickle
+from unittest import TestCase
+
+from Errors import NetkiError, NotFoundError, RateLimitError, ValidationError, error_from_response
+
+
+class TestNetkiError(TestCase):
+
+    def test_str(self):
+
+        self.assertEqual('Bad request', str(NetkiError('Bad request', 400)))
+        self.assertEqual(
+            'Bad request [FAILURES: error 1, error 2]',
+            str(NetkiError('Bad request', 400, [{'message': 'error 1'}, {'message': 'error 2'}]))
+        )
+
+    def test_dict_round_trip(self):
+
+        error = ValidationError('Bad request', 400, [{'message': 'error 1', 'name': 'wallet'}], 'POST', '/uri')
+        rebuilt = NetkiError.from_dict(error.to_dict())
+
+        self.assertIs(ValidationError, type(rebuilt))
+        self.assertEqual(str(error), str(rebuilt))
+        self.assertEqual('wallet', rebuilt.failures[0].name)
+        self.assertEqual(('POST', '/uri'), (rebuilt.method, rebuilt.uri))
+
+    def test_from_dict_string(self):
+
+        error = NetkiError.from_dict('Invalid customer data')
+
+        self.assertIs(NetkiError, type(error))
+        self.assertEqual('Invalid customer data', str(error))
+
+    def test_pickle(self):
+
+        for error in [
+            NotFoundError('Not Found', 404, [{'message': 'unknown id'}], 'GET', '/uri'),
+            RateLimitError('Slow Down', 429, retry_after=5.0)
+        ]:
+            rebuilt = pickle.loads(pickle.dumps(error))
+
+            self.assertIs(type(error), type(rebuilt))
+            self.assertEqual(error.to_dict(), rebuilt.to_dict())
+
+
+class TestErrorFromResponse(TestCase):
+
+    def test_go_right(self):
+
+        error = error_from_response(404, {'message': 'Not Found'}, 'GET', '/uri')
+
+        self.assertIs(NotFoundError, type(error))
+        self.assertEqual(404, error.status_code)
+        self.assertEqual([], error.failures)
+
+    def test_retry_after(self):
+
+        self.assertEqual(2.0, error_from_response(429, {'message': 'Slow'}, headers={'Retry-After': '2'}).retry_after)
+        self.assertIsNone(
+            error_from_response(429, {'message': 'Slow'}, headers={'Retry-After': 'Wed, 21 Oct 2015'}).retry_after
+        )
+        self.assertIsNone(error_from_response(429, {'message': 'Slow'}).retry_after)
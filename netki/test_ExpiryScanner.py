@@ -0,0 +1,146 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+from mock import patch
+
+from ExpiryScanner import ExpiryIndex, ExpiryScanner, _parse_expiry
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+from test_CertificateBundle import make_pem
+
+NOW = datetime(2030, 1, 1)
+
+
+class TestExpiryScanner(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmpdir, 'index.json')
+
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        # c0 expires in 10 days, c1 in 100 days, c2 in 5 days, c3 is still pending
+        self.pems = {
+            'c0': make_pem(100, NOW + timedelta(days=10), 'Zero'),
+            'c1': make_pem(101, NOW + timedelta(days=100), 'One'),
+            'c2': make_pem(102, NOW + timedelta(days=5), 'Two'),
+            'c3': None
+        }
+        self.server.route('GET', '/v1/certificate/(\\w+)', self.certificate)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def certificate(self, request, certificate_id):
+
+        if certificate_id not in self.pems:
+            return 404, {'success': False, 'message': 'Certificate Not Found'}
+
+        if not self.pems[certificate_id]:
+            return 200, {'success': True, 'order_status': 'Pending', 'order_error': None}
+
+        return 200, {'success': True, 'order_status': 'Order Finalized', 'order_error': None, 'certificate_bundle': {
+            'root': 'rootpem', 'intermediate': [], 'certificate': self.pems[certificate_id]
+        }}
+
+    def fetched_ids(self):
+        return sorted(r.path.rsplit('/', 1)[1] for r in self.server.requests)
+
+    def test_scan_and_rescan(self):
+
+        scanner = ExpiryScanner(self.netki, self.index_path, timedelta(days=30), concurrency=4, processes=2)
+
+        report = scanner.scan(['c0', 'c1', 'c2', 'c3', 'missing'], now=NOW)
+
+        self.assertEqual((4, 0), (report.fetched, report.skipped))
+        self.assertEqual([('missing', 404)], [(i, e.status_code) for i, e in report.errors])
+        self.assertEqual(['c2', 'c0'], [e['certificate_id'] for e in report.expiring])
+        self.assertEqual(
+            (NOW + timedelta(days=5), 102, {'CN': 'Two'}, 'Order Finalized'),
+            (report.expiring[0]['not_after'], report.expiring[0]['serial'], report.expiring[0]['subject'],
+             report.expiring[0]['order_status'])
+        )
+
+        # The persisted index is sorted by expiry, pending certificates last
+        with open(self.index_path) as index_file:
+            persisted = json.load(index_file)['certificates']
+        self.assertEqual(['c2', 'c0', 'c1', 'c3'], [e['certificate_id'] for e in persisted])
+        self.assertEqual('2030-01-06T00:00:00', persisted[0]['not_after'])
+
+        # Only pending, failed and soon expiring certificates are fetched again
+        del self.server.requests[:]
+        self.pems['c3'] = make_pem(103, NOW + timedelta(days=20), 'Three')
+
+        report = scanner.scan(['c0', 'c1', 'c2', 'c3', 'missing'], now=NOW)
+
+        self.assertEqual(['c0', 'c2', 'c3', 'missing'], self.fetched_ids())
+        self.assertEqual((3, 1), (report.fetched, report.skipped))
+        self.assertEqual(['c2', 'c0', 'c3'], [e['certificate_id'] for e in report.expiring])
+
+    def test_parse_in_process(self):
+
+        report = self.netki.scan_certificate_expiry(
+            ['c0', 'c1'], self.index_path, renew_within_days=365 * 20, processes=0
+        )
+
+        self.assertEqual(['c0', 'c1'], [e['certificate_id'] for e in report.expiring])
+
+    def test_invalid_certificates(self):
+
+        self.pems['c1'] = '-----BEGIN CERTIFICATE-----\nbroken\n-----END CERTIFICATE-----\n'
+
+        for processes in (0, 2):
+            scanner = ExpiryScanner(self.netki, self.index_path, timedelta(days=30), processes=processes)
+
+            report = scanner.scan(['c0', 'c1', 'c2'], now=NOW)
+
+            self.assertEqual(['c1'], [i for i, e in report.errors])
+            self.assertRegexpMatches(str(report.errors[0][1]), '^Invalid Certificate: ')
+            self.assertEqual(['c2', 'c0'], [e['certificate_id'] for e in report.expiring])
+            self.assertNotIn('c1', ExpiryIndex(self.index_path))
+
+    def test_interrupted_scan_saves_index(self):
+
+        def interrupt(item):
+            if item[0] == 'c1':
+                raise KeyboardInterrupt()
+            return _parse_expiry(item)
+
+        scanner = ExpiryScanner(self.netki, self.index_path, timedelta(days=30), processes=0)
+        with patch('ExpiryScanner._parse_expiry', side_effect=interrupt):
+            self.assertRaises(KeyboardInterrupt, scanner.scan, ['c0', 'c1', 'c2'], now=NOW)
+
+        self.assertEqual(['c0'], [e['certificate_id'] for e in ExpiryIndex(self.index_path).entries()])
+
+    def test_max_age(self):
+
+        scanner = ExpiryScanner(self.netki, self.index_path, timedelta(days=30), processes=0, max_age=-1)
+        scanner.scan(['c1'], now=NOW)
+        del self.server.requests[:]
+
+        report = scanner.scan(['c1'], now=NOW)
+
+        self.assertEqual(['c1'], self.fetched_ids())
+        self.assertEqual(0, report.skipped)
+
+
+class TestExpiryIndex(TestCase):
+
+    def test_expiring_before(self):
+
+        index = ExpiryIndex()
+        for day in (20, 3, 9):
+            index.update({'certificate_id': 'c%d' % day, 'not_after': NOW + timedelta(days=day)})
+        index.update({'certificate_id': 'pending', 'not_after': None})
+
+        self.assertEqual(4, len(index))
+        self.assertIn('pending', index)
+        self.assertEqual(['c3', 'c9', 'c20'], [e['certificate_id'] for e in index.entries()])
+        self.assertEqual(['c3', 'c9'], [e['certificate_id'] for e in index.expiring_before(NOW + timedelta(days=20))])
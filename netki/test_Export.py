@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+__author__ = 'frank'
+
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import TestCase
+
+from Errors import NetkiError
+from Export import Exporter
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+
+DOMAINS = ['d%d.com' % i for i in range(10)]
+
+
+class TestExporter(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'export')
+        self.checkpoint_path = os.path.join(self.tmpdir, 'checkpoint')
+
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+        self.delay = 0
+
+        self.server.route('GET', '/api/domain', (200, {
+            'success': True,
+            'domains': [{'domain_name': name} for name in DOMAINS]
+        }))
+        self.server.route('GET', '/v1/partner/walletname', self.wallet_names)
+        self.server.route('GET', '/v1/partner/domain/dnssec/([^/]+)', self.dnssec)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def wallet_names(self, request):
+
+        domain_name = request.query['domain_name']
+        return 200, {
+            'success': True,
+            'wallet_name_count': 2,
+            'wallet_names': [
+                {
+                    'id': domain_name + '-1',
+                    'domain_name': domain_name,
+                    'name': u'jos\xe9',
+                    'external_id': 'ext1',
+                    'wallets': [
+                        {'currency': 'btc', 'wallet_address': '1btc'},
+                        {'currency': 'ltc', 'wallet_address': 'Lltc'}
+                    ]
+                },
+                {'id': domain_name + '-2', 'domain_name': domain_name, 'name': 'empty', 'external_id': 'ext2',
+                 'wallets': []}
+            ]
+        }
+
+    def dnssec(self, request, domain_name):
+
+        time.sleep(self.delay)
+        return 200, {
+            'success': True,
+            'public_key_signing_key': 'pksk-' + domain_name,
+            'ds_records': ['ds 1', 'ds 2'],
+            'nameservers': ['ns1', 'ns2'],
+            'next_roll': '2030-01-01'
+        }
+
+    def read_lines(self):
+        with open(self.path) as output:
+            return [json.loads(line) for line in output]
+
+    def test_wallet_names_ndjson(self):
+
+        report = self.netki.export_wallet_names(self.path)
+
+        self.assertEqual((20, 10, []), (report.records, report.domains, report.errors))
+
+        records = self.read_lines()
+        self.assertEqual(DOMAINS, [r['domain_name'] for r in records[::2]])
+        self.assertDictEqual({
+            'id': 'd0.com-1',
+            'domain_name': 'd0.com',
+            'name': u'jos\xe9',
+            'external_id': 'ext1',
+            'wallets': [
+                {'currency': 'btc', 'wallet_address': '1btc'},
+                {'currency': 'ltc', 'wallet_address': 'Lltc'}
+            ]
+        }, records[0])
+
+    def test_wallet_names_csv(self):
+
+        Exporter(self.netki, self.path, 'csv').export_wallet_names(['d0.com'])
+
+        with open(self.path, 'rb') as output:
+            rows = list(csv.reader(output))
+
+        self.assertEqual([
+            ['id', 'domain_name', 'name', 'external_id', 'currency', 'wallet_address'],
+            ['d0.com-1', 'd0.com', 'jos\xc3\xa9', 'ext1', 'btc', '1btc'],
+            ['d0.com-1', 'd0.com', 'jos\xc3\xa9', 'ext1', 'ltc', 'Lltc'],
+            ['d0.com-2', 'd0.com', 'empty', 'ext2', '', '']
+        ], rows)
+
+    def test_domains_concurrent(self):
+
+        self.delay = 0.1
+
+        start = time.time()
+        report = Exporter(self.netki, self.path, concurrency=5).export_domains()
+
+        self.assertLess(time.time() - start, 0.6)
+        self.assertEqual(10, report.domains)
+        self.assertEqual(DOMAINS, [r['domain_name'] for r in self.read_lines()])
+        self.assertEqual(['ds 1', 'ds 2'], self.read_lines()[0]['ds_records'])
+
+    def test_domains_csv(self):
+
+        Exporter(self.netki, self.path, 'csv').export_domains(['d1.com'])
+
+        with open(self.path, 'rb') as output:
+            rows = list(csv.reader(output))
+
+        self.assertEqual(
+            ['d1.com', 'pksk-d1.com', '["ds 1", "ds 2"]', '["ns1", "ns2"]', '2030-01-01'],
+            rows[1]
+        )
+
+    def test_resume_from_checkpoint(self):
+
+        self.server.inject_fault('/v1/partner/domain/dnssec/d3.com', status=503)
+        exporter = Exporter(self.netki, self.path, checkpoint_path=self.checkpoint_path, concurrency=3)
+
+        report = exporter.export_domains()
+
+        self.assertEqual(9, report.domains)
+        self.assertEqual('d3.com', report.errors[0][0])
+        self.assertIsInstance(report.errors[0][1], NetkiError)
+
+        # Simulate a crash while writing the next domain
+        with open(self.path, 'ab') as output:
+            output.write('{"domain_name": "partial')
+
+        self.server.clear_faults()
+        requests_before = len(self.server.requests)
+        report = exporter.export_domains()
+
+        self.assertEqual((1, 9), (report.domains, report.resumed_domains))
+        self.assertEqual(2, len(self.server.requests) - requests_before)
+        self.assertEqual(sorted(DOMAINS), sorted(r['domain_name'] for r in self.read_lines()))
+
+    def test_missing_output(self):
+
+        exporter = Exporter(self.netki, self.path, checkpoint_path=self.checkpoint_path)
+        exporter.export_domains(['d0.com'])
+        os.remove(self.path)
+
+        self.assertRaisesRegexp(ValueError, '^Export Output Missing For Checkpoint', exporter.export_domains)
+
+    def test_invalid_format(self):
+
+        self.assertRaisesRegexp(ValueError, '^Unsupported Export Format: xml$', Exporter, self.netki, self.path, 'xml')
@@ -0,0 +1,303 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from FakeNetkiServer import FakeNetkiServer
+from Import import Importer, read_domain_names, validate_wallet_name
+from NetkiClient import Netki
+
+
+def wallet_name(index, **overrides):
+
+    record = {
+        'domain_name': 'd%d.com' % (index % 3),
+        'name': 'name%d' % index,
+        'external_id': 'ext%d' % index,
+        'wallets': [{'currency': 'btc', 'wallet_address': '1btc%d' % index}]
+    }
+    record.update(overrides)
+    return record
+
+
+class TestValidateWalletName(TestCase):
+
+    def test_go_right(self):
+
+        self.assertIsNone(validate_wallet_name(wallet_name(1)))
+        self.assertIsNone(validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': 'oap', 'wallet_address': 'https://example.com/pay?x=1'}
+        ])))
+
+    def test_invalid(self):
+
+        self.assertEqual('domain_name Required', validate_wallet_name(wallet_name(1, domain_name='')))
+        self.assertEqual('name Required', validate_wallet_name(wallet_name(1, name=None)))
+        self.assertEqual('At Least One Wallet Required', validate_wallet_name(wallet_name(1, wallets=[])))
+        self.assertEqual('Invalid Currency: bitcoin', validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': 'bitcoin', 'wallet_address': '1btc'}
+        ])))
+        self.assertEqual('Invalid Wallet Address for btc', validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': 'btc', 'wallet_address': '1 btc'}
+        ])))
+
+    def test_not_a_record(self):
+
+        for record in ([1, 2], 'x', 1, None):
+            self.assertEqual('Invalid Wallet Name Record', validate_wallet_name(record))
+        self.assertEqual('Invalid Wallets', validate_wallet_name(wallet_name(1, wallets='1btc')))
+        self.assertEqual('Invalid Wallets', validate_wallet_name(wallet_name(1, wallets=['1btc'])))
+
+    def test_wrong_types(self):
+
+        self.assertEqual('Invalid domain_name', validate_wallet_name(wallet_name(1, domain_name={'a': 1})))
+        self.assertEqual('Invalid name', validate_wallet_name(wallet_name(1, name=['name'])))
+        self.assertEqual('Invalid name', validate_wallet_name(wallet_name(1, name=12345)))
+        self.assertEqual('Invalid Currency: 12', validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': 12, 'wallet_address': '1btc'}
+        ])))
+        self.assertEqual("Invalid Currency: ['btc']", validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': ['btc'], 'wallet_address': '1btc'}
+        ])))
+        self.assertEqual('Invalid Wallet Address for btc', validate_wallet_name(wallet_name(1, wallets=[
+            {'currency': 'btc', 'wallet_address': 12345}
+        ])))
+
+
+class TestImporter(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmpdir, 'import')
+        self.reject_path = os.path.join(self.tmpdir, 'rejects')
+
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        self.server.route('POST', '/v1/partner/walletname', self.save)
+        self.server.route('PUT', '/v1/partner/walletname', self.save)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def save(self, request):
+
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        time.sleep(0.05)
+
+        with self.lock:
+            self.in_flight -= 1
+
+        if any(wn['name'] == 'bad' for wn in request.body['wallet_names']):
+            return 400, {'success': False, 'message': 'Invalid Wallet Names', 'failures': [{'message': 'bad name'}]}
+
+        return 200, {'success': True, 'wallet_names': [
+            dict(wn, id=wn.get('id') or 'id-' + wn['name']) for wn in request.body['wallet_names']
+        ]}
+
+    def write_ndjson(self, records):
+        with open(self.path, 'w') as source:
+            for record in records:
+                source.write(json.dumps(record) + '\n')
+
+    def read_rejects(self):
+        with open(self.reject_path) as rejects:
+            return [json.loads(line) for line in rejects]
+
+    def test_ndjson_batches_in_flight(self):
+
+        self.write_ndjson([wallet_name(i) for i in range(40)])
+        progress = []
+
+        report = self.netki.import_wallet_names(
+            self.path, self.reject_path, batch_size=5, concurrency=4, progress=lambda r: progress.append(r.batches)
+        )
+
+        self.assertEqual((40, 40, 0, 8), (report.rows, report.imported, report.rejected, report.batches))
+        self.assertEqual(8, len(self.server.requests))
+        self.assertEqual([5] * 8, [len(r.body['wallet_names']) for r in self.server.requests])
+        self.assertGreater(self.max_in_flight, 1)
+        self.assertLessEqual(self.max_in_flight, 4)
+        self.assertEqual(list(range(1, 9)), sorted(progress))
+        self.assertGreater(report.rows_per_second, 0)
+        self.assertEqual(40, self.netki.metrics.get('import_wallet_names'))
+
+        self.assertDictEqual({
+            'domain_name': 'd0.com',
+            'name': 'name0',
+            'external_id': 'ext0',
+            'wallets': [{'currency': 'btc', 'wallet_address': '1btc0'}]
+        }, [wn for r in self.server.requests for wn in r.body['wallet_names'] if wn['name'] == 'name0'][0])
+
+    def test_updates_use_put(self):
+
+        self.write_ndjson([wallet_name(1), wallet_name(2, id='existing')])
+
+        Importer(self.netki, self.reject_path).run(self.path)
+
+        methods = dict((r.method, r.body['wallet_names']) for r in self.server.requests)
+        self.assertEqual(['name1'], [wn['name'] for wn in methods['POST']])
+        self.assertEqual([('existing', 'name2')], [(wn['id'], wn['name']) for wn in methods['PUT']])
+
+    def test_rejects(self):
+
+        self.write_ndjson([wallet_name(0), wallet_name(1, wallets=[{'currency': 'x', 'wallet_address': 'a'}])])
+        with open(self.path, 'a') as source:
+            source.write('{"broken\n')
+            source.write(json.dumps(wallet_name(3, name='bad')) + '\n')
+
+        report = Importer(self.netki, self.reject_path, batch_size=1).run(self.path)
+
+        self.assertEqual((4, 1, 3), (report.rows, report.imported, report.rejected))
+
+        rejects = sorted(self.read_rejects(), key=lambda r: r['line'])
+        self.assertEqual([2, 3, 4], [r['line'] for r in rejects])
+        self.assertEqual('Invalid Currency: x', rejects[0]['error'])
+        self.assertEqual('Invalid JSON', rejects[1]['error'])
+        self.assertEqual('Invalid Wallet Names [FAILURES: bad name]', rejects[2]['error'])
+
+        # A corrected reject file can be imported again
+        report = Importer(self.netki, os.path.join(self.tmpdir, 'rejects2'), batch_size=1).run(self.reject_path)
+        self.assertEqual(3, report.rejected)
+
+    def test_non_object_lines(self):
+
+        self.write_ndjson([wallet_name(0), [1, 2], 'x'])
+
+        report = Importer(self.netki, self.reject_path).run(self.path)
+
+        self.assertEqual((3, 1, 2), (report.rows, report.imported, report.rejected))
+        self.assertEqual([
+            {'raw': [1, 2], 'line': 2, 'error': 'Invalid Wallet Name Record'},
+            {'raw': 'x', 'line': 3, 'error': 'Invalid Wallet Name Record'}
+        ], self.read_rejects())
+
+    def test_wrongly_typed_fields(self):
+
+        self.write_ndjson([
+            wallet_name(0),
+            wallet_name(1, wallets=[{'currency': 'btc', 'wallet_address': 12345}]),
+            wallet_name(2, name={'first': 'name2'}),
+            wallet_name(3)
+        ])
+
+        report = Importer(self.netki, self.reject_path).run(self.path)
+
+        self.assertEqual((4, 2, 2), (report.rows, report.imported, report.rejected))
+        self.assertEqual(
+            [(2, 'Invalid Wallet Address for btc'), (3, 'Invalid name')],
+            [(r['line'], r['error']) for r in self.read_rejects()]
+        )
+
+    def test_retries_transient_errors(self):
+
+        self.server.inject_fault('/v1/partner/walletname', drop_connection=True, times=1)
+        self.server.inject_fault('/v1/partner/walletname', status=429, times=1)
+        self.server.inject_fault('/v1/partner/walletname', status=503, times=1)
+        self.write_ndjson([wallet_name(i) for i in range(3)])
+
+        report = Importer(self.netki, self.reject_path, backoff=0).run(self.path)
+
+        self.assertEqual((3, 3, 0, 1), (report.rows, report.imported, report.rejected, report.batches))
+        self.assertEqual(4, len(self.server.requests))
+
+    def test_retries_exhausted(self):
+
+        self.server.inject_fault('/v1/partner/walletname', status=503)
+        self.write_ndjson([wallet_name(i) for i in range(3)])
+
+        report = Importer(self.netki, self.reject_path, max_attempts=2, backoff=0).run(self.path)
+
+        self.assertEqual((0, 3), (report.imported, report.rejected))
+        self.assertEqual([1, 2, 3], [r['line'] for r in self.read_rejects()])
+
+    def test_rejects_listed_failures(self):
+
+        def save(request):
+            bad = [wn for wn in request.body['wallet_names'] if wn['name'].startswith('bad')]
+            if bad:
+                return 400, {'success': False, 'message': 'Invalid Wallet Names', 'failures': [
+                    {'message': 'name is reserved', 'domain_name': wn['domain_name'], 'name': wn['name']}
+                    for wn in bad
+                ]}
+            return self.save(request)
+
+        self.server.route('POST', '/v1/partner/walletname', save)
+        self.write_ndjson([wallet_name(0), wallet_name(1, name='bad1'), wallet_name(2), wallet_name(3, name='bad3')])
+
+        report = Importer(self.netki, self.reject_path).run(self.path)
+
+        self.assertEqual((4, 2, 2, 1), (report.rows, report.imported, report.rejected, report.batches))
+        self.assertEqual(
+            [['name0', 'bad1', 'name2', 'bad3'], ['name0', 'name2']],
+            [[wn['name'] for wn in r.body['wallet_names']] for r in self.server.requests]
+        )
+        self.assertEqual(
+            [(2, 'Invalid Wallet Names [FAILURES: name is reserved]'),
+             (4, 'Invalid Wallet Names [FAILURES: name is reserved]')],
+            [(r['line'], r['error']) for r in self.read_rejects()]
+        )
+
+    def test_csv(self):
+
+        with open(self.path, 'w') as source:
+            source.write('id,domain_name,name,external_id,currency,wallet_address\n')
+            source.write(',d0.com,name0,ext0,btc,1btc\n')
+            source.write(',d0.com,name0,ext0,ltc,Lltc\n')
+            source.write('id1,d0.com,name1,,btc,1btc1\n')
+
+        report = Importer(self.netki, self.reject_path, format='csv').run(self.path)
+
+        self.assertEqual((3, 2, 0), (report.rows, report.imported, report.rejected))
+
+        bodies = dict((r.method, r.body['wallet_names']) for r in self.server.requests)
+        self.assertEqual(
+            [{'currency': 'btc', 'wallet_address': '1btc'}, {'currency': 'ltc', 'wallet_address': 'Lltc'}],
+            bodies['POST'][0]['wallets']
+        )
+        self.assertEqual('id1', bodies['PUT'][0]['id'])
+        self.assertIsNone(bodies['PUT'][0]['external_id'])
+
+    def test_sync_updates_existing(self):
+
+        self.server.route('GET', '/v1/partner/walletname', lambda request: (200, {
+            'success': True,
+            'wallet_name_count': 1,
+            'wallet_names': [{
+                'id': 'existing', 'domain_name': request.query['domain_name'], 'name': 'name0', 'external_id': None,
+                'wallets': []
+            }]
+        }))
+        self.write_ndjson([wallet_name(0), wallet_name(1)])
+
+        self.assertEqual(set(['d0.com', 'd1.com']), read_domain_names(self.path))
+
+        report = self.netki.sync_wallet_names(self.path, self.reject_path)
+
+        self.assertEqual((2, 2, 0), (report.rows, report.imported, report.rejected))
+        writes = dict((r.method, r.body['wallet_names']) for r in self.server.requests if r.method != 'GET')
+        self.assertEqual([('existing', 'name0')], [(wn['id'], wn['name']) for wn in writes['PUT']])
+        self.assertEqual(['name1'], [wn['name'] for wn in writes['POST']])
+        self.assertEqual(
+            ['d0.com', 'd1.com'],
+            sorted(r.query['domain_name'] for r in self.server.requests if r.method == 'GET')
+        )
+
+    def test_invalid_format(self):
+
+        self.assertRaisesRegexp(ValueError, '^Unsupported Import Format: xml$', Importer, self.netki, 'x', 'xml')
+        self.assertRaisesRegexp(
+            ValueError, '^max_attempts must be at least 1$', Importer, self.netki, 'x', max_attempts=0
+        )
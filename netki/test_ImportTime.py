@@ -0,0 +1,45 @@
+__author__ = 'frank'
+
+import os
+import subprocess
+import sys
+from unittest import TestCase
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Dependencies that dominate the cold import time of the client and are loaded lazily, on first use
+HEAVY_MODULES = ('OpenSSL', 'cryptography', 'ecdsa', 'requests')
+
+_LOADED_MODULES = '''
+import sys
+import %s
+print(','.join(sorted(m for m in sys.modules if m.split('.')[0] in %r)))
+'''
+
+
+def loaded_heavy_modules(module):
+    """
+    Import module in a fresh interpreter.
+
+    :return: List of heavy modules loaded by the import.
+    """
+
+    process = subprocess.Popen(
+        [sys.executable, '-c', _LOADED_MODULES % (module, HEAVY_MODULES)],
+        cwd=PACKAGE_DIR, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    stdout, stderr = process.communicate()
+
+    if process.returncode:
+        raise AssertionError('import %s failed: %s' % (module, stderr))
+    return [m for m in stdout.strip().split(',') if m]
+
+
+class TestImportTime(TestCase):
+
+    def test_heavy_dependencies_not_loaded(self):
+
+        for module in ('NetkiClient', 'WalletName', 'Certificate', 'Requestor'):
+            loaded = loaded_heavy_modules(module)
+
+            self.assertEqual([], loaded, '%s loaded %s at import time' % (module, ', '.join(loaded)))
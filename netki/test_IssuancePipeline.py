@@ -0,0 +1,276 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+from OpenSSL import crypto
+
+from Certificate import Certificate
+from FakeNetkiServer import FakeNetkiServer
+from IssuancePipeline import IssuanceOrder, IssuancePipeline, STAGES
+from NetkiClient import Netki
+
+_PKEY = crypto.PKey()
+_PKEY.generate_key(crypto.TYPE_RSA, 1024)
+
+
+def make_order(index, pkey=_PKEY):
+
+    certificate = Certificate({
+        'first_name': 'First%d' % index,
+        'last_name': 'Last',
+        'email': 'user%d@example.com' % index,
+        'street_address': '1 Main St',
+        'city': 'Los Angeles',
+        'state': 'CA',
+        'postal_code': '90001',
+        'country': 'US',
+        'partner_name': 'Partner'
+    }, 'product_id')
+
+    return IssuanceOrder('order%d' % index, certificate, pkey)
+
+
+class TestIssuancePipeline(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.state_path = os.path.join(self.tmpdir, 'state')
+
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.lock = threading.Lock()
+        self.polls = {}
+        self.csr_delay = 0
+        self.ordered = 0
+        self.csrs = 0
+        self.max_waiting_for_csr = 0
+
+        self.server.route('POST', '/v1/certificate/token', self.token)
+        self.server.route('POST', '/v1/certificate', self.order)
+        self.server.route('POST', '/v1/certificate/(\\w+)/csr', self.csr)
+        self.server.route('GET', '/v1/certificate/(\\w+)', self.status)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def token(self, request):
+
+        if request.body['first_name'] == 'Rejected':
+            return 400, {'success': False, 'message': 'Invalid Customer Data'}
+        return 200, {'success': True, 'token': 'token-' + request.body['email']}
+
+    def order(self, request):
+
+        with self.lock:
+            self.ordered += 1
+            self.max_waiting_for_csr = max(self.max_waiting_for_csr, self.ordered - self.csrs)
+        return 200, {'success': True, 'order_id': request.body['email'].split('@')[0]}
+
+    def csr(self, request, certificate_id):
+
+        time.sleep(self.csr_delay)
+        with self.lock:
+            self.csrs += 1
+        return 200, {'success': True}
+
+    def status(self, request, certificate_id):
+
+        with self.lock:
+            self.polls[certificate_id] = self.polls.get(certificate_id, 0) + 1
+            polls = self.polls[certificate_id]
+
+        if certificate_id == 'user13':
+            return 200, {'success': True, 'order_status': 'Failed', 'order_error': 'Identity Rejected'}
+        status = 'Order Finalized' if polls > 1 else 'Pending'
+        return 200, {'success': True, 'order_status': status, 'order_error': None}
+
+    def paths(self, method, prefix):
+        return [r for r in self.server.requests if r.method == method and r.path.startswith(prefix)]
+
+    def test_go_right(self):
+
+        orders = [make_order(i) for i in range(12)]
+
+        report = self.netki.issue_certificates(orders, concurrency=3, queue_size=2, poll_interval=0.01)
+
+        self.assertEqual(12, len(report.issued))
+        self.assertEqual([], report.failed)
+        self.assertTrue(all(order.issued for order in orders))
+        self.assertEqual('token-user0@example.com', orders[0].certificate.data_token)
+        self.assertEqual('user0', orders[0].certificate.id)
+        self.assertEqual('Order Finalized', orders[0].certificate.order_status)
+        self.assertEqual(24, len(self.paths('GET', '/v1/certificate/user')))
+
+        for stage in STAGES:
+            self.assertEqual(12, report.stages[stage]['completed'])
+            self.assertEqual(0, report.stages[stage]['errors'])
+            self.assertGreater(report.stages[stage]['throughput'], 0)
+        self.assertEqual(24, report.stages['status']['latency']['count'])
+        self.assertEqual(12, self.netki.metrics.get('pipeline_csr'))
+
+    def test_backpressure(self):
+
+        self.csr_delay = 0.02
+
+        report = IssuancePipeline(
+            self.netki, {'csr': 1}, queue_size=1, poll_interval=0
+        ).run([make_order(i) for i in range(12)])
+
+        self.assertEqual(12, len(report.issued))
+        # One CSR running, one order queued for it and at most four order workers blocked handing over
+        self.assertLessEqual(self.max_waiting_for_csr, 6)
+
+    def test_polls_do_not_hold_workers(self):
+
+        # Orders reach the status stage 0.1s apart, each poll is followed by a 0.5s wait
+        self.csr_delay = 0.1
+
+        report = IssuancePipeline(self.netki, {'csr': 1, 'status': 1}, poll_interval=0.5).run(
+            [make_order(i) for i in range(2)]
+        )
+
+        self.assertEqual(2, len(report.issued))
+        # The second order is polled while the first one waits, not after
+        polled = [r.path.rsplit('/', 1)[1] for r in self.paths('GET', '/v1/certificate/user')]
+        self.assertEqual(4, len(polled))
+        self.assertEqual(['user0', 'user1'], sorted(polled[:2]))
+
+    def test_failures(self):
+
+        orders = [make_order(i) for i in range(3)] + [make_order(13), make_order(20, pkey=None)]
+        orders[1].certificate.customer_data['first_name'] = 'Rejected'
+
+        report = IssuancePipeline(self.netki, poll_interval=0).run(orders)
+
+        self.assertEqual(['order0', 'order2'], sorted(order.key for order in report.issued))
+        failed = dict((order.key, order) for order in report.failed)
+        self.assertEqual(['order1', 'order13', 'order20'], sorted(failed))
+
+        self.assertEqual('customer_data', failed['order1'].stage)
+        self.assertEqual(400, failed['order1'].error.status_code)
+        self.assertEqual(('status', 'Identity Rejected'), (failed['order13'].stage, str(failed['order13'].error)))
+        self.assertEqual(
+            ('csr', 'Private Key Required For CSR Submission'), (failed['order20'].stage, str(failed['order20'].error))
+        )
+        self.assertEqual(1, report.stages['customer_data']['errors'])
+
+    def test_resume(self):
+
+        self.server.inject_fault('/v1/certificate/\\w+/csr', status=503)
+        pipeline = IssuancePipeline(self.netki, state_path=self.state_path, poll_interval=0)
+
+        report = pipeline.run([make_order(i) for i in range(4)])
+
+        self.assertEqual(4, len(report.failed))
+        self.assertEqual(['csr'] * 4, [order.stage for order in report.failed])
+
+        # Rerun with fresh objects, as after a crash; completed stages are not repeated
+        self.server.clear_faults()
+        del self.server.requests[:]
+        orders = [make_order(i) for i in range(4)]
+
+        report = pipeline.run(orders)
+
+        self.assertEqual(4, len(report.issued))
+        self.assertEqual(4, report.resumed)
+        self.assertEqual([], self.paths('POST', '/v1/certificate/token'))
+        self.assertEqual(4, len(self.paths('POST', '/v1/certificate/user')))
+        self.assertEqual('user3', orders[3].certificate.id)
+
+        # Issued orders are skipped entirely
+        del self.server.requests[:]
+        report = pipeline.run([make_order(i) for i in range(4)])
+
+        self.assertEqual((4, 4), (len(report.issued), report.resumed))
+        self.assertEqual([], self.server.requests)
+
+    def test_interrupted_submissions(self):
+
+        # No response to the order submissions, which may or may not have been accepted
+        self.server.inject_fault('/v1/certificate', drop_connection=True)
+        pipeline = IssuancePipeline(self.netki, state_path=self.state_path, poll_interval=0)
+
+        report = pipeline.run([make_order(i) for i in range(2)])
+
+        self.assertEqual(['order', 'order'], [order.stage for order in report.failed])
+        with open(self.state_path) as state:
+            entries = [json.loads(line) for line in state]
+        self.assertEqual(['order', 'order'], [e['in_flight'] for e in entries if e['stage'] == 'order'][-2:])
+
+        # Interrupted orders are not submitted again, as they may already have been placed and charged
+        self.server.clear_faults()
+        del self.server.requests[:]
+
+        report = pipeline.run([make_order(i) for i in range(2)])
+
+        self.assertEqual((0, 2, 2), (len(report.issued), len(report.failed), report.resumed))
+        self.assertEqual(
+            'Interrupted During order Submission - Verify Order Before Retrying', str(report.failed[0].error)
+        )
+        self.assertEqual([], self.server.requests)
+
+        # Once checked, they are submitted again on request
+        report = IssuancePipeline(
+            self.netki, state_path=self.state_path, poll_interval=0, retry_interrupted=True
+        ).run([make_order(i) for i in range(2)])
+
+        self.assertEqual(2, len(report.issued))
+        self.assertEqual(2, len([r for r in self.server.requests if r.method == 'POST' and r.path == '/v1/certificate']))
+
+    def run_in_thread(self, pipeline, orders):
+
+        reports = []
+        thread = threading.Thread(target=lambda: reports.append(pipeline.run(orders)))
+        thread.daemon = True
+        thread.start()
+        thread.join(10)
+
+        self.assertFalse(thread.is_alive(), 'IssuancePipeline.run() did not return')
+        return reports[0]
+
+    def test_state_write_errors(self):
+
+        pipeline = IssuancePipeline(self.netki, state_path=self.state_path, poll_interval=0)
+
+        with patch('IssuancePipeline.write_entry', side_effect=IOError('No space left on device')):
+            report = self.run_in_thread(pipeline, [make_order(i) for i in range(3)])
+
+        self.assertEqual(3, len(report.failed))
+        self.assertEqual(
+            [('customer_data', None, 'No space left on device')] * 3,
+            [(order.stage, order.in_flight, str(order.error)) for order in report.failed]
+        )
+        # Nothing is submitted without its in flight marker saved
+        self.assertEqual([], self.server.requests)
+
+        def fail_after_customer_data(state, entry):
+            if entry['stage'] == 'order' and not entry['in_flight']:
+                raise IOError('No space left on device')
+
+        with patch('IssuancePipeline.write_entry', side_effect=fail_after_customer_data):
+            report = self.run_in_thread(pipeline, [make_order(i) for i in range(3)])
+
+        self.assertEqual(['order'] * 3, [order.stage for order in report.failed])
+        self.assertEqual(3, len(self.paths('POST', '/v1/certificate/token')))
+        self.assertEqual(3, report.stages['customer_data']['errors'])
+
+    def test_interrupted_customer_data_resubmitted(self):
+
+        with open(self.state_path, 'w') as state:
+            state.write(json.dumps({
+                'key': 'order0', 'stage': 'customer_data', 'in_flight': 'customer_data', 'data_token': None,
+                'certificate_id': None, 'order_status': None, 'error': None
+            }) + '\n')
+
+        report = IssuancePipeline(self.netki, state_path=self.state_path, poll_interval=0).run([make_order(0)])
+
+        self.assertEqual((1, 1), (len(report.issued), report.resumed))
+        self.assertEqual(1, len(self.paths('POST', '/v1/certificate/token')))
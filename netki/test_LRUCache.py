@@ -0,0 +1,119 @@
+__author__ = 'frank'
+
+import threading
+from mock import patch
+from unittest import TestCase
+
+from LRUCache import LRUCache
+from Metrics import Metrics
+
+
+class TestLRUCache(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.cache = LRUCache(2, self.metrics, 'test_cache')
+
+    def test_get_put(self):
+
+        self.cache.put('a', 1)
+
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual('default', self.cache.get('b', 'default'))
+        self.assertIn('a', self.cache)
+        self.assertEqual(1, len(self.cache))
+
+    def test_evicts_least_recently_used(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+
+        self.assertNotIn('b', self.cache)
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertEqual(3, self.cache.get('c'))
+
+    def test_put_existing_key_does_not_evict(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.put('a', 10)
+
+        self.assertEqual(10, self.cache.get('a'))
+        self.assertEqual(2, self.cache.get('b'))
+        self.assertEqual(0, self.cache.evictions)
+
+    def test_stats_and_metrics(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.put('c', 3)
+        self.cache.get('c')
+        self.cache.get('a')
+
+        self.assertDictEqual(
+            {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 1, 'evictions': 1},
+            self.cache.stats()
+        )
+        self.assertDictEqual(
+            {'test_cache_hits': 1, 'test_cache_misses': 1, 'test_cache_evictions': 1},
+            self.metrics.snapshot()
+        )
+
+    def test_pop_and_clear(self):
+
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+
+        self.assertEqual(1, self.cache.pop('a'))
+        self.assertIsNone(self.cache.pop('a'))
+
+        self.cache.clear()
+        self.assertEqual(0, len(self.cache))
+
+    @patch('LRUCache.time')
+    def test_ttl(self, mock_time):
+
+        cache = LRUCache(2, self.metrics, 'test_cache', ttl=10)
+
+        mock_time.time.return_value = 100
+        cache.put('a', 1)
+
+        mock_time.time.return_value = 109.9
+        self.assertEqual(1, cache.get('a'))
+
+        # Expired entries are dropped and counted as misses
+        mock_time.time.return_value = 110
+        self.assertEqual('expired', cache.get('a', 'expired'))
+        self.assertNotIn('a', cache)
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+        # Lookups do not extend the lifetime of an entry
+        cache.put('b', 2)
+        mock_time.time.return_value = 119
+        self.assertEqual(2, cache.get('b'))
+        mock_time.time.return_value = 120
+        self.assertIsNone(cache.get('b'))
+
+    def test_invalid_maxsize(self):
+
+        self.assertRaisesRegexp(ValueError, '^LRUCache maxsize must be at least 1$', LRUCache, 0)
+
+    def test_concurrent_access(self):
+
+        cache = LRUCache(50)
+
+        def worker(n):
+            for i in range(500):
+                cache.put((n, i % 80), i)
+                cache.get((n, (i * 7) % 80))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(50, len(cache))
+        self.assertEqual(8 * 500, cache.hits + cache.misses)
@@ -0,0 +1,27 @@
+__author__ = 'frank'
+
+import json
+from unittest import TestCase
+
+from LazyImport import LazyModule, lazy_import
+
+
+class TestLazyImport(TestCase):
+
+    def test_already_imported(self):
+
+        self.assertIs(json, lazy_import('json'))
+
+    def test_loads_on_first_use(self):
+
+        module = LazyModule('json')
+
+        self.assertFalse(module.loaded)
+        self.assertEqual('[]', module.dumps([]))
+        self.assertTrue(module.loaded)
+
+    def test_missing_module(self):
+
+        module = lazy_import('netki_module_that_does_not_exist')
+
+        self.assertRaises(ImportError, getattr, module, 'anything')
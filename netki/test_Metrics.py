@@ -0,0 +1,86 @@
+__author__ = 'frank'
+
+import threading
+from unittest import TestCase
+
+from Metrics import Metrics
+
+
+class TestMetrics(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def test_incr_and_get(self):
+
+        self.metrics.incr('requests')
+        self.metrics.incr('response_bytes', 512)
+        self.metrics.incr('response_bytes', 512)
+
+        self.assertEqual(1, self.metrics.get('requests'))
+        self.assertEqual(1024, self.metrics.get('response_bytes'))
+        self.assertEqual(0, self.metrics.get('unknown'))
+
+    def test_snapshot_and_reset(self):
+
+        self.metrics.incr('requests', 3)
+
+        snapshot = self.metrics.snapshot()
+        self.metrics.reset()
+
+        self.assertDictEqual({'requests': 3}, snapshot)
+        self.assertDictEqual({}, self.metrics.snapshot())
+
+    def test_concurrent_incr(self):
+
+        def worker():
+            for _ in range(1000):
+                self.metrics.incr('requests')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(8000, self.metrics.get('requests'))
+
+    def test_emit(self):
+
+        events = []
+
+        def failing_listener(event, data):
+            raise Exception('Listener Failed')
+
+        def listener(event, data):
+            events.append((event, data))
+
+        self.metrics.add_listener(failing_listener)
+        self.metrics.add_listener(listener)
+        self.metrics.emit('circuit_state_change', group='domain', state='open')
+
+        self.assertEqual([('circuit_state_change', {'group': 'domain', 'state': 'open'})], events)
+        self.assertEqual(1, self.metrics.get('circuit_state_change'))
+        self.assertEqual(1, self.metrics.get('listener_errors'))
+
+        self.metrics.remove_listener(listener)
+        self.metrics.emit('circuit_state_change')
+
+        self.assertEqual(1, len(events))
+
+    def test_observe_and_timing(self):
+
+        self.assertEqual(0, self.metrics.timing('request_latency')['count'])
+
+        for ms in range(1, 101):
+            self.metrics.observe('request_latency', ms / 1000.0)
+
+        timing = self.metrics.timing('request_latency')
+        self.assertEqual(100, timing['count'])
+        self.assertAlmostEqual(0.0505, timing['mean'])
+        self.assertAlmostEqual(0.1, timing['max'])
+        self.assertAlmostEqual(0.051, timing['p50'])
+        self.assertAlmostEqual(0.096, timing['p95'])
+        self.assertAlmostEqual(0.1, timing['p99'])
+
+        self.metrics.reset()
+        self.assertEqual(0, self.metrics.timing('request_latency')['count'])
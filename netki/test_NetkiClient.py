@@ -2,9 +2,10 @@
 __author__ = 'frank'
 
 from attrdict import AttrDict
-from mock import Mock, patch
+from mock import patch
 from unittest import TestCase
 
+from FakeNetkiServer import FakeNetkiServer
 from NetkiClient import Netki
 
 
@@ -58,6 +59,29 @@ class TestNetkiInit(TestCase):
         self.assertEqual('api_url', self.netki.api_url)
         self.assertEqual('certificate', self.netki._auth_type)
 
+    def test_from_credentials(self):
+
+        source = Netki.distributed_api_access('ksk', 'suk', 'uk', 'api_url')
+
+        self.netki = Netki.from_credentials(source.credentials)
+
+        self.assertEqual(source.credentials, self.netki.credentials)
+        self.assertEqual('ksk', self.netki.key_signing_key)
+        self.assertEqual('distributed', self.netki._auth_type)
+        self.assertIsNot(source.transport, self.netki.transport)
+
+    def test_set_signed_header_cache(self):
+
+        self.netki = Netki.distributed_api_access('ksk', 'suk', 'uk', 'api_url')
+        self.assertEqual(256, self.netki.signed_header_cache.maxsize)
+
+        self.netki.set_signed_header_cache(10)
+        self.assertEqual(10, self.netki.signed_header_cache.maxsize)
+        self.assertEqual(self.netki.metrics, self.netki.signed_header_cache.metrics)
+
+        self.netki.set_signed_header_cache(None)
+        self.assertIsNone(self.netki.signed_header_cache)
+
     def test_distributed_auth_missing_ksk(self):
 
         self.assertRaisesRegexp(
@@ -127,22 +151,21 @@ class TestNetkiGetWalletNames(TestCase):
         )
 
         # Setup Response object
-        self.mock_wallet_name = Mock()
-        self.mock_wallet_name.id = 'id'
-        self.mock_wallet_name.domain_name = 'testdomain.com'
-        self.mock_wallet_name.name = 'name'
-        self.mock_wallet_name.external_id = 'external_id'
-        self.mock_wallets_obj_1 = Mock()
-        self.mock_wallets_obj_1.currency = 'btc'
-        self.mock_wallets_obj_1.wallet_address = '1btcaddress'
-        self.mock_wallets_obj_2 = Mock()
-        self.mock_wallets_obj_2.currency = 'dgc'
-        self.mock_wallets_obj_2.wallet_address = 'Dgccaddress'
-        self.mock_wallet_name.wallets = [self.mock_wallets_obj_1, self.mock_wallets_obj_2]
-
-        self.mock_response_obj = Mock()
-        self.mock_response_obj.wallet_names = [self.mock_wallet_name]
-        self.mock_response_obj.wallet_name_count = 1
+        self.mock_wallet_name = AttrDict({
+            'id': 'id',
+            'domain_name': 'testdomain.com',
+            'name': 'name',
+            'external_id': 'external_id',
+            'wallets': [
+                {'currency': 'btc', 'wallet_address': '1btcaddress'},
+                {'currency': 'dgc', 'wallet_address': 'Dgccaddress'}
+            ]
+        })
+
+        self.mock_response_obj = AttrDict({
+            'wallet_names': [self.mock_wallet_name],
+            'wallet_name_count': 1
+        })
 
         self.mockProcessRequest.return_value = self.mock_response_obj
 
@@ -231,7 +254,7 @@ class TestNetkiGetWalletNames(TestCase):
     def test_no_wallet_names_returned(self):
 
         # Setup test case
-        self.mock_response_obj.wallet_name_count = 0
+        self.mock_response_obj['wallet_name_count'] = 0
 
         self.assertListEqual([], self.netki.get_wallet_names(domain_name='testdomain.com'))
 
@@ -282,6 +305,62 @@ class TestNetkiCreateWalletName(TestCase):
         self.assertEqual(self.netki, ret_val.netki_client)
 
 
+class TestSaveWalletNames(TestCase):
+    def setUp(self):
+        self.patcher1 = patch('NetkiClient.process_request')
+        self.mockProcessRequest = self.patcher1.start()
+
+        self.netki = Netki(
+            partner_id='partner_id',
+            api_key='api_key',
+            api_url='api_url'
+        )
+
+        self.new_wallet_name = self.netki.create_wallet_name('testdomain.com', 'new', 'external_id', 'btc', 'address')
+        self.existing_wallet_name = self.netki.create_wallet_name('testdomain.com', 'old', 'external_id', 'btc', 'addr')
+        self.existing_wallet_name.id = 'existing_id'
+
+        self.mockProcessRequest.side_effect = [
+            AttrDict({'wallet_names': [{'domain_name': 'testdomain.com', 'name': 'new', 'id': 'new_id'}]}),
+            AttrDict({'wallet_names': [{'domain_name': 'testdomain.com', 'name': 'old', 'id': 'existing_id'}]})
+        ]
+
+    def tearDown(self):
+        self.patcher1.stop()
+
+    def test_go_right(self):
+
+        ret_val = self.netki.save_wallet_names([self.new_wallet_name, self.existing_wallet_name])
+
+        # Validate request data
+        self.assertEqual(2, self.mockProcessRequest.call_count)
+        post_args = self.mockProcessRequest.call_args_list[0][0]
+        self.assertEqual('/v1/partner/walletname', post_args[1])
+        self.assertEqual('POST', post_args[2])
+        self.assertEqual({'wallet_names': [{
+            'domain_name': 'testdomain.com',
+            'name': 'new',
+            'external_id': 'external_id',
+            'wallets': [{'currency': 'btc', 'wallet_address': 'address'}]
+        }]}, post_args[3])
+
+        put_args = self.mockProcessRequest.call_args_list[1][0]
+        self.assertEqual('PUT', put_args[2])
+        self.assertEqual('existing_id', put_args[3]['wallet_names'][0]['id'])
+
+        # Validate return data
+        self.assertEqual([self.new_wallet_name, self.existing_wallet_name], ret_val)
+        self.assertEqual('new_id', self.new_wallet_name.id)
+        self.assertEqual('existing_id', self.existing_wallet_name.id)
+
+    def test_only_new(self):
+
+        self.netki.save_wallet_names([self.new_wallet_name])
+
+        self.assertEqual(1, self.mockProcessRequest.call_count)
+        self.assertEqual('POST', self.mockProcessRequest.call_args[0][2])
+
+
 class TestGetPartners(TestCase):
     def setUp(self):
         self.patcher1 = patch('NetkiClient.process_request')
@@ -398,6 +477,88 @@ class TestGetDomains(TestCase):
         self.assertListEqual([], self.netki.get_domains())
 
 
+class TestGetDomainsHydrated(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.domain_names = ['domain%d.com' % i for i in range(10)]
+        self.server.route('GET', '/api/domain', lambda request: (200, {
+            'success': True, 'domains': [{'domain_name': name} for name in self.domain_names]
+        }))
+        self.server.route('GET', '/v1/partner/domain/([\\w.]+)', lambda request, name: (200, {
+            'success': True, 'status': 'completed', 'delegation_status': True, 'delegation_message': 'OK',
+            'wallet_name_count': len(name)
+        }))
+        self.server.route('GET', '/v1/partner/domain/dnssec/([\\w.]+)', lambda request, name: (200, {
+            'success': True, 'public_key_signing_key': 'PK-' + name, 'ds_records': ['DS'], 'nameservers': ['ns1'],
+            'next_roll': '2030-01-01'
+        }))
+        self.server.route('GET', '/api/domain/([\\w.]+)', lambda request, name: (200, {
+            'success': True, 'domains': [{'domain_name': name}]
+        }))
+        self.server.route('DELETE', '/v1/partner/domain/([\\w.]+)', (204, None))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_go_right(self):
+
+        domains = self.netki.get_domains(hydrate=True, concurrency=4)
+
+        self.assertEqual(self.domain_names, [domain.name for domain in domains])
+        self.assertEqual(21, len(self.server.requests))
+        self.assertEqual(
+            ('completed', True, 'OK', 11, 'PK-domain0.com', ['ns1']),
+            (domains[0].status, domains[0].delegation_status, domains[0].delegation_message,
+             domains[0].wallet_name_count, domains[0].public_key_signing_key, domains[0].nameservers)
+        )
+        self.assertTrue(all(domain.netki_client is self.netki for domain in domains))
+
+    def test_cached(self):
+
+        first = self.netki.get_domains(hydrate=True)
+        second = self.netki.get_domains(hydrate=True)
+
+        self.assertEqual(21, len(self.server.requests))
+        self.assertEqual(first, second)
+        self.assertIsNot(first, second)
+        self.assertEqual(1, self.netki.metrics.get('domain_cache_hits'))
+
+        # Listings are cached per domain_name, unhydrated listings are never cached
+        self.assertEqual(['domain3.com'], [d.name for d in self.netki.get_domains('domain3.com', hydrate=True)])
+        self.netki.get_domains()
+        self.assertEqual(25, len(self.server.requests))
+
+    def test_cache_cleared_on_changes(self):
+
+        domains = self.netki.get_domains(hydrate=True)
+
+        self.domain_names.remove('domain0.com')
+        domains[0].delete()
+
+        self.assertEqual(9, len(self.netki.get_domains(hydrate=True)))
+
+    def test_cache_disabled(self):
+
+        self.netki.set_domain_cache(None)
+
+        self.netki.get_domains(hydrate=True)
+        self.netki.get_domains(hydrate=True)
+
+        self.assertEqual(42, len(self.server.requests))
+
+    def test_hydration_error(self):
+
+        self.server.inject_fault('/v1/partner/domain/dnssec/domain5.com', status=500)
+
+        self.assertRaises(Exception, self.netki.get_domains, hydrate=True)
+
+        # Failed hydrations are not cached
+        self.server.clear_faults()
+        self.assertEqual(10, len(self.netki.get_domains(hydrate=True)))
+
+
 class TestCreatePartnerDomain(TestCase):
     def setUp(self):
         self.patcher1 = patch('NetkiClient.process_request')
@@ -413,6 +574,9 @@ class TestCreatePartnerDomain(TestCase):
 
         self.mockProcessRequest.return_value = AttrDict(self.response_data)
 
+    def tearDown(self):
+        self.patcher1.stop()
+
     def test_go_right_partner_domain(self):
 
         ret_val = self.netki.create_partner_domain('domain_name')
@@ -470,6 +634,9 @@ class TestGetCertificate(TestCase):
 
         self.netki = Netki.certificate_api_access('uk', 'partner_id', 'uri')
 
+    def tearDown(self):
+        self.patcher1.stop()
+
     def test_go_right(self):
 
         cert = self.netki.get_certificate('id')
@@ -487,6 +654,9 @@ class TestGetAvailableProducts(TestCase):
 
         self.netki = Netki.certificate_api_access('uk', 'partner_id', 'uri')
 
+    def tearDown(self):
+        self.patcher1.stop()
+
     def test_go_right(self):
 
         ret_val = self.netki.get_available_products()
@@ -505,6 +675,9 @@ class TestGetCABundle(TestCase):
 
         self.netki = Netki.certificate_api_access('uk', 'partner_id', 'uri')
 
+    def tearDown(self):
+        self.patcher1.stop()
+
     def test_go_right(self):
 
         ret_val = self.netki.get_ca_bundle()
@@ -523,6 +696,9 @@ class TestGetAccountBalance(TestCase):
 
         self.netki = Netki.certificate_api_access('uk', 'partner_id', 'uri')
 
+    def tearDown(self):
+        self.patcher1.stop()
+
     def test_go_right(self):
 
         ret_val = self.netki.get_account_balance()
@@ -0,0 +1,120 @@
+__author__ = 'frank'
+
+import threading
+import time
+from unittest import TestCase
+
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+from Provisioning import PartnerSpec
+from WalletName import WalletName
+
+
+class TestProvisionPartners(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.lock = threading.Lock()
+        self.in_flight = {'current': 0, 'max': 0}
+
+        self.server.route('POST', '/v1/admin/partner/([^/]+)', self.slow(
+            lambda request, name: (200, {'success': True, 'partner': {'id': 'id-' + name, 'name': name}})
+        ))
+        self.server.route('POST', '/v1/partner/domain/([^/]+)', self.slow(self.create_domain))
+        self.server.route('POST', '/v1/partner/walletname', self.slow(lambda request: (200, {
+            'success': True,
+            'wallet_names': [dict(wn, id='wn-' + wn['name']) for wn in request.body['wallet_names']]
+        })))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def slow(self, handler):
+
+        def wrapper(request, *args):
+            with self.lock:
+                self.in_flight['current'] += 1
+                self.in_flight['max'] = max(self.in_flight['max'], self.in_flight['current'])
+            try:
+                time.sleep(0.01)
+                return handler(request, *args)
+            finally:
+                with self.lock:
+                    self.in_flight['current'] -= 1
+
+        return wrapper
+
+    def create_domain(self, request, domain_name):
+
+        if domain_name.startswith('bad'):
+            return 400, {'success': False, 'message': 'Invalid domain'}
+
+        return 200, {'success': True, 'domain_name': domain_name, 'status': 'waiting', 'nameservers': ['ns1']}
+
+    def make_spec(self, i, domains=None):
+
+        domains = domains or ['partner%d-a.com' % i, 'partner%d-b.com' % i]
+        wallet_names = []
+        for domain_name in domains:
+            wallet_name = WalletName(domain_name, 'joe', 'external_id')
+            wallet_name.set_currency_address('btc', '1btcaddress')
+            wallet_names.append(wallet_name)
+
+        return PartnerSpec('partner%d' % i, domains, wallet_names)
+
+    def test_go_right(self):
+
+        specs = [self.make_spec(i) for i in range(10)]
+
+        results = self.netki.provision_partners(specs, concurrency=4)
+
+        self.assertEqual(10, len(results))
+        for i, result in enumerate(results):
+            self.assertTrue(result.succeeded)
+            self.assertIs(specs[i], result.spec)
+            self.assertEqual('id-partner%d' % i, result.partner.id)
+            self.assertEqual(['partner%d-a.com' % i, 'partner%d-b.com' % i], [d.name for d in result.domains])
+            self.assertEqual(['wn-joe', 'wn-joe'], [wn.id for wn in result.wallet_names])
+            self.assertEqual(self.netki, result.wallet_names[0].netki_client)
+
+        # 10 partners, 20 domains and 10 bulk Wallet Name requests
+        self.assertEqual(40, len(self.server.requests))
+        self.assertEqual(10, len([r for r in self.server.requests if r.path == '/v1/partner/walletname']))
+        domain_requests = [r for r in self.server.requests if r.path.startswith('/v1/partner/domain/')]
+        self.assertEqual('id-partner0', [r for r in domain_requests if r.path.endswith('partner0-a.com')][0].body['partner_id'])
+
+        self.assertGreater(self.in_flight['max'], 1)
+        self.assertLessEqual(self.in_flight['max'], 4)
+
+    def test_domain_failure(self):
+
+        results = self.netki.provision_partners([self.make_spec(0, ['good.com', 'bad.com'])], concurrency=2)
+
+        result = results[0]
+        self.assertFalse(result.succeeded)
+        self.assertEqual(['good.com'], [d.name for d in result.domains])
+        self.assertEqual(['domain', 'wallet_names'], [e[0] for e in result.errors])
+        self.assertEqual('bad.com', result.errors[0][1])
+        self.assertEqual(['wn-joe'], [wn.id for wn in result.wallet_names])
+        self.assertEqual('good.com', result.wallet_names[0].domain_name)
+
+    def test_partner_failure(self):
+
+        self.server.route('POST', '/v1/admin/partner/broken', (500, {'success': False, 'message': 'Server error'}))
+
+        results = self.netki.provision_partners([PartnerSpec('broken', ['broken.com']), self.make_spec(1)])
+
+        self.assertFalse(results[0].succeeded)
+        self.assertIsNone(results[0].partner)
+        self.assertEqual([('partner', 'broken')], [e[:2] for e in results[0].errors])
+        self.assertTrue(results[1].succeeded)
+        self.assertNotIn('/v1/partner/domain/broken.com', [r.path for r in self.server.requests])
+
+    def test_no_domains(self):
+
+        results = self.netki.provision_partners([PartnerSpec('partner0')])
+
+        self.assertTrue(results[0].succeeded)
+        self.assertEqual([], results[0].domains)
+        self.assertEqual([], results[0].wallet_names)
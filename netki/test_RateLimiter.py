@@ -0,0 +1,58 @@
+__author__ = 'frank'
+
+import threading
+import time
+from unittest import TestCase
+
+from Metrics import Metrics
+from RateLimiter import RateLimiter
+
+
+class TestRateLimiter(TestCase):
+
+    def test_burst_then_rate(self):
+
+        metrics = Metrics()
+        limiter = RateLimiter(20, burst=5, metrics=metrics)
+
+        start = time.time()
+        for _ in range(5):
+            limiter.acquire()
+        self.assertLess(time.time() - start, 0.05)
+
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.time() - start, 0.18)
+        self.assertGreater(metrics.get('rate_limit_wait_seconds'), 0.15)
+
+    def test_timeout(self):
+
+        limiter = RateLimiter(1)
+
+        self.assertTrue(limiter.acquire(timeout=0))
+        self.assertFalse(limiter.acquire(timeout=0.1))
+        self.assertTrue(limiter.acquire())
+
+    def test_concurrent_callers_share_rate(self):
+
+        limiter = RateLimiter(50, burst=1)
+
+        def worker():
+            for _ in range(5):
+                limiter.acquire()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 20 calls at 50 per second, the first one from the initial burst
+        self.assertGreaterEqual(time.time() - start, 0.37)
+
+    def test_invalid_settings(self):
+
+        self.assertRaisesRegexp(ValueError, '^RateLimiter rate must be greater than 0$', RateLimiter, 0)
+        self.assertRaisesRegexp(ValueError, '^RateLimiter burst must be at least 1$', RateLimiter, 1, 0)
+        self.assertEqual(3, RateLimiter(2.5).burst)
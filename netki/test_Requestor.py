@@ -2,13 +2,30 @@ __author__ = 'frank'
 
 import hashlib
 import json
+import threading
+import time
 from ecdsa import curves, SigningKey
 from ecdsa.util import sigdecode_der
-from mock import Mock, patch
+from mock import Mock
+from requests.exceptions import ConnectionError
+from requests.packages.urllib3.exceptions import ProtocolError
 from unittest import TestCase
 
+from Deadline import Deadline
+from Errors import (
+    AuthenticationError, DeadlineExceededError, NetkiError, NotFoundError, RateLimitError, RequestTimeoutError,
+    TransportError, ValidationError
+)
+from FakeNetkiServer import FakeNetkiServer, RawBody
+from LRUCache import LRUCache
+from Metrics import Metrics
+from Domain import Domain
+from NetkiClient import Netki
+from Provisioning import PartnerSpec
 from Requestor import process_request
 
+import Routes
+
 
 class TestProcessRequest(TestCase):
 
@@ -17,13 +34,21 @@ class TestProcessRequest(TestCase):
         cls.user_key = SigningKey.generate(curve=curves.SECP256k1)
 
     def setUp(self):
-        self.patcher1 = patch('Requestor.requests')
-        self.mockRequests = self.patcher1.start()
+        self.mockTransport = Mock()
 
         # Setup Mock netki_client
         self.netki_client = Mock()
         self.netki_client._auth_type = 'api_key'
         self.netki_client.api_url = ''
+        self.netki_client.request_compression_threshold = None
+        self.netki_client.transport = self.mockTransport
+        self.netki_client.signed_header_cache = None
+        self.netki_client.response_cache = None
+        self.netki_client.single_flight = None
+        self.netki_client.timeout = None
+        self.netki_client.circuit_breakers = None
+        self.netki_client.rate_limiter = None
+        self.netki_client.cache_namespace = None
 
         # Setup Keys for distributed and certificate auth types
 
@@ -31,31 +56,35 @@ class TestProcessRequest(TestCase):
         self.api_key_auth_headers = {
             'X-Partner-ID': self.netki_client.partner_id,
             'Content-Type': 'application/json',
-            'Authorization': self.netki_client.api_key
+            'Authorization': self.netki_client.api_key,
+            'Accept-Encoding': 'gzip, deflate'
         }
 
         self.distributed_auth_headers = {
             'X-Partner-Key': self.netki_client.key_signing_key,
             'X-Partner-KeySig': self.netki_client.signed_user_key,
             'X-Identity': self.user_key.get_verifying_key().to_der().encode('hex'),
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
         }
 
         self.certificate_auth_headers = {
             'X-Identity': self.user_key.get_verifying_key().to_der().encode('hex'),
             'X-Partner-ID': self.netki_client.partner_id,
-            'Content-Type': 'application/json'
+            'Content-Type': 'application/json',
+            'Accept-Encoding': 'gzip, deflate'
         }
 
         self.request_data = {'key': 'val'}
 
         # Setup go right condition
         self.response_data = {'success': True}
-        self.mockRequests.request.return_value.json.return_value = self.response_data
-        self.mockRequests.request.return_value.status_code = 200
+        self.set_response_data(self.response_data)
+        self.mockTransport.request.return_value.status_code = 200
 
-    def tearDown(self):
-        self.patcher1.stop()
+    def set_response_data(self, response_data):
+        self.mockTransport.request.return_value.headers = {}
+        self.mockTransport.request.return_value.raw.stream.return_value = [json.dumps(response_data)]
 
     def test_api_key_auth_get_method_go_right(self):
 
@@ -64,9 +93,9 @@ class TestProcessRequest(TestCase):
         ret_val = process_request(self.netki_client, 'uri', 'GET')
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertIsNone(call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('GET', call_args.get('method'))
@@ -80,9 +109,9 @@ class TestProcessRequest(TestCase):
         ret_val = process_request(self.netki_client, 'uri', 'POST', self.request_data)
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('POST', call_args.get('method'))
@@ -96,9 +125,9 @@ class TestProcessRequest(TestCase):
         ret_val = process_request(self.netki_client, 'uri', 'PUT', self.request_data)
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('PUT', call_args.get('method'))
@@ -110,15 +139,15 @@ class TestProcessRequest(TestCase):
     def test_api_key_auth_delete_method_go_right(self):
 
         # Setup Test case
-        self.mockRequests.request.return_value.status_code = 204
+        self.mockTransport.request.return_value.status_code = 204
         del self.api_key_auth_headers['Content-Type']
 
         ret_val = process_request(self.netki_client, 'uri', 'DELETE')
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertIsNone(call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('DELETE', call_args.get('method'))
@@ -136,9 +165,9 @@ class TestProcessRequest(TestCase):
         ret_val = process_request(self.netki_client, 'uri', 'POST', self.request_data)
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
 
         self.assertTrue(  # Validate that the Appropriate PK Was Used to Sign the Data
@@ -166,9 +195,9 @@ class TestProcessRequest(TestCase):
         ret_val = process_request(self.netki_client, 'uri', 'POST', self.request_data)
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
 
         self.assertTrue(  # Validate that the Appropriate PK Was Used to Sign the Data
@@ -187,6 +216,55 @@ class TestProcessRequest(TestCase):
         # Validate response
         self.assertDictEqual(ret_val, self.response_data)
 
+    def test_distributed_auth_signed_header_cache(self):
+
+        # Setup Test Case
+        self.netki_client._auth_type = 'distributed'
+        self.netki_client.user_key = self.user_key.to_der().encode('hex')
+        self.netki_client.signed_header_cache = LRUCache(2, Metrics(), 'signed_header_cache')
+
+        def signature():
+            return self.mockTransport.request.call_args[1]['headers']['X-Signature']
+
+        process_request(self.netki_client, 'uri', 'GET')
+        first_signature = signature()
+        process_request(self.netki_client, 'uri', 'GET')
+
+        # ECDSA signatures are randomized, an identical signature means the cached headers were reused
+        self.assertEqual(first_signature, signature())
+        self.assertEqual(1, self.netki_client.signed_header_cache.hits)
+
+        process_request(self.netki_client, 'uri', 'POST', self.request_data)
+        self.assertNotEqual(first_signature, signature())
+        self.assertTrue(
+            self.user_key.get_verifying_key().verify(
+                signature().decode('hex'),
+                'uri' + json.dumps(self.request_data),
+                hashfunc=hashlib.sha256, sigdecode=sigdecode_der
+            )
+        )
+
+        process_request(self.netki_client, 'other_uri', 'GET')
+        self.assertDictEqual(
+            {'size': 2, 'maxsize': 2, 'hits': 1, 'misses': 3, 'evictions': 1},
+            self.netki_client.signed_header_cache.stats()
+        )
+
+    def test_certificate_auth_signed_header_cache(self):
+
+        # Setup Test Case
+        self.netki_client._auth_type = 'certificate'
+        self.netki_client.user_key = self.user_key.to_der().encode('hex')
+        self.netki_client.signed_header_cache = LRUCache(2)
+
+        process_request(self.netki_client, 'uri', 'GET')
+        process_request(self.netki_client, 'uri', 'GET')
+
+        first_headers = self.mockTransport.request.call_args_list[0][1]['headers']
+        second_headers = self.mockTransport.request.call_args_list[1][1]['headers']
+        self.assertDictEqual(first_headers, second_headers)
+        self.assertEqual(self.netki_client.partner_id, second_headers['X-Partner-ID'])
+
     def test_unsupported_method(self):
 
         self.assertRaisesRegexp(
@@ -200,20 +278,20 @@ class TestProcessRequest(TestCase):
         )
 
         # Validate submit_request data
-        self.assertEqual(0, self.mockRequests.request.call_count)
+        self.assertEqual(0, self.mockTransport.request.call_count)
 
     def test_delete_non_204_response(self):
 
         # Setup Test case
-        self.mockRequests.request.return_value.status_code = 200
+        self.mockTransport.request.return_value.status_code = 200
         del self.api_key_auth_headers['Content-Type']
 
         ret_val = process_request(self.netki_client, 'uri', 'DELETE')
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertIsNone(call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('DELETE', call_args.get('method'))
@@ -225,8 +303,8 @@ class TestProcessRequest(TestCase):
     def test_400_status_code(self):
 
         # Setup Test case
-        self.mockRequests.request.return_value.status_code = 400
-        self.mockRequests.request.return_value.json.return_value = {'message': 'Bad request for sure'}
+        self.mockTransport.request.return_value.status_code = 400
+        self.set_response_data({'message': 'Bad request for sure'})
 
         self.assertRaisesRegexp(
             Exception,
@@ -239,9 +317,9 @@ class TestProcessRequest(TestCase):
         )
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('POST', call_args.get('method'))
@@ -250,10 +328,10 @@ class TestProcessRequest(TestCase):
     def test_rdata_success_false_no_failures(self):
 
         # Setup Test case
-        self.mockRequests.request.return_value.json.return_value = {
+        self.set_response_data({
             'success': False,
             'message': 'Bad request for sure'
-        }
+        })
 
         self.assertRaisesRegexp(
             Exception,
@@ -266,9 +344,9 @@ class TestProcessRequest(TestCase):
         )
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('POST', call_args.get('method'))
@@ -277,14 +355,14 @@ class TestProcessRequest(TestCase):
     def test_rdata_success_false_with_failures(self):
 
         # Setup Test case
-        self.mockRequests.request.return_value.json.return_value = {
+        self.set_response_data({
             'success': False,
             'message': 'Bad request for sure',
             'failures': [
                 {'message': 'error 1'},
                 {'message': 'error 2'}
             ]
-        }
+        })
 
         self.assertRaisesRegexp(
             Exception,
@@ -297,10 +375,339 @@ class TestProcessRequest(TestCase):
         )
 
         # Validate submit_request data
-        self.assertEqual(1, self.mockRequests.request.call_count)
+        self.assertEqual(1, self.mockTransport.request.call_count)
 
-        call_args = self.mockRequests.request.call_args[1]
+        call_args = self.mockTransport.request.call_args[1]
         self.assertEqual(json.dumps(self.request_data), call_args.get('data'))
         self.assertDictEqual(self.api_key_auth_headers, call_args.get('headers'))
         self.assertEqual('POST', call_args.get('method'))
-        self.assertEqual('uri', call_args.get('url'))
\ No newline at end of file
+        self.assertEqual('uri', call_args.get('url'))
+
+    def test_structured_errors(self):
+
+        self.mockTransport.request.return_value.status_code = 404
+        self.set_response_data({
+            'success': False,
+            'message': 'Not Found',
+            'failures': [{'message': 'unknown id', 'id': 'abc'}]
+        })
+
+        try:
+            process_request(self.netki_client, 'uri', 'GET')
+            self.fail('NotFoundError not raised')
+        except NotFoundError as e:
+            self.assertEqual('Not Found [FAILURES: unknown id]', str(e))
+            self.assertEqual('Not Found', e.message)
+            self.assertEqual(404, e.status_code)
+            self.assertEqual('abc', e.failures[0].id)
+            self.assertEqual('GET', e.method)
+            self.assertEqual('uri', e.uri)
+
+    def test_status_code_error_types(self):
+
+        for status_code, error_class in [
+            (400, ValidationError),
+            (401, AuthenticationError),
+            (403, AuthenticationError),
+            (404, NotFoundError),
+            (429, RateLimitError),
+            (500, NetkiError)
+        ]:
+            self.mockTransport.request.return_value.status_code = status_code
+            self.set_response_data({'success': False, 'message': 'Error'})
+
+            self.assertIs(error_class, type(process_request(self.netki_client, 'uri', 'GET', raise_errors=False)))
+
+    def test_rate_limit_retry_after(self):
+
+        self.mockTransport.request.return_value.status_code = 429
+        self.set_response_data({'success': False, 'message': 'Slow Down'})
+        self.mockTransport.request.return_value.headers = {'Retry-After': '30'}
+
+        error = process_request(self.netki_client, 'uri', 'GET', raise_errors=False)
+
+        self.assertIsInstance(error, RateLimitError)
+        self.assertEqual(30.0, error.retry_after)
+
+    def test_raise_errors_false_returns_error(self):
+
+        self.mockTransport.request.return_value.status_code = 400
+        self.set_response_data({'success': False, 'message': 'Bad', 'failures': [{'message': 'error 1'}]})
+
+        error = process_request(self.netki_client, 'uri', 'POST', self.request_data, raise_errors=False)
+
+        self.assertIsInstance(error, ValidationError)
+        self.assertEqual(['error 1'], error.failure_messages)
+
+    def test_transport_error(self):
+
+        self.mockTransport.request.side_effect = ConnectionError('Connection refused')
+
+        try:
+            process_request(self.netki_client, 'uri', 'GET')
+            self.fail('TransportError not raised')
+        except TransportError as e:
+            self.assertEqual('Connection refused', str(e))
+            self.assertIsNone(e.status_code)
+            self.assertEqual('uri', e.uri)
+
+    def test_non_json_response(self):
+
+        self.mockTransport.request.return_value.status_code = 503
+        self.mockTransport.request.return_value.headers = {}
+        self.mockTransport.request.return_value.raw.stream.return_value = [
+            '<html><body>503 Service Unavailable</body></html>'
+        ]
+
+        error = process_request(self.netki_client, 'uri', 'GET', raise_errors=False)
+
+        self.assertIs(NetkiError, type(error))
+        self.assertEqual(503, error.status_code)
+        self.assertEqual('Invalid API Response: <html><body>503 Service Unavailable</body></html>', error.message)
+
+        self.mockTransport.request.return_value.status_code = 404
+        self.assertRaises(NotFoundError, process_request, self.netki_client, 'uri', 'GET')
+
+        # JSON that is not an object is not an API response either
+        self.set_response_data([1, 2])
+        self.mockTransport.request.return_value.status_code = 200
+        self.assertRaisesRegexp(NetkiError, r'^Invalid API Response: \[1, 2\]$', process_request, self.netki_client,
+                                'uri', 'GET')
+
+    def test_body_read_errors(self):
+
+        self.mockTransport.request.return_value.raw.stream.side_effect = ProtocolError('Connection broken')
+        self.assertRaisesRegexp(TransportError, 'Connection broken', process_request, self.netki_client, 'uri', 'GET')
+
+        self.mockTransport.request.return_value.raw.stream.side_effect = None
+        self.mockTransport.request.return_value.headers = {'Content-Encoding': 'gzip'}
+        self.mockTransport.request.return_value.raw.stream.return_value = ['not gzip data']
+        self.assertRaises(TransportError, process_request, self.netki_client, 'uri', 'GET')
+
+    def test_timeouts(self):
+
+        self.netki_client.timeout = (10, 60)
+        process_request(self.netki_client, 'uri', 'GET')
+        self.assertEqual((10, 60), self.mockTransport.request.call_args[1].get('timeout'))
+
+        process_request(self.netki_client, 'uri', 'GET', timeout=5)
+        self.assertEqual((5, 5), self.mockTransport.request.call_args[1].get('timeout'))
+
+        with Deadline(timeout=(1, 2)):
+            process_request(self.netki_client, 'uri', 'GET')
+        self.assertEqual((1, 2), self.mockTransport.request.call_args[1].get('timeout'))
+
+    def test_deadline_exceeded_before_send(self):
+
+        with Deadline(0):
+            self.assertRaises(DeadlineExceededError, process_request, self.netki_client, 'uri', 'GET')
+
+        self.assertEqual(0, self.mockTransport.request.call_count)
+
+
+class TestConditionalRequests(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer(etags=True).start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+        self.netki.set_response_cache(maxsize=2)
+
+        self.domains = {'success': True, 'domains': [{'domain_name': 'testdomain.com'}]}
+        self.server.route('GET', '/api/domain', lambda request: (200, self.domains))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_not_modified_served_from_cache(self):
+
+        first = self.netki.get_domains()
+        second = self.netki.get_domains()
+
+        self.assertEqual(['testdomain.com'], [d.name for d in first])
+        self.assertEqual(['testdomain.com'], [d.name for d in second])
+
+        self.assertNotIn('if-none-match', self.server.requests[0].headers)
+        self.assertTrue(self.server.requests[1].headers['if-none-match'].startswith('"'))
+        self.assertEqual(1, self.netki.metrics.get('response_cache_not_modified'))
+        self.assertEqual(1, self.netki.metrics.get('response_cache_hits'))
+
+    def test_modified_response_replaces_cache(self):
+
+        self.netki.get_domains()
+        self.domains = {'success': True, 'domains': [{'domain_name': 'otherdomain.com'}]}
+
+        self.assertEqual(['otherdomain.com'], [d.name for d in self.netki.get_domains()])
+        self.assertEqual(['otherdomain.com'], [d.name for d in self.netki.get_domains()])
+        self.assertEqual(1, self.netki.metrics.get('response_cache_not_modified'))
+
+    def test_last_modified_validator(self):
+
+        self.server.etags = False
+        self.server.route('GET', '/v1/partner/domain/dnssec/([^/]+)', lambda request, name: (200, {
+            'success': True,
+            'public_key_signing_key': 'pksk',
+            'ds_records': ['ds'],
+            'nameservers': ['ns1'],
+            'next_roll': 'tomorrow'
+        }, {'Last-Modified': 'Wed, 21 Oct 2015 07:28:00 GMT'}))
+
+        domain = self.netki.get_domains()[0]
+        domain.load_dnssec_details()
+        domain.public_key_signing_key = None
+        domain.load_dnssec_details()
+
+        self.assertEqual('pksk', domain.public_key_signing_key)
+        self.assertEqual('Wed, 21 Oct 2015 07:28:00 GMT', self.server.requests[-1].headers['if-modified-since'])
+        self.assertEqual(1, self.netki.metrics.get('response_cache_not_modified'))
+
+    def test_lru_eviction(self):
+
+        self.server.route('GET', '/v1/partner/walletname', (200, {'success': True, 'wallet_name_count': 0}))
+
+        self.netki.get_domains()
+        self.netki.get_wallet_names(domain_name='a.com')
+        self.netki.get_wallet_names(domain_name='b.com')
+        self.netki.get_domains()
+
+        self.assertNotIn('if-none-match', self.server.requests[-1].headers)
+        self.assertEqual(2, len(self.netki.response_cache))
+        self.assertEqual(2, self.netki.metrics.get('response_cache_evictions'))
+
+    def test_cache_disabled(self):
+
+        self.netki.set_response_cache(None)
+
+        self.netki.get_domains()
+        self.netki.get_domains()
+
+        self.assertNotIn('if-none-match', self.server.requests[1].headers)
+        self.assertEqual(0, self.netki.metrics.get('response_cache_not_modified'))
+
+
+class TestRequestCoalescing(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+        self.netki.enable_request_coalescing([Routes.DOMAINS])
+
+        self.release = threading.Event()
+
+        def slow_domains(request):
+            self.release.wait(5)
+            return 200, {'success': True, 'domains': [{'domain_name': 'testdomain.com'}]}
+
+        self.server.route('GET', '/api/domain', slow_domains)
+        self.server.route('GET', '/v1/partner/walletname', (200, {'success': True, 'wallet_name_count': 0}))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_concurrently(self, count, func):
+
+        threads = [threading.Thread(target=func) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+
+        deadline = time.time() + 5
+        while not self.release.is_set() and self.netki.metrics.get('coalesced_requests') < count - 1 \
+                and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+    def test_identical_gets_coalesced(self):
+
+        results = []
+        self.run_concurrently(4, lambda: results.append(self.netki.get_domains()))
+
+        self.assertEqual([['testdomain.com']] * 4, [[d.name for d in domains] for domains in results])
+        self.assertEqual(1, len(self.server.requests))
+        self.assertEqual(3, self.netki.metrics.get('coalesced_requests'))
+
+    def test_route_not_opted_in(self):
+
+        self.release.set()
+        self.run_concurrently(3, lambda: self.netki.get_wallet_names())
+
+        self.assertEqual(3, len(self.server.requests))
+        self.assertEqual(0, self.netki.metrics.get('coalesced_requests'))
+
+    def test_coalescing_disabled(self):
+
+        self.netki.enable_request_coalescing([])
+        self.release.set()
+        self.run_concurrently(3, lambda: self.netki.get_domains())
+
+        self.assertEqual(3, len(self.server.requests))
+
+
+class TestTimeouts(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.delay = 0
+
+        def domain(request, name):
+            time.sleep(self.delay)
+            return 200, {'success': True, 'status': 'ok', 'public_key_signing_key': 'pksk'}
+
+        self.server.route('GET', '/v1/partner/domain/(?:dnssec/)?([^/]+)', domain)
+        self.server.route('POST', '/v1/admin/partner/([^/]+)', (200, {'success': True, 'partner': {'id': 'id'}}))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_read_timeout(self):
+
+        self.delay = 0.5
+        self.netki.set_timeouts(read=0.1)
+
+        domain = Domain('testdomain.com')
+        domain.set_netki_client(self.netki)
+
+        self.assertRaises(RequestTimeoutError, domain.load_status)
+        self.assertEqual(1, self.netki.metrics.get('request_timeouts'))
+
+    def test_deadline_bounds_multi_step_operation(self):
+
+        self.delay = 0.2
+
+        domain = Domain('testdomain.com')
+        domain.set_netki_client(self.netki)
+
+        start = time.time()
+        with Deadline(0.3):
+            self.assertRaises(RequestTimeoutError, domain.refresh)
+
+        self.assertLess(time.time() - start, 0.45)
+        self.assertEqual('ok', domain.status)
+        self.assertIsNone(domain.public_key_signing_key)
+
+    def test_deadline_bounds_slow_body(self):
+
+        # Every byte arrives well within the read timeout, the body as a whole takes 3.8s
+        body = json.dumps({'success': True, 'domains': [{'domain_name': 'a.com'}]}).encode('utf-8')
+        self.server.route('GET', '/api/domain', (200, RawBody(body, 'application/json', byte_delay=0.1)))
+
+        start = time.time()
+        with Deadline(0.5):
+            self.assertRaises(DeadlineExceededError, self.netki.get_domains)
+
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(1, self.netki.metrics.get('request_timeouts'))
+
+        # The client keeps working after the interrupted read
+        self.server.route('GET', '/api/domain', (200, {'success': True, 'domains': [{'domain_name': 'a.com'}]}))
+        self.assertEqual(['a.com'], [d.name for d in self.netki.get_domains()])
+
+    def test_deadline_cancels_queued_work(self):
+
+        with Deadline(0):
+            results = self.netki.provision_partners([PartnerSpec('partner%d' % i, ['a.com']) for i in range(4)])
+
+        self.assertEqual(0, len(self.server.requests))
+        for result in results:
+            self.assertEqual('partner', result.errors[0][0])
+            self.assertIsInstance(result.errors[0][2], DeadlineExceededError)
@@ -0,0 +1,144 @@
+__author__ = 'frank'
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import TestCase
+
+from mock import patch
+
+from Certificate import Certificate
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+from Requestor import process_request
+from Revocation import CertificateRevoker
+
+
+class TestCertificateRevoker(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.checkpoint_path = os.path.join(self.tmpdir, 'checkpoint')
+
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+        self.revoked = set()
+        self.lock = threading.Lock()
+        self.server.route('DELETE', '/v1/certificate/(\\w+)', self.revoke)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def revoke(self, request, certificate_id):
+
+        if certificate_id.startswith('unknown'):
+            return 404, {'success': False, 'message': 'Certificate Not Found'}
+
+        with self.lock:
+            if certificate_id in self.revoked:
+                return 409, {'success': False, 'message': 'Certificate Already Revoked'}
+            self.revoked.add(certificate_id)
+
+        return 204, None
+
+    def attempts(self, certificate_id):
+        return len([r for r in self.server.requests if r.path == '/v1/certificate/' + certificate_id])
+
+    def test_go_right(self):
+
+        certificate = Certificate()
+        certificate.id = 'cert'
+        ids = ['c%d' % i for i in range(20)] + [certificate]
+
+        report = self.netki.revoke_certificates(ids, 'Private Key Compromised', concurrency=4)
+
+        self.assertEqual(['c%d' % i for i in range(20)] + ['cert'], [o.certificate_id for o in report.outcomes])
+        self.assertEqual(21, len(report.revoked))
+        self.assertEqual([], report.failed)
+        self.assertEqual(set(['c%d' % i for i in range(20)] + ['cert']), self.revoked)
+        self.assertEqual({'revocation_reason': 'Private Key Compromised'}, self.server.requests[0].body)
+        self.assertEqual(21, self.netki.metrics.get('revocations'))
+
+    def test_retries_transient_failures(self):
+
+        self.server.inject_fault('/v1/certificate/flaky', status=503, times=2)
+        self.server.inject_fault('/v1/certificate/down', status=502)
+
+        report = CertificateRevoker(self.netki, max_attempts=3, backoff=0.01).revoke(
+            ['flaky', 'down', 'unknown'], 'reason'
+        )
+
+        flaky, down, unknown = report.outcomes
+        self.assertEqual(('revoked', 3, None), (flaky.status, flaky.attempts, flaky.error))
+        self.assertEqual(('failed', 3, 502), (down.status, down.attempts, down.error.status_code))
+        # Non transient errors are not retried
+        self.assertEqual(('failed', 1, 404), (unknown.status, unknown.attempts, unknown.error.status_code))
+        self.assertEqual(2, self.netki.metrics.get('revocations_failed'))
+
+    def test_conflict_on_retry_is_revoked(self):
+
+        # The first attempt revokes the certificate but its response is lost
+        original = self.revoke
+
+        def lost_response(request, certificate_id):
+            original(request, certificate_id)
+            if len(self.server.requests) == 1:
+                return 500, {'success': False, 'message': 'Internal Error'}
+            return original(request, certificate_id)
+
+        self.server.route('DELETE', '/v1/certificate/(\\w+)', lost_response)
+
+        outcome = CertificateRevoker(self.netki, backoff=0.01).revoke(['c1'], 'reason').outcomes[0]
+
+        self.assertEqual(('revoked', 2), (outcome.status, outcome.attempts))
+
+    def test_unexpected_error_fails_one_certificate(self):
+
+        def request(netki_client, uri, method, data=None):
+            if uri.endswith('/broken'):
+                raise ValueError('Unexpected Response')
+            return process_request(netki_client, uri, method, data)
+
+        with patch('Revocation.process_request', side_effect=request):
+            report = CertificateRevoker(self.netki, backoff=0.01, checkpoint_path=self.checkpoint_path).revoke(
+                ['c1', 'broken', 'c2'], 'reason'
+            )
+
+        c1, broken, c2 = report.outcomes
+        self.assertEqual(['revoked', 'revoked'], [c1.status, c2.status])
+        self.assertEqual(('failed', 1, 'Unexpected Response'), (broken.status, broken.attempts, str(broken.error)))
+        with open(self.checkpoint_path) as checkpoint:
+            self.assertEqual(3, len(checkpoint.readlines()))
+
+    def test_checkpoint_resume(self):
+
+        self.server.inject_fault('/v1/certificate/c2', status=503)
+        revoker = CertificateRevoker(self.netki, max_attempts=1, checkpoint_path=self.checkpoint_path)
+
+        report = revoker.revoke(['c1', 'c2'], 'reason')
+        self.assertEqual(['revoked', 'failed'], [o.status for o in report.outcomes])
+
+        with open(self.checkpoint_path) as checkpoint:
+            entries = [json.loads(line) for line in checkpoint]
+        self.assertEqual(sorted(report.to_dicts(), key=lambda e: e['certificate_id']),
+                         sorted(entries, key=lambda e: e['certificate_id']))
+        self.assertEqual('NetkiError', entries[[e['certificate_id'] for e in entries].index('c2')]['error']['type'])
+
+        self.server.clear_faults()
+        del self.server.requests[:]
+
+        report = revoker.revoke(['c1', 'c2'], 'reason')
+
+        self.assertEqual(['/v1/certificate/c2'], [r.path for r in self.server.requests])
+        self.assertEqual(1, report.resumed)
+        self.assertEqual(['revoked', 'revoked'], [o.status for o in report.outcomes])
+
+    def test_missing_id(self):
+
+        self.assertRaisesRegexp(
+            ValueError, '^Missing ID - Order Not Yet Submitted$', self.netki.revoke_certificates, [Certificate()], 'x'
+        )
+        self.assertRaisesRegexp(ValueError, 'max_attempts', CertificateRevoker, self.netki, max_attempts=0)
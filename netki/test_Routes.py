@@ -0,0 +1,115 @@
+# coding=utf-8
+__author__ = 'frank'
+
+from unittest import TestCase
+
+import Routes
+from Routes import Route, build_query, join_url, quote_component
+
+
+class TestQuoteComponent(TestCase):
+
+    def test_plain_value(self):
+
+        self.assertEqual('testdomain.com', quote_component('testdomain.com'))
+
+    def test_reserved_characters(self):
+
+        self.assertEqual('a%2Fb%3Fc%26d%3De%20f%23', quote_component('a/b?c&d=e f#'))
+
+    def test_unicode(self):
+
+        self.assertEqual('%E1%BC%A9%E1%BC%B8', quote_component(u'ἩἸ'))
+
+    def test_non_string(self):
+
+        self.assertEqual('12', quote_component(12))
+
+    def test_equal_values_of_other_types(self):
+
+        self.assertEqual(['1', 'True', '1.0', '1'], [quote_component(v) for v in (1, True, 1.0, 1)])
+
+    def test_unhashable(self):
+
+        self.assertEqual('%5B1%2C%202%5D', quote_component([1, 2]))
+
+
+class TestBuildQuery(TestCase):
+
+    def test_go_right(self):
+
+        self.assertEqual(
+            'domain_name=testdomain.com&external_id=a%26b',
+            build_query([('domain_name', 'testdomain.com'), ('external_id', 'a&b')])
+        )
+
+    def test_skips_empty_values(self):
+
+        self.assertEqual('external_id=external_id', build_query([('domain_name', None), ('external_id', 'external_id')]))
+        self.assertEqual('', build_query([('domain_name', None), ('external_id', '')]))
+
+
+class TestJoinUrl(TestCase):
+
+    def test_go_right(self):
+
+        self.assertEqual('https://api.netki.com/v1/partner/walletname', join_url('https://api.netki.com', '/v1/partner/walletname'))
+
+    def test_trailing_slash(self):
+
+        self.assertEqual('https://api.netki.com/v1/partner/walletname', join_url('https://api.netki.com/', '/v1/partner/walletname'))
+
+    def test_empty_base(self):
+
+        self.assertEqual('uri', join_url('', 'uri'))
+
+
+class TestRoute(TestCase):
+
+    def test_no_params(self):
+
+        self.assertEqual('/v1/partner/walletname', Route('/v1/partner/walletname').expand())
+
+    def test_path_params(self):
+
+        route = Route('/v1/certificate/{certificate_id}/csr')
+
+        self.assertEqual('/v1/certificate/id/csr', route.expand(certificate_id='id'))
+        self.assertEqual('/v1/certificate/a%2Fb/csr', route.expand(certificate_id='a/b'))
+
+    def test_query(self):
+
+        route = Route('/v1/partner/walletname')
+
+        self.assertEqual(
+            '/v1/partner/walletname?domain_name=test%20domain.com',
+            route.expand(query=[('domain_name', 'test domain.com'), ('external_id', None)])
+        )
+        self.assertEqual('/v1/partner/walletname', route.expand(query=[('domain_name', None)]))
+
+    def test_missing_param(self):
+
+        self.assertRaisesRegexp(
+            ValueError,
+            '^Missing URI parameter: domain_name$',
+            Routes.PARTNER_DOMAIN.expand
+        )
+
+    def test_matches(self):
+
+        self.assertTrue(Routes.DOMAIN.matches('/api/domain/test.com'))
+        self.assertTrue(Routes.WALLET_NAMES.matches('/v1/partner/walletname?domain_name=test.com'))
+        self.assertFalse(Routes.DOMAINS.matches('/api/domain/test.com'))
+        self.assertFalse(Routes.CERTIFICATE.matches('/v1/certificate/id/csr'))
+
+
+class TestEndpointGroup(TestCase):
+
+    def test_go_right(self):
+
+        self.assertEqual('walletname', Routes.endpoint_group(Routes.WALLET_NAMES.expand()))
+        self.assertEqual('domain', Routes.endpoint_group(Routes.DOMAINS.expand()))
+        self.assertEqual('domain', Routes.endpoint_group(Routes.PARTNER_DOMAIN_DNSSEC.expand(domain_name='a.com')))
+        self.assertEqual('certificate', Routes.endpoint_group(Routes.CERTIFICATE_TOKEN.expand()))
+        self.assertEqual('admin', Routes.endpoint_group(Routes.PARTNERS.expand()))
+        self.assertEqual('other', Routes.endpoint_group('/v2/unknown'))
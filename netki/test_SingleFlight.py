@@ -0,0 +1,101 @@
+__author__ = 'frank'
+
+import threading
+import time
+from unittest import TestCase
+
+from Metrics import Metrics
+from SingleFlight import SingleFlight
+
+import Routes
+
+
+class TestSingleFlight(TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+        self.single_flight = SingleFlight([Routes.DOMAINS, Routes.CERTIFICATE], self.metrics)
+
+        self.release = threading.Event()
+        self.calls = []
+
+    def slow_call(self, value):
+
+        def call():
+            self.calls.append(value)
+            self.release.wait(5)
+            if isinstance(value, Exception):
+                raise value
+            return value
+
+        return call
+
+    def run_concurrently(self, count, key, call):
+
+        outcomes = [None] * count
+
+        def worker(index):
+            try:
+                outcomes[index] = self.single_flight.do(key, call)
+            except Exception as e:
+                outcomes[index] = e
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+
+        deadline = time.time() + 5
+        while self.metrics.get('coalesced_requests') < count - 1 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.release.set()
+        for thread in threads:
+            thread.join()
+
+        return outcomes
+
+    def test_applies(self):
+
+        self.assertTrue(self.single_flight.applies('/api/domain'))
+        self.assertTrue(self.single_flight.applies('/v1/certificate/id'))
+        self.assertFalse(self.single_flight.applies('/v1/partner/walletname'))
+
+    def test_concurrent_calls_share_result(self):
+
+        outcomes = self.run_concurrently(5, 'key', self.slow_call('result'))
+
+        self.assertEqual(['result'] * 5, outcomes)
+        self.assertEqual(1, len(self.calls))
+        self.assertEqual(4, self.metrics.get('coalesced_requests'))
+
+    def test_concurrent_calls_share_exception(self):
+
+        error = Exception('Request Failed')
+        outcomes = self.run_concurrently(3, 'key', self.slow_call(error))
+
+        self.assertEqual([error] * 3, outcomes)
+        self.assertEqual(1, len(self.calls))
+
+    def test_sequential_calls_not_coalesced(self):
+
+        self.release.set()
+
+        self.assertEqual(1, self.single_flight.do('key', self.slow_call(1)))
+        self.assertEqual(2, self.single_flight.do('key', self.slow_call(2)))
+        self.assertEqual(0, self.metrics.get('coalesced_requests'))
+
+    def test_different_keys_not_coalesced(self):
+
+        self.release.set()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda k=k: results.append(self.single_flight.do(k, self.slow_call(k))))
+            for k in ['a', 'b']
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(['a', 'b'], sorted(results))
+        self.assertEqual(2, len(self.calls))
@@ -0,0 +1,42 @@
+__author__ = 'frank'
+
+from unittest import TestCase
+
+from StringInterner import StringInterner
+
+
+class TestStringInterner(TestCase):
+    def setUp(self):
+        self.interner = StringInterner(2)
+
+    def test_intern(self):
+
+        first = ''.join(['bt', 'c'])
+        second = ''.join(['bt', 'c'])
+
+        self.assertIsNot(first, second)
+        self.assertIs(first, self.interner.intern(first))
+        self.assertIs(first, self.interner.intern(second))
+        self.assertIs(first, self.interner.intern(u'btc'))
+        self.assertIn('btc', self.interner)
+        self.assertEqual(1, len(self.interner))
+
+    def test_bounded(self):
+
+        interned = self.interner.intern(''.join(['a', 'a']))
+        self.interner.intern('b')
+        value = ''.join(['c', 'c'])
+
+        self.assertIs(value, self.interner.intern(value))
+        self.assertNotIn('cc', self.interner)
+        self.assertEqual(2, len(self.interner))
+
+        # Interned values are still shared when the table is full
+        self.assertIs(interned, self.interner.intern(''.join(['a', 'a'])))
+
+        self.interner.clear()
+        self.assertEqual(0, len(self.interner))
+
+    def test_maxsize(self):
+
+        self.assertRaisesRegexp(ValueError, 'maxsize must be at least 1', StringInterner, 0)
@@ -0,0 +1,156 @@
+__author__ = 'frank'
+
+import hashlib
+import threading
+from ecdsa import SigningKey, curves
+from ecdsa.util import sigdecode_der
+from unittest import TestCase
+
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+
+THREADS = 16
+ITERATIONS = 25
+
+# Pure python ECDSA signing and verification is slow, keep the signed request count small
+SIGNED_THREADS = 8
+SIGNED_ITERATIONS = 1
+
+
+class SharedClientStressTest(TestCase):
+    """
+    Many threads sharing one Netki client against a local stand-in server. Every response echoes data that is
+    specific to the calling thread, so any cross-talk between threads shows up as a mismatch.
+    """
+
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+
+        self.server.route('GET', '/v1/partner/walletname', lambda request: (200, {
+            'success': True,
+            'wallet_name_count': 1,
+            'wallet_names': [{
+                'id': 'id',
+                'domain_name': request.query['domain_name'],
+                'name': 'name',
+                'external_id': request.query['external_id'],
+                'wallets': [{'currency': 'btc', 'wallet_address': request.query['external_id']}]
+            }]
+        }))
+        self.server.route('POST', '/v1/partner/walletname', lambda request: (200, {
+            'success': True,
+            'wallet_names': [dict(wn, id='id-' + wn['external_id']) for wn in request.body['wallet_names']]
+        }))
+        self.server.route('GET', '/v1/partner/domain/([^/]+)', lambda request, domain_name: (200, {
+            'success': True,
+            'status': 'ok-' + domain_name,
+            'wallet_name_count': len(domain_name)
+        }))
+
+        self.errors = []
+
+    def tearDown(self):
+        self.server.stop()
+
+    def run_threads(self, target, count=THREADS):
+
+        def wrapper(thread_id):
+            try:
+                target(thread_id)
+            except Exception as e:
+                self.errors.append(e)
+
+        threads = [threading.Thread(target=wrapper, args=(i,)) for i in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual([], self.errors)
+
+    def test_shared_api_key_client(self):
+
+        netki = Netki('api_key', 'partner_id', self.server.url)
+
+        def worker(thread_id):
+            for i in range(ITERATIONS):
+                external_id = 'thread%d-%d' % (thread_id, i)
+                domain_name = 'domain%d.com' % thread_id
+
+                wallet_names = netki.get_wallet_names(domain_name=domain_name, external_id=external_id)
+                self.assertEqual(domain_name, wallet_names[0].domain_name)
+                self.assertEqual({'btc': external_id}, wallet_names[0].wallets)
+
+                wallet_names[0].id = None
+                wallet_names[0].save()
+                self.assertEqual('id-' + external_id, wallet_names[0].id)
+
+        self.run_threads(worker)
+
+        self.assertEqual(THREADS * ITERATIONS * 2, len(self.server.requests))
+        for request in self.server.requests:
+            self.assertEqual('api_key', request.headers['authorization'])
+            self.assertEqual('partner_id', request.headers['x-partner-id'])
+
+        # Metrics updated from all threads add up to what the server received
+        metrics = netki.metrics
+        self.assertGreater(metrics.get('response_bytes'), 0)
+        self.assertEqual(
+            sum(len(r.raw_body) for r in self.server.requests),
+            metrics.get('request_wire_bytes')
+        )
+
+    def test_shared_distributed_client(self):
+
+        user_key = SigningKey.generate(curve=curves.SECP256k1)
+        netki = Netki.distributed_api_access('ksk', 'suk', user_key.to_der().encode('hex'), self.server.url)
+
+        self.server.route('POST', '/v1/partner/domain/([^/]+)', lambda request, domain_name: (200, {
+            'success': True, 'domain_name': domain_name, 'status': 'waiting', 'nameservers': []
+        }))
+
+        def worker(thread_id):
+            for i in range(SIGNED_ITERATIONS):
+                domain_name = 'thread%d-%d.com' % (thread_id, i)
+                domain = netki.create_partner_domain(domain_name)
+                domain.load_status()
+                self.assertEqual('ok-' + domain_name, domain.status)
+
+        self.run_threads(worker, SIGNED_THREADS)
+
+        self.assertEqual(SIGNED_THREADS * SIGNED_ITERATIONS * 2, len(self.server.requests))
+
+        # Every request carries a signature over its own URL and body
+        verifying_key = user_key.get_verifying_key()
+        for request in self.server.requests:
+            self.assertEqual(verifying_key.to_der().encode('hex'), request.headers['x-identity'])
+            signed = self.server.url + request.path + (request.raw_body or '')
+            self.assertTrue(verifying_key.verify(
+                request.headers['x-signature'].decode('hex'), signed, hashfunc=hashlib.sha256, sigdecode=sigdecode_der
+            ))
+
+    def test_connection_pool_is_shared(self):
+
+        netki = Netki('api_key', 'partner_id', self.server.url)
+        self.server.route('GET', '/api/domain', (200, {'success': True, 'domains': [{'domain_name': 'a.com'}]}))
+
+        def worker(thread_id):
+            for i in range(ITERATIONS):
+                self.assertEqual('a.com', netki.get_domains()[0].name)
+
+        self.run_threads(worker)
+
+        # All threads share a single connection pool for the host. Connections are reused across iterations, the
+        # occasional reconnect of a dropped keep-alive connection aside.
+        pools = netki.transport.adapter.poolmanager.pools
+        self.assertEqual(1, len(pools))
+        self.assertLess(pools[pools.keys()[0]].num_connections, THREADS * 2)
+
+    def test_credentials_are_immutable(self):
+
+        netki = Netki('api_key', 'partner_id', self.server.url)
+
+        for attribute in ('api_key', 'partner_id', 'api_url', '_auth_type'):
+            self.assertRaises(AttributeError, setattr, netki, attribute, 'changed')
+
+        self.assertEqual('api_key', netki.api_key)
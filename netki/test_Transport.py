@@ -0,0 +1,62 @@
+__author__ = 'frank'
+
+import threading
+from mock import patch
+from unittest import TestCase
+
+from FakeNetkiServer import FakeNetkiServer
+from Transport import Transport
+
+
+class TestTransport(TestCase):
+    def setUp(self):
+        self.transport = Transport(pool_maxsize=4)
+
+    def test_init(self):
+
+        self.assertEqual(4, self.transport.pool_maxsize)
+        self.assertEqual(4, self.transport.adapter._pool_maxsize)
+
+    def test_session_per_thread(self):
+
+        sessions = []
+
+        def worker():
+            sessions.append(self.transport.session)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(4, len(set(id(s) for s in sessions)))
+        for session in sessions:
+            self.assertIs(self.transport.adapter, session.get_adapter('https://api.netki.com'))
+            self.assertIs(self.transport.adapter, session.get_adapter('http://localhost'))
+
+    def test_session_reused_within_thread(self):
+
+        self.assertIs(self.transport.session, self.transport.session)
+
+    def test_request(self):
+
+        with patch.object(self.transport.session, 'request') as mock_request:
+            self.transport.request('GET', 'https://api.netki.com/uri', headers={'a': 'b'})
+
+        mock_request.assert_called_once_with(method='GET', url='https://api.netki.com/uri', headers={'a': 'b'})
+
+    def test_cookies_not_kept(self):
+
+        server = FakeNetkiServer().start()
+        try:
+            server.route('GET', '/login', (200, {'success': True}, {'Set-Cookie': 'tenant=partner1; Path=/'}))
+            server.route('GET', '/api/domain', (200, {'success': True}))
+
+            self.transport.request('GET', server.url + '/login')
+            self.transport.request('GET', server.url + '/api/domain')
+        finally:
+            server.stop()
+
+        self.assertEqual(0, len(self.transport.session.cookies))
+        self.assertNotIn('cookie', server.requests[1].headers)
@@ -3,6 +3,7 @@ __author__ = 'frank'
 from mock import Mock, patch
 from unittest import TestCase
 
+from StringInterner import StringInterner
 from WalletName import WalletName
 
 
@@ -23,6 +24,62 @@ class TestWalletNameInit(TestCase):
         self.assertDictEqual({}, self.wallet_name.wallets)
 
 
+class TestWalletNameFromApiData(TestCase):
+
+    def test_go_right(self):
+
+        netki_client = Mock()
+        records = [
+            {
+                'id': 'id',
+                'domain_name': 'testdomain.com',
+                'name': 'name',
+                'external_id': 'external_id',
+                'wallets': [
+                    {'currency': 'btc', 'wallet_address': '1btcaddress'},
+                    {'currency': 'ltc', 'wallet_address': 'LtcAddress'}
+                ]
+            },
+            {'domain_name': 'testdomain.com', 'name': 'new'}
+        ]
+
+        wallet_names = WalletName.from_api_data(records, netki_client)
+
+        # Equivalent to building the objects one by one
+        expected = WalletName('testdomain.com', 'name', 'external_id', 'id')
+        expected.set_currency_address('btc', '1btcaddress')
+        expected.set_currency_address('ltc', 'LtcAddress')
+        expected.set_netki_client(netki_client)
+
+        self.assertEqual(2, len(wallet_names))
+        self.assertIsInstance(wallet_names[0], WalletName)
+        self.assertDictEqual(vars(expected), vars(wallet_names[0]))
+        self.assertDictEqual(vars(WalletName('testdomain.com', 'new', None)), dict(
+            vars(wallet_names[1]), netki_client=None
+        ))
+        self.assertIs(netki_client, wallet_names[1].netki_client)
+        self.assertEqual(expected.get_api_data(), wallet_names[0].get_api_data())
+
+    def test_interns_repeated_values(self):
+
+        # Separate but equal objects, as created by the JSON decoder
+        records = [
+            {
+                'domain_name': ''.join(['testdomain', '.com']),
+                'name': 'name%d' % i,
+                'wallets': [{'currency': ''.join(['bt', 'c']), 'wallet_address': 'address%d' % i}]
+            } for i in range(3)
+        ]
+        interner = StringInterner()
+
+        wallet_names = WalletName.from_api_data(records, interner=interner)
+
+        self.assertEqual(2, len(interner))
+        self.assertIs(wallet_names[0].domain_name, wallet_names[2].domain_name)
+        self.assertIs(list(wallet_names[0].wallets)[0], list(wallet_names[2].wallets)[0])
+        self.assertDictEqual({'btc': 'address1'}, wallet_names[1].wallets)
+
+
 class TestWalletNameGettersSetters(TestCase):
     def setUp(self):
         self.wallet_name = WalletName(
@@ -56,6 +113,22 @@ class TestWalletNameGettersSetters(TestCase):
 
         self.assertEqual({}, self.wallet_name.wallets)
 
+    def test_get_api_data(self):
+
+        expected = {
+            'domain_name': 'testdomain.com',
+            'name': 'myname',
+            'external_id': 'external_id',
+            'wallets': [{'currency': 'currency', 'wallet_address': 'wallet_address'}]
+        }
+
+        self.assertDictEqual(expected, self.wallet_name.get_api_data())
+
+        self.wallet_name.id = 'id'
+        expected['id'] = 'id'
+
+        self.assertDictEqual(expected, self.wallet_name.get_api_data())
+
 
 class TestWalletNameSave(TestCase):
     def setUp(self):
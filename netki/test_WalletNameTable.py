@@ -0,0 +1,129 @@
+__author__ = 'frank'
+
+from mock import Mock
+from unittest import TestCase
+
+from FakeNetkiServer import FakeNetkiServer
+from NetkiClient import Netki
+from WalletName import WalletName
+from WalletNameTable import WalletNameTable
+
+
+def make_record(index, domain_name, currencies):
+    return {
+        'id': 'id%d' % index,
+        'domain_name': domain_name,
+        'name': 'name%d' % index,
+        'external_id': 'external%d' % index,
+        'wallets': [
+            {'currency': currency, 'wallet_address': '%s-address%d' % (currency, index)} for currency in currencies
+        ]
+    }
+
+
+RECORDS = [
+    make_record(0, 'one.com', ['btc', 'ltc']),
+    make_record(1, 'one.com', ['btc']),
+    make_record(2, 'two.com', ['ltc', 'dgc']),
+    make_record(3, 'two.com', []),
+    make_record(4, 'one.com', ['dgc'])
+]
+
+
+class TestWalletNameTable(TestCase):
+    def setUp(self):
+        self.netki_client = Mock()
+        self.table = WalletNameTable.from_api_data(RECORDS, self.netki_client)
+
+    def test_columns(self):
+
+        self.assertEqual(5, len(self.table))
+        self.assertEqual(['one.com', 'one.com', 'two.com', 'two.com', 'one.com'], self.table.domain_names)
+        self.assertEqual(['name%d' % i for i in range(5)], self.table.names)
+        self.assertEqual(['id%d' % i for i in range(5)], self.table.ids)
+        self.assertEqual([('ltc', 'ltc-address2'), ('dgc', 'dgc-address2')], self.table.wallets_of(2))
+        self.assertEqual([], self.table.wallets_of(3))
+
+        # Domains and currencies are stored once, rows reference them by code
+        self.assertEqual([0, 0, 1, 1, 0], list(self.table.domain_codes))
+        self.assertEqual(['btc', 'ltc', 'dgc'], self.table._currencies.values)
+
+    def test_lazy_wallet_names(self):
+
+        wallet_name = self.table[0]
+
+        self.assertIsInstance(wallet_name, WalletName)
+        self.assertEqual(
+            ('one.com', 'name0', 'external0', 'id0'),
+            (wallet_name.domain_name, wallet_name.name, wallet_name.external_id, wallet_name.id)
+        )
+        self.assertDictEqual({'btc': 'btc-address0', 'ltc': 'ltc-address0'}, wallet_name.wallets)
+        self.assertEqual(self.netki_client, wallet_name.netki_client)
+        self.assertEqual('name4', self.table[-1].name)
+        self.assertEqual(['name%d' % i for i in range(5)], [w.name for w in self.table.to_wallet_names()])
+
+    def test_round_trip(self):
+
+        table = WalletNameTable.from_wallet_names(self.table)
+
+        self.assertEqual(self.table.names, table.names)
+        self.assertEqual(self.table.domain_names, table.domain_names)
+        for index in range(5):
+            self.assertEqual(sorted(self.table.wallets_of(index)), sorted(table.wallets_of(index)))
+
+    def test_filter(self):
+
+        self.assertEqual(['name0', 'name1', 'name4'], self.table.filter(domain_name='one.com').names)
+        self.assertEqual(['name0', 'name2'], self.table.filter(currency='ltc').names)
+        self.assertEqual(['name4'], self.table.filter(domain_name='one.com', currency='dgc').names)
+        self.assertEqual([], self.table.filter(domain_name='unknown.com').names)
+        self.assertEqual([], self.table.filter(currency='xyz').names)
+
+        filtered = self.table.filter(currency='dgc')
+        self.assertEqual([('dgc', 'dgc-address4')], filtered.wallets_of(1))
+        self.assertDictEqual({'ltc': 'ltc-address2', 'dgc': 'dgc-address2'}, filtered[0].wallets)
+
+    def test_count_by(self):
+
+        self.assertDictEqual({'one.com': 3, 'two.com': 2}, self.table.count_by('domain_name'))
+        self.assertDictEqual({'btc': 2, 'ltc': 2, 'dgc': 2}, self.table.count_by('currency'))
+        self.assertDictEqual(
+            {
+                ('one.com', 'btc'): 2, ('one.com', 'ltc'): 1, ('one.com', 'dgc'): 1,
+                ('two.com', 'ltc'): 1, ('two.com', 'dgc'): 1
+            },
+            self.table.count_by('domain_name', 'currency')
+        )
+        self.assertIn(('btc', 'one.com'), self.table.count_by('currency', 'domain_name'))
+        self.assertRaisesRegexp(ValueError, 'count_by Fields', self.table.count_by, 'name')
+        self.assertRaises(ValueError, self.table.count_by)
+
+
+class TestNetkiGetWalletNamesTable(TestCase):
+    def setUp(self):
+        self.server = FakeNetkiServer().start()
+        self.netki = Netki('api_key', 'partner_id', self.server.url)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_go_right(self):
+
+        self.server.route('GET', '/v1/partner/walletname', (200, {
+            'success': True, 'wallet_name_count': 5, 'wallet_names': RECORDS
+        }))
+
+        table = self.netki.get_wallet_names_table(domain_name='one.com')
+
+        self.assertEqual(5, len(table))
+        self.assertEqual(self.netki, table[0].netki_client)
+        self.assertEqual('one.com', self.server.requests[0].query['domain_name'])
+
+    def test_empty(self):
+
+        self.server.route('GET', '/v1/partner/walletname', (200, {'success': True, 'wallet_name_count': 0}))
+
+        table = self.netki.get_wallet_names_table()
+
+        self.assertEqual(0, len(table))
+        self.assertDictEqual({}, table.count_by('domain_name'))
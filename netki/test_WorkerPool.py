@@ -0,0 +1,73 @@
+__author__ = 'frank'
+
+import threading
+import time
+from unittest import TestCase
+
+from WorkerPool import WorkerPool
+
+
+class TestWorkerPool(TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(4)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_submit_result(self):
+
+        task = self.pool.submit(lambda x, y=0: x + y, 1, y=2)
+
+        self.assertEqual(3, task.result())
+        self.assertTrue(task.done())
+        self.assertIsNone(task.exception())
+
+    def test_submit_exception(self):
+
+        def fail():
+            raise ValueError('failed')
+
+        task = self.pool.submit(fail)
+
+        self.assertRaisesRegexp(ValueError, '^failed$', task.result)
+        self.assertIsInstance(task.exception(), ValueError)
+
+    def test_map_preserves_order(self):
+
+        tasks = self.pool.map(lambda x: x * 2, range(20))
+
+        self.assertEqual([x * 2 for x in range(20)], [t.result() for t in tasks])
+
+    def test_concurrency_bound(self):
+
+        lock = threading.Lock()
+        state = {'running': 0, 'max': 0}
+
+        def work(_):
+            with lock:
+                state['running'] += 1
+                state['max'] = max(state['max'], state['running'])
+            time.sleep(0.01)
+            with lock:
+                state['running'] -= 1
+
+        self.pool.map(work, range(40))
+
+        self.assertEqual(4, state['max'])
+
+    def test_follow_up_tasks(self):
+
+        def first():
+            return self.pool.submit(lambda: 'second')
+
+        self.assertEqual('second', self.pool.submit(first).result().result())
+
+    def test_submit_after_shutdown(self):
+
+        self.pool.shutdown()
+
+        self.assertRaisesRegexp(Exception, '^WorkerPool Has Been Shut Down$', self.pool.submit, lambda: None)
+
+    def test_invalid_size(self):
+
+        self.assertRaisesRegexp(ValueError, '^WorkerPool size must be at least 1$', WorkerPool, 0)
@@ -1,4 +1,5 @@
 from setuptools import setup
+from setuptools.command.build_py import build_py
 
 install_requires = [
     'attrdict==2.0.0',
@@ -13,6 +14,17 @@ tests_requires = [
     'mock==1.0.1'
 ]
 
+
+class BuildPy(build_py):
+    """ Leave the test modules and the FakeNetkiServer test fixture out of the installed package. """
+
+    def find_package_modules(self, package, package_dir):
+        return [
+            (pkg, module, path) for pkg, module, path in build_py.find_package_modules(self, package, package_dir)
+            if not module.startswith('test_') and module != 'FakeNetkiServer'
+        ]
+
+
 setup(
     name='netki_partner_client',
     packages=['netki'],
@@ -24,5 +36,9 @@ setup(
     keywords=['netki', 'partner', 'certificate', 'walletname', 'wallet', 'name', 'bitcoin', 'blockchain', 'identity'],
     license='BSD',
     install_requires=install_requires,
-    tests_requires=tests_requires
+    tests_requires=tests_requires,
+    cmdclass={'build_py': BuildPy},
+    entry_points={
+        'console_scripts': ['netki = netki.Cli:main']
+    }
 )